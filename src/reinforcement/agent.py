@@ -1,19 +1,78 @@
 #!/usr/bin/env python3
 
-from model import Actor, Critic
-from replaybuffer import ReplayBuffer
+from reinforcement.model import Actor, Critic, FusedCritic
+from reinforcement.replaybuffer import ReplayBuffer, RingReplayBuffer, MemmapReplayBuffer, PrioritizedReplayBuffer
+from reinforcement.prefetch import BatchPrefetcher
 
 import torch
 import torch.nn.functional as F
 import torch.optim as optim
 import rospy
 from numpy import inf
-from utils import Extension
+from reinforcement.utils import Extension
 import numpy as np
 import tqdm
+import threading
+import os
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+def bf16_supported(device):
+    """True when device runs bfloat16 autocast (oneDNN on CPU)."""
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        with torch.autocast('cpu', dtype=torch.bfloat16):
+            return torch.mm(torch.ones(2, 2), torch.ones(2, 2)).dtype == torch.bfloat16
+    except RuntimeError:
+        return False
+
+def flatten_parameters(model):
+    """Move the parameters of model into one contiguous buffer and return it.
+
+    Each parameter becomes a view of the buffer, so in-place updates of the buffer
+    (and of the parameters, e.g. by optimizers or load_state_dict) are seen by both.
+    Returns None when the parameters do not share a dtype and a device.
+    """
+    params = list(model.parameters())
+    if len({(p.dtype, p.device) for p in params}) != 1:
+        return None
+
+    flat = torch.cat([p.detach().reshape(-1) for p in params])
+    offset = 0
+    for p in params:
+        p.data = flat[offset:offset + p.numel()].view_as(p)
+        offset += p.numel()
+    return flat
+
+class SoftUpdater():
+    """Polyak averaging of a target network towards its local network, one in-place op per update."""
+
+    def __init__(self, local_model, target_model):
+        """Initialize a SoftUpdater object.
+        Params
+        ======
+            local_model: PyTorch model (weights will be copied from)
+            target_model: PyTorch model (weights will be copied to)
+        """
+        self.local_flat = flatten_parameters(local_model)
+        self.target_flat = flatten_parameters(target_model)
+
+        # mixed dtypes or devices: one fused op over the parameter lists instead
+        if self.local_flat is None or self.target_flat is None:
+            self.local_params = [p.data for p in local_model.parameters()]
+            self.target_params = [p.data for p in target_model.parameters()]
+
+    @torch.no_grad()
+    def update(self, tau):
+        """θ_target = τ*θ_local + (1 - τ)*θ_target"""
+        if self.local_flat is not None and self.target_flat is not None:
+            self.target_flat.lerp_(self.local_flat, tau)
+        else:
+            torch._foreach_lerp_(self.target_params, self.local_params, tau)
+
 class Agent():
     """Interacts with and learns from the environment."""
     
@@ -50,9 +109,12 @@ class Agent():
         self.weight_decay = self.param["WEIGHT_DECAY"]
         self.buffer_size = self.param["BUFFER_SIZE"]
         self.policy_freq = self.param["POLICY_FREQ"]
+        self.iteration = 0                                      # gradient steps since creation, delays the policy updates
         self.epsilon_decay = self.param["EPSILON_DECAY"]
         self.policy_noise = self.param["POLICY_NOISE"]
         self.noise_clip = self.param["NOISE_CLIP"]
+        self.buffer_type = self.param["BUFFER_TYPE"]
+        self.fused_critic = self.param["FUSED_CRITIC"]
         self.gamma = 0.99
 
         # Actor Network (w/ Network)
@@ -62,23 +124,58 @@ class Agent():
         self.actor_optimizer = optim.Adam(self.actor_local.parameters(), lr=self.param['LR_ACTOR'])
 
         # Critic Network (w/ Network)
-        self.critic_local = Critic().to(device)
-        self.critic_target = Critic().to(device)
+        critic = FusedCritic if self.fused_critic else Critic
+        self.critic_local = critic().to(device)
+        self.critic_target = critic().to(device)
         self.critic_target.load_state_dict(self.critic_local.state_dict())
         self.critic_optimizer = optim.Adam(self.critic_local.parameters(), lr=self.param['LR_CRITIC'])
 
+        # Target networks updated in place over flattened parameters
+        self.actor_updater = SoftUpdater(self.actor_local, self.actor_target)
+        self.critic_updater = SoftUpdater(self.critic_local, self.critic_target)
+
         # Replay memory
-        self.memory = ReplayBuffer(self.buffer_size, self.batch_size, random_seed)
+        self.prioritized = self.buffer_type == 'prioritized'
+        if self.prioritized:
+            self.memory = PrioritizedReplayBuffer(self.buffer_size, self.batch_size, state_size, action_size,
+                                                  self.param["PER_ALPHA"], self.param["PER_BETA"],
+                                                  self.param["PER_BETA_INCREMENT"], self.param["PER_EPSILON"], random_seed)
+        elif self.buffer_type == 'memmap':
+            self.memory = MemmapReplayBuffer(self.buffer_size, self.batch_size, state_size, action_size,
+                                             os.path.join(self.param["RESULTS"], 'buffer'), random_seed)
+        elif self.buffer_type == 'ring':
+            self.memory = RingReplayBuffer(self.buffer_size, self.batch_size, state_size, action_size, random_seed)
+        else:
+            self.memory = ReplayBuffer(self.buffer_size, self.batch_size, action_size, random_seed)
+
+        # Eager or compiled losses, optional bfloat16 autocast
+        self.configure_training(self.param["TRAIN_MODE"], self.param["AUTOCAST"])
+
+        # Minibatches sampled ahead on a background thread (PREFETCH_DEPTH 0 -> sampled in learn)
+        self.memory_lock = threading.Lock()
+        if self.param["PREFETCH_DEPTH"] > 0:
+            self.prefetcher = BatchPrefetcher(self.memory, device, self.param["PREFETCH_DEPTH"], self.memory_lock)
+            self.sample = self.prefetcher.get
+        else:
+            self.prefetcher = None
+            self.sample = self.memory.sample
     
     def step(self, state, action, reward, next_state, done, timestep, i_episode, score):
         """Save experience in replay memory"""
         # Save experience / reward
-        self.memory.add(state, action, reward, next_state, done)
+        with self.memory_lock:
+            self.memory.add(state, action, reward, next_state, done)
         
     def action(self, state, add_noise=True):
-        """Returns actions for given state as per current policy."""
-        action = self.actor_local(torch.as_tensor(state, dtype=torch.float32).view(1, -1)).cpu().data.numpy().flatten()
-        return action        
+        """Returns actions for given state as per current policy.
+
+        A single (state_size,) state gives an (action_size,) action, a batch of
+        (N, state_size) states gives (N, action_size) actions in one forward pass.
+        """
+        state = torch.as_tensor(state, dtype=torch.float32, device=device)
+        with torch.no_grad():
+            action = self.actor_local(state.view(-1, self.state_size)).cpu().numpy()
+        return action.flatten() if state.dim() == 1 else action
         # state = torch.from_numpy(state).float().to(device)
         # self.actor_local.eval()
         # with torch.no_grad():
@@ -91,50 +188,150 @@ class Agent():
         # self.actor_local.train()
         # return action
 
-    def learn(self, n_iteraion, ):
+    def pause_prefetch(self):
+        """Stop sampling ahead and drop the batches already sampled.
 
-        if len(self.memory) > self.batch_size:
-            for i in range(n_iteraion):
-                state, action, reward, next_state, done = self.memory.sample()
+        The RNG state of the memory then matches the next batch trained on, as a checkpoint
+        needs. Sampling ahead resumes with the next learn call.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.close()
 
-                action_ = action.cpu().numpy()
+    def state_dict(self):
+        """Complete training state: networks, target networks, optimizers, update counter and replay memory.
 
-                # ---------------------------- update critic ---------------------------- #
-                # Get predicted next-state actions and Q values from target models
-                actions_next = self.actor_target(next_state)
+        Tensors are returned by reference, copy them (checkpoint.snapshot) before training
+        further; the stored experiences are copied under memory_lock when the state is resolved
+        (checkpoint.resolve).
+        Call pause_prefetch() first for a memory RNG state that matches the next batch.
+        """
+        return {'actor_local': self.actor_local.state_dict(),
+                'actor_target': self.actor_target.state_dict(),
+                'critic_local': self.critic_local.state_dict(),
+                'critic_target': self.critic_target.state_dict(),
+                'actor_optimizer': self.actor_optimizer.state_dict(),
+                'critic_optimizer': self.critic_optimizer.state_dict(),
+                'iteration': self.iteration,
+                'memory': self.memory.state_dict(self.memory_lock)}
+
+    def load_state_dict(self, state):
+        self.pause_prefetch()
+
+        self.actor_local.load_state_dict(state['actor_local'])
+        self.actor_target.load_state_dict(state['actor_target'])
+        self.critic_local.load_state_dict(state['critic_local'])
+        self.critic_target.load_state_dict(state['critic_target'])
+        self.actor_optimizer.load_state_dict(state['actor_optimizer'])
+        self.critic_optimizer.load_state_dict(state['critic_optimizer'])
+        self.iteration = state['iteration']
+        with self.memory_lock:
+            self.memory.load_state_dict(state['memory'])
+
+    def configure_training(self, train_mode='eager', autocast='none'):
+        """Select how the updates are computed.
+
+        train_mode 'compile' runs the critic and actor losses as torch.compile graphs
+        (fullgraph, so any graph break is an error) together with their backward graphs,
+        and compiles the optimizer steps and the target network update; 'eager' runs them
+        as is. autocast 'bf16' computes the losses in bfloat16 where the device supports it.
+        """
+        self.train_mode = train_mode
+        self.autocast = autocast == 'bf16' and bf16_supported(device)
+        if autocast == 'bf16' and not self.autocast:
+            rospy.logwarn('Training Mode               => bfloat16 not supported on ' + str(device) + ', training in float32')
+
+        if train_mode == 'compile':
+            self.compute_critic_loss = torch.compile(self.critic_loss, fullgraph=True)
+            self.compute_actor_loss = torch.compile(self.actor_loss, fullgraph=True)
+            self.critic_step = torch.compile(self.critic_optimizer.step)
+            self.actor_step = torch.compile(self.actor_optimizer.step)
+            self.update_targets = torch.compile(self.soft_update_targets, fullgraph=True)
+        else:
+            self.compute_critic_loss = self.critic_loss
+            self.compute_actor_loss = self.actor_loss
+            self.critic_step = self.critic_optimizer.step
+            self.actor_step = self.actor_optimizer.step
+            self.update_targets = self.soft_update_targets
+
+    def soft_update_targets(self):
+        """Move both target networks towards their local networks by tau."""
+        self.critic_updater.update(self.tau)
+        self.actor_updater.update(self.tau)
+
+    def critic_loss(self, state, action, reward, next_state, done, weights=None):
+        """Twin-critic loss against the clipped double-Q target and the TD error of each sample."""
+
+        # flatten (batch, 1) rewards and dones to match the (batch,) critic outputs
+        reward = reward.view(-1).float()
+        done = done.view(-1).float()
+
+        # Get predicted next-state actions and Q values from target models
+        with torch.no_grad():
+            actions_next = self.actor_target(next_state)
 
-                # Generate a random noise
-                noise = torch.FloatTensor(action_).data.normal_(0, self.noise).to(device)
-                noise = noise.clamp(-self.noise_clip, self.noise_clip)
-                actions_next = (actions_next + noise).clamp(-1.0, 1) # mudar aqui depois
+            # Generate a random noise
+            noise = torch.empty_like(action).normal_(0, self.noise)
+            noise = noise.clamp(-self.noise_clip, self.noise_clip)
+            actions_next = (actions_next + noise).clamp(-1.0, 1) # mudar aqui depois
 
-                Q1_targets_next, Q2_targets_next = self.critic_target(next_state, actions_next)
+            Q1_targets_next, Q2_targets_next = self.critic_target(next_state, actions_next)
+
+            Q_targets_next = torch.min(Q1_targets_next, Q2_targets_next)
+            # Compute Q targets for current states (y_i)
+            Q_targets = reward + self.gamma * Q_targets_next * (1 - done)
+
+        # Compute critic loss
+        Q1_expected, Q2_expected = self.critic_local(state, action)
+        td_errors = ((Q1_expected - Q_targets).abs() + (Q2_expected - Q_targets).abs()).detach() / 2
+        if weights is not None:
+            # Importance-sampling weighted loss
+            critic_loss = (weights * (Q1_expected - Q_targets) ** 2).mean() + (weights * (Q2_expected - Q_targets) ** 2).mean()
+        else:
+            critic_loss = F.mse_loss(Q1_expected, Q_targets) + F.mse_loss(Q2_expected, Q_targets)
+
+        return critic_loss.float(), td_errors.float()
+
+    def actor_loss(self, state):
+        """Deterministic policy gradient loss: minus the first critic's value of the policy actions."""
+        actor_loss, _ = self.critic_local(state, self.actor_local(state))
+        return -actor_loss.float().mean()
+
+    def learn(self, n_iteraion, ):
+
+        if len(self.memory) > self.batch_size:
+            for _ in range(n_iteraion):
+                self.iteration += 1
+                if self.prioritized:
+                    state, action, reward, next_state, done, weights, indices = self.sample()
+                else:
+                    state, action, reward, next_state, done = self.sample()
+                    weights = None
+
+                # ---------------------------- update critic ---------------------------- #
+                with torch.autocast(device.type, dtype=torch.bfloat16, enabled=self.autocast):
+                    critic_loss, td_errors = self.compute_critic_loss(state, action, reward, next_state, done, weights)
 
-                Q_targets_next = torch.min(Q1_targets_next, Q2_targets_next)
-                # Compute Q targets for current states (y_i)
-                Q_targets = reward + (self.gamma * Q_targets_next * (1 - done)).detach()
-                # Compute critic loss
-                Q1_expected, Q2_expected = self.critic_local(state, action)
-                critic_loss = F.mse_loss(Q1_expected, Q_targets) + F.mse_loss(Q2_expected, Q_targets)
+                if self.prioritized:
+                    # new priorities from the twin critics' TD errors
+                    with self.memory_lock:
+                        self.memory.update_priorities(indices, td_errors.cpu().numpy())
 
                 # Minimize the loss
                 self.critic_optimizer.zero_grad()
                 critic_loss.backward()
-                self.critic_optimizer.step()
+                self.critic_step()
 
-                if i % self.policy_freq == 0:
+                if self.iteration % self.policy_freq == 0:
                     # ---------------------------- update actor ---------------------------- #
-                    # Compute actor loss
-                    actor_loss, _ = self.critic_local(state, self.actor_local(state))
-                    actor_loss = -actor_loss.mean()
+                    with torch.autocast(device.type, dtype=torch.bfloat16, enabled=self.autocast):
+                        actor_loss = self.compute_actor_loss(state)
                     # Minimize the loss
                     self.actor_optimizer.zero_grad()
                     actor_loss.backward()
-                    self.actor_optimizer.step()
+                    self.actor_step()
 
                     # ----------------------- update target networks ----------------------- #
-                    self.soft_update(self.critic_local, self.critic_target, self.tau)
-                    self.soft_update(self.actor_local, self.actor_target, self.tau)
+                    self.update_targets()
 
     def soft_update(self, local_model, target_model, tau):
         """Soft update model parameters.
@@ -145,5 +342,6 @@ class Agent():
             target_model: PyTorch model (weights will be copied to)
             tau (float): interpolation parameter 
         """
-        for target_param, local_param in zip(target_model.parameters(), local_model.parameters()):
-            local_param.data.copy_(tau*target_param.data + (1.0-tau)*local_param.data)
+        with torch.no_grad():
+            for target_param, local_param in zip(target_model.parameters(), local_model.parameters()):
+                target_param.lerp_(local_param, tau)
@@ -3,9 +3,14 @@
 import torch
 import numpy as np
 
-from agent import Agent
-from environment import Env
-from utils import Extension
+from reinforcement.agent import Agent
+from reinforcement.environment import Env
+from reinforcement.simulation import SimEnv, VecSimEnv
+from reinforcement.distributed import train_distributed
+from reinforcement.navigation import Navigation
+from reinforcement.scheduler import UpdateScheduler
+from reinforcement.checkpoint import CheckpointWriter, resume_training, save_checkpoint
+from reinforcement.utils import Extension
 from collections import deque
 
 import rospy
@@ -16,6 +21,15 @@ checkpoints_dir = os.path.join(script_dir, 'checkpoints')
 if not os.path.exists(checkpoints_dir):
     os.makedirs(checkpoints_dir)
 
+def resume(agent, scheduler=None, env=None):
+     """Load the latest full checkpoint (TYPE 1), returns the checkpoint or None when there is none."""
+     path, state = resume_training(checkpoints_dir, agent, scheduler, env)
+     if state is None:
+          rospy.logwarn('No checkpoint in ' + checkpoints_dir + ', training from the pre-trained model')
+     else:
+          rospy.loginfo('Resuming training from ' + path)
+     return state
+
 def td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful):
      """
      parameters
@@ -29,7 +43,7 @@ def td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful
 
      ## ====================== Training Loop ====================== ##
 
-     if param["TYPE"] == 0:
+     if param["TYPE"] in [0, 1]:
 
           torch.manual_seed(0)
           np.random.seed(0)
@@ -39,12 +53,27 @@ def td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful
           agent.actor_local.load_state_dict(torch.load(param["TRAIN"] + "actor_model.pth", map_location=torch.device('cpu')))
           agent.critic_local.load_state_dict(torch.load(param["TRAIN"] + "critic_model.pth", map_location=torch.device('cpu')))
 
-          env = Env(CONFIG_PATH)
+          if param["BACKEND"] == 'sim':
+               env = SimEnv(CONFIG_PATH)
+          else:
+               env = Env(CONFIG_PATH)
+
+          scheduler = UpdateScheduler.from_config(agent, param)           # when and how much the agent learns
+          writer = CheckpointWriter(checkpoints_dir, param["KEEP_CHECKPOINTS"])  # full training state, written in the background
 
           scores_window = deque()                                          # average scores of the most recent episodes                                                     
           scores = []                                                      # list of average scores of each episode                  
+          start_episode = 0
 
-          for i_episode in range(n_episodes+1):                            # initialize score for each agent
+          ## ====================== Resume Training ====================== ##
+          if param["TYPE"] == 1:
+               state = resume(agent, scheduler, env)
+               if state is not None:
+                    scores = state["scores"]
+                    scores_window = deque(state["scores_window"])
+                    start_episode = state["episode"] + 1
+
+          for i_episode in range(start_episode, n_episodes+1):             # initialize score for each agent
                score = 0.0                
                done = False
 
@@ -52,16 +81,19 @@ def td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful
                states = env.reset_env()                                    # get the current state of each agent
                
                for t in range(max_t):   
-                    action = agent.action(states)                          # choose an action for each agent
+                    with scheduler.lock:
+                         action = agent.action(states)                     # choose an action for each agent
                     actions = [(action[0] + 1) / 2, action[1]]             # Update action to fall in range [0,1] for linear velocity and [-1,1] for angular velocity
                     print("Action: ", actions)
                     next_states, rewards, done, _ = env.step_env(actions)  # send all actions to the environment
                     # save the experiment in the replay buffer, run the learning step at a defined interval
-                    agent.step(states, actions, rewards, next_states, done, t, i_episode, scores)
+                    with scheduler.lock:
+                         agent.step(states, actions, rewards, next_states, done, t, i_episode, scores)
+                    scheduler.step()
                     states = next_states
                     score += rewards
                     if np.any(done) or t == max_t - 1:                                       # exit loop when episode ends
-                         agent.learn(t)
+                         scheduler.end_episode(t)
                          break         
           
                scores_window.append(score)                                 # save average score for the episode
@@ -72,20 +104,98 @@ def td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful
 
                if i_episode % 100 == 0:
                     print('\rEpisode {}\tAverage Score: {:.2f}'.format(i_episode, mean_score))
+                    print(scheduler.report())
+                    if hasattr(env, 'reset_report'):
+                         print(env.reset_report())
 
-               if i_episode % 300 == 0:
-                    torch.save(agent.actor_local.state_dict(), os.path.join(checkpoints_dir, '{}_actor_checkpoint.pth'.format(i_episode)))
-                    torch.save(agent.critic_local.state_dict(), os.path.join(checkpoints_dir, '{}_critic_checkpoint.pth'.format(i_episode)))
+               if i_episode % param.CHECKPOINT_EVERY == 0:
+                    with scheduler.lock:                                    # weights copied here, memory streamed by the writer thread
+                         save_checkpoint(writer, agent, i_episode, scores, scores_window, scheduler, env)
 
                if np.mean(scores_window) >= score_solved:
                     rospy.logwarn('Environment solved in ' + str(i_episode) + ' episodes!' + ' Average Score: ' + str(np.mean(scores_window)))
-                    torch.save(agent.actor_local.state_dict(), os.path.join(checkpoints_dir, 'actor_checkpoint.pth'))
-                    torch.save(agent.critic_local.state_dict(), os.path.join(checkpoints_dir, 'critic_checkpoint.pth'))
+                    writer.save('actor_checkpoint.pth', agent.actor_local.state_dict())
+                    writer.save('critic_checkpoint.pth', agent.critic_local.state_dict())
                     break
 
+          scheduler.stop()
+          writer.close()
           return scores
-     
-          
+
+
+def td3_vectorized(n_episodes, max_t, score_solved, param, CONFIG_PATH):
+     """
+     parameters
+     ======
+          n_episodes (int): maximum number of training episodes (summed over all robots)
+          max_t(int): maximum number of timesteps per episode
+     """
+
+     state_dim = param["ENVIRONMENT_DIM"] + param["ROBOT_DIM"]
+     action_dim = param["ACTION_DIM"]
+     num_envs = param["NUM_ENVS"]
+
+     torch.manual_seed(0)
+     np.random.seed(0)
+
+     agent = Agent(state_size=state_dim, action_size=action_dim, random_seed=0, CONFIG_PATH=CONFIG_PATH)
+
+     agent.actor_local.load_state_dict(torch.load(param["TRAIN"] + "actor_model.pth", map_location=torch.device('cpu')))
+     agent.critic_local.load_state_dict(torch.load(param["TRAIN"] + "critic_model.pth", map_location=torch.device('cpu')))
+
+     env = VecSimEnv(CONFIG_PATH, num_envs, seed=0)
+     scheduler = UpdateScheduler.from_config(agent, param)
+     writer = CheckpointWriter(checkpoints_dir, param["KEEP_CHECKPOINTS"])
+
+     scores_window = deque(maxlen=100)                                     # scores of the most recent episodes
+     scores = []                                                           # list of scores of each episode
+     score = np.zeros(num_envs)                                            # running score of each robot
+     i_episode = 0
+
+     if param["TYPE"] == 1:                                                # episodes in progress are restarted
+          state = resume(agent, scheduler, env)
+          if state is not None:
+               scores = state["scores"]
+               scores_window.extend(state["scores_window"])
+               i_episode = state["episode"]
+
+     states = env.reset_env().copy()
+     while i_episode <= n_episodes:
+          with scheduler.lock:
+               action = agent.action(states)                               # one batched forward pass for all robots
+          actions = np.column_stack([(action[:, 0] + 1) / 2, action[:, 1]])
+          timesteps = env.timesteps.copy()
+          next_states, rewards, dones, _ = env.step_env(actions)           # finished robots are reset by the environment
+          with scheduler.lock:
+               for i in range(num_envs):
+                    agent.step(states[i], actions[i], rewards[i], next_states[i], dones[i], timesteps[i], i_episode, scores)
+          scheduler.step(num_envs)
+          score += rewards
+          states = env.states.copy()
+
+          for i in np.flatnonzero(dones | (timesteps + 1 >= max_t)):       # run the learning step for each finished episode
+               scheduler.end_episode(int(timesteps[i]))
+               scores_window.append(score[i])
+               scores.append(score[i])
+               score[i] = 0.0
+               i_episode += 1
+
+               print('\rEpisode {}\tAverage Score: {:.2f}\tScore: {:.2f}'.format(i_episode, np.mean(scores_window), scores[-1]), end="")
+
+               if i_episode % param.CHECKPOINT_EVERY == 0:
+                    with scheduler.lock:
+                         save_checkpoint(writer, agent, i_episode, scores, scores_window, scheduler, env)
+
+          if len(scores_window) > 0 and np.mean(scores_window) >= score_solved:
+               rospy.logwarn('Environment solved in ' + str(i_episode) + ' episodes!' + ' Average Score: ' + str(np.mean(scores_window)))
+               writer.save('actor_checkpoint.pth', agent.actor_local.state_dict())
+               writer.save('critic_checkpoint.pth', agent.critic_local.state_dict())
+               break
+
+     scheduler.stop()
+     writer.close()
+     return scores
+
 if __name__ == '__main__':
      """Start training."""
      
@@ -101,4 +211,11 @@ if __name__ == '__main__':
      score_solved = param["SCORE_SOLVED"]
      
 
-     td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful)
\ No newline at end of file
+     if param["TYPE"] == 2:
+          Navigation(CONFIG_PATH).spin()
+     elif param["NUM_WORKERS"] > 0:
+          train_distributed(n_episodes, max_t, score_solved, param, CONFIG_PATH, checkpoints_dir)
+     elif param["BACKEND"] == 'sim' and param["NUM_ENVS"] > 1:
+          td3_vectorized(n_episodes, max_t, score_solved, param, CONFIG_PATH)
+     else:
+          td3(n_episodes, print_every, max_t, score_solved, param, CONFIG_PATH, useful)
\ No newline at end of file
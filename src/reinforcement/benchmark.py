@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import torch
+import time
+import os
+
+from reinforcement.agent import Agent
+
+def fill_memory(agent, n_transitions, seed=0):
+    """Fill the replay memory of agent with the same random transitions for every run."""
+    rng = np.random.default_rng(seed)
+    states = rng.uniform(0, 10, (n_transitions, agent.state_size)).astype(np.float32)
+    actions = rng.uniform(-1, 1, (n_transitions, agent.action_size)).astype(np.float32)
+    rewards = rng.normal(0, 1, n_transitions)
+    dones = rng.random(n_transitions) < 0.05
+    for i in range(n_transitions - 1):
+        agent.memory.add(states[i], actions[i], rewards[i], states[i + 1], dones[i])
+
+def updates_per_second(CONFIG_PATH, train_mode, autocast, n_updates=500, n_warmup=50, n_transitions=20000):
+    """Gradient steps per second of Agent.learn with the given training mode on a fixed replay memory."""
+    torch.manual_seed(0)
+    agent = Agent(state_size=24, action_size=2, random_seed=0, CONFIG_PATH=CONFIG_PATH)
+    agent.configure_training(train_mode, autocast)
+    fill_memory(agent, n_transitions)
+
+    # compilation and allocator warmup
+    agent.learn(n_warmup)
+
+    start = time.perf_counter()
+    agent.learn(n_updates)
+    elapsed = time.perf_counter() - start
+
+    if agent.prefetcher is not None:
+        agent.prefetcher.close()
+    return n_updates / elapsed
+
+if __name__ == '__main__':
+    """Compare updates per second of the eager, compiled and bfloat16 training modes."""
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+
+    for train_mode, autocast in [('eager', 'none'), ('eager', 'bf16'), ('compile', 'none'), ('compile', 'bf16')]:
+        rate = updates_per_second(CONFIG_PATH, train_mode, autocast)
+        print('{:<8} {:<5} {:.0f} updates/s'.format(train_mode, autocast, rate))
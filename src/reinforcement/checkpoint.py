@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+from functools import partial
+import threading
+import queue
+import random
+import numpy as np
+import torch
+import glob
+import os
+
+def snapshot(state):
+    """Copy the tensors and arrays of a nested state, so training can go on while it is written.
+
+    The deferred parts (functools.partial) are left as they are, resolve() produces them later:
+    they stand for what is too large to copy on the training thread, like the replay memory.
+    """
+    if isinstance(state, torch.Tensor):
+        return state.detach().cpu().clone()
+    if isinstance(state, np.ndarray):
+        return np.array(state)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+def resolve(state):
+    """Replace the deferred parts (functools.partial) of a nested state by their value."""
+    if isinstance(state, partial):
+        return resolve(state())
+    if isinstance(state, dict):
+        return {key: resolve(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(resolve(value) for value in state)
+    return state
+
+def rng_state():
+    """State of the torch, CUDA, NumPy and Python random generators."""
+    state = {'torch': torch.get_rng_state(), 'numpy': np.random.get_state(), 'random': random.getstate()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    np.random.set_state(state['numpy'])
+    random.setstate(state['random'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def latest_checkpoint(directory, prefix='checkpoint_'):
+    """Path of the most recent complete checkpoint in directory, None when there is none."""
+    paths = sorted(glob.glob(os.path.join(directory, prefix + '*.pth')))
+    return paths[-1] if paths else None
+
+def load_checkpoint(path):
+    return torch.load(path, map_location=torch.device('cpu'), weights_only=False)
+
+def training_state(agent, episode, scores, scores_window, scheduler=None, env=None):
+    """Full training state after episode, to be saved with CheckpointWriter.save.
+
+    Pause the prefetching of the agent first (agent.pause_prefetch), so that the RNG state of
+    the memory matches the next batch trained on.
+    """
+    return {"agent": agent.state_dict(),
+            "scheduler": scheduler.state_dict() if scheduler is not None else None,
+            "episode": episode,
+            "scores": scores,
+            "scores_window": list(scores_window),
+            "rng": rng_state(),
+            "env_rng": env.rng.bit_generator.state if hasattr(env, 'rng') else None}
+
+def restore_training_state(state, agent, scheduler=None, env=None):
+    """Load a training_state() into agent, scheduler, env and the random generators."""
+    agent.load_state_dict(state["agent"])
+    if scheduler is not None and state["scheduler"] is not None:
+        scheduler.load_state_dict(state["scheduler"])
+    set_rng_state(state["rng"])
+    if state["env_rng"] is not None and hasattr(env, 'rng'):
+        env.rng.bit_generator.state = state["env_rng"]
+
+def resume_training(directory, agent, scheduler=None, env=None):
+    """Restore the latest full checkpoint of directory, returns its path and state, (None, None) when there is none."""
+    path = latest_checkpoint(directory)
+    if path is None:
+        return None, None
+    state = load_checkpoint(path)
+    restore_training_state(state, agent, scheduler, env)
+    return path, state
+
+def save_checkpoint(writer, agent, episode, scores, scores_window, scheduler=None, env=None):
+    """Queue the full training state and the weights of episode on writer (hold the lock of the scheduler, if any)."""
+    agent.pause_prefetch()
+    writer.save('checkpoint_{:08d}.pth'.format(episode), training_state(agent, episode, scores, scores_window, scheduler, env))
+    writer.save('{}_actor_checkpoint.pth'.format(episode), agent.actor_local.state_dict())
+    writer.save('{}_critic_checkpoint.pth'.format(episode), agent.critic_local.state_dict())
+
+class CheckpointWriter():
+    """Writes checkpoints on a background thread.
+
+    save() copies the state on the calling thread and returns; the deferred parts are produced
+    on the writer thread, then the state is written to a temporary file, synced and renamed
+    over the final name, so a crash never leaves a partial checkpoint behind. Only the last `keep` files named prefix + '*.pth' are kept.
+    """
+
+    def __init__(self, directory, keep=3, prefix='checkpoint_'):
+        """Initialize a CheckpointWriter object.
+        Params
+        ======
+            directory (str): folder of the checkpoints
+            keep (int): number of most recent checkpoints kept, 0 -> keep all
+            prefix (str): file name prefix of the rotated checkpoints
+        """
+
+        self.directory = directory
+        self.keep = keep
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+        self.pending = queue.Queue(maxsize=2)
+        self.errors = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, name, state):
+        """Queue a copy of state (deferred parts excepted) to be written as directory/name."""
+        if self.errors:
+            raise self.errors.pop(0)
+        self.pending.put((name, snapshot(state)))
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                name, state = item
+                self.write(name, resolve(state))
+                self.rotate()
+            except Exception as error:
+                self.errors.append(error)
+            finally:
+                self.pending.task_done()
+
+    def write(self, name, state):
+        """Write state to a temporary file, sync it and rename it over directory/name."""
+        path = os.path.join(self.directory, name)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        # make the rename itself durable
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def rotate(self):
+        """Remove all but the `keep` most recent checkpoints."""
+        if self.keep <= 0:
+            return
+        paths = sorted(glob.glob(os.path.join(self.directory, self.prefix + '*.pth')))
+        for path in paths[:-self.keep]:
+            os.remove(path)
+
+    def wait(self):
+        """Block until every queued checkpoint is written."""
+        self.pending.join()
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def close(self):
+        self.wait()
+        self.pending.put(None)
+        self.thread.join()
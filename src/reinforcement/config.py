@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+from collections.abc import Mapping
+from functools import lru_cache
+import yaml
+import os
+
+ENV_PREFIX = 'REINFORCEMENT_'   # REINFORCEMENT_BATCH_SIZE=256 overrides BATCH_SIZE
+
+# ================== SCHEMA ================== #
+
+# expected type of every key, a tuple of allowed values for the enumerations
+SCHEMA = {
+    'TOPIC_CMD': str, 'TOPIC_ODOM': str, 'TOPIC_SCAN': str, 'TOPIC_GOAL': str, 'ROBOT': str,
+    'CONTROL_RATE': float, 'SENSOR_TIMEOUT': float, 'INFERENCE_BACKEND': ('numpy', 'torchscript'),
+    'GOAL_REACHED_DIST': float, 'COLLISION_DIST': float, 'ORIENTATION_THRESHOLD': float,
+    'ENVIRONMENT_DIM': int, 'ROBOT_DIM': int, 'ACTION_DIM': int, 'TIME_DELTA': float,
+    'STEP_MODE': ('sleep', 'event', 'world_step'), 'RESET_MODE': ('teleport', 'full'),
+    'RESET_TOLERANCE': float, 'RESET_TIMEOUT': float, 'POSE_SOURCE': str, 'POSE_CLEARANCE': float,
+    'MIN_GOAL_DISTANCE': float, 'MAX_GOAL_DISTANCE': float, 'DISTANCE_BUCKETS': int, 'POSE_BUCKET': int,
+    'NOISE_SIGMA': float, 'RANDOM_NEAR_OBSTACLE': bool,
+    'MAX_RANGE': float, 'BACKEND': ('gazebo', 'sim'), 'SIM_STEP': float, 'NUM_ENVS': int,
+    'NUM_WORKERS': int, 'SYNC_EVERY': int,
+    'GAZEBO_INSTANCES': int, 'GAZEBO_WORLD': str, 'ROS_BASE_PORT': int, 'GAZEBO_BASE_PORT': int, 'HEALTH_CHECK_EVERY': float,
+    'EVAL_EPISODES': int, 'EVAL_WORKERS': int, 'EVAL_SEED': int, 'EVAL_POSES': str,
+    'TYPE': (0, 1, 2), 'CHECKPOINT_EVERY': int, 'KEEP_CHECKPOINTS': int, 'BUFFER_SIZE': int,
+    'BUFFER_TYPE': ('deque', 'ring', 'memmap', 'prioritized'), 'PER_ALPHA': float, 'PER_BETA': float,
+    'PER_BETA_INCREMENT': float, 'PER_EPSILON': float, 'PREFETCH_DEPTH': int, 'BATCH_SIZE': int,
+    'TAU': float, 'LR_ACTOR': float, 'LR_CRITIC': float, 'FUSED_CRITIC': bool,
+    'TRAIN_MODE': ('eager', 'compile'), 'AUTOCAST': ('none', 'bf16'), 'WEIGHT_DECAY': float,
+    'EPSILON': float, 'EPSILON_DECAY': float, 'N_EPISODES': int, 'PRINT_EVERY': int,
+    'MAX_TIMESTEP': int, 'SCORE_SOLVED': float, 'POLICY_FREQ': int,
+    'UPDATE_MODE': ('episode', 'ratio'), 'UPDATE_RATIO': float, 'UPDATE_WARMUP': int,
+    'GRADIENT_STEPS': int, 'BACKGROUND_TRAINING': bool, 'POLICY_NOISE': float, 'CLIP_PARAM': float,
+    'NOISE_CLIP': float, 'MAX_ACTION': float, 'DISCOUNT': float,
+}
+
+# paths, relative ones are resolved against the package folder (the parent of CONFIG_PATH)
+PATHS = ('MODEL_PATH', 'RESULTS', 'TRAIN', 'POLICY', 'MODEL')
+
+def check(key, value, expected):
+    """Error message when value does not match the expected type or values, None when it does."""
+    if isinstance(expected, tuple):
+        if value not in expected or isinstance(value, bool) != isinstance(expected[0], bool):
+            return '{} must be one of {}, got {!r}'.format(key, expected, value)
+    elif expected is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return '{} must be a number, got {!r}'.format(key, value)
+    elif expected is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            return '{} must be an integer, got {!r}'.format(key, value)
+    elif not isinstance(value, expected):
+        return '{} must be a {}, got {!r}'.format(key, expected.__name__, value)
+    return None
+
+def check_relations(values):
+    """Error messages of the parameters whose valid values depend on other parameters."""
+    errors = []
+    buckets, bucket = values.get('DISTANCE_BUCKETS'), values.get('POSE_BUCKET')
+    if isinstance(buckets, int) and isinstance(bucket, int) and not -1 <= bucket < buckets:
+        errors.append('POSE_BUCKET must be -1 or a bucket below DISTANCE_BUCKETS ({}), got {}'.format(buckets, bucket))
+    return errors
+
+def resolve(path, root):
+    """Expand ~ and environment variables, relative paths are taken from root. Trailing slashes are kept."""
+    path = os.path.expandvars(os.path.expanduser(path))
+    return path if os.path.isabs(path) else os.path.join(root, path)
+
+# ================== CONFIG ================== #
+
+class Config(Mapping):
+    """Read-only, validated parameters of config.yaml.
+
+    Values are read as attributes (config.BATCH_SIZE) or, like the dictionary it replaces,
+    by key (config["BATCH_SIZE"]). CONFIG_PATH is the folder the file was loaded from.
+    """
+
+    def __init__(self, values):
+        """Initialize a Config object.
+        Params
+        ======
+            values (dict): parsed parameters, checked against SCHEMA
+        """
+
+        errors = [check(key, values[key], expected) for key, expected in SCHEMA.items() if key in values]
+        errors += ['{} is missing'.format(key) for key in SCHEMA if key not in values]
+        errors += ['{} is not a known parameter'.format(key) for key in values
+                   if key not in SCHEMA and key not in PATHS and key != 'CONFIG_PATH']
+        errors = [error for error in errors if error is not None]
+        if not errors:
+            errors = check_relations(values)
+        if errors:
+            raise ValueError('Invalid configuration:\n  ' + '\n  '.join(errors))
+
+        object.__setattr__(self, 'params', dict(values))
+        self.__dict__.update(values)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Config is read-only, set {} in config.yaml or {}{}'.format(key, ENV_PREFIX, key))
+
+    def __delattr__(self, key):
+        raise AttributeError('Config is read-only')
+
+    def __getitem__(self, key):
+        return self.params[key]
+
+    def __iter__(self):
+        return iter(self.params)
+
+    def __len__(self):
+        return len(self.params)
+
+    def __repr__(self):
+        return 'Config({})'.format(self.params)
+
+def overrides(environ):
+    """Parameters set in the environment as REINFORCEMENT_<KEY>, parsed as YAML values."""
+    return {key[len(ENV_PREFIX):]: yaml.safe_load(value) for key, value in environ.items() if key.startswith(ENV_PREFIX)}
+
+@lru_cache(maxsize=None)
+def parse_config(path):
+    """Parse, override, resolve and validate the configuration file once per process."""
+    with open(path) as file:
+        values = yaml.safe_load(file)
+    values.update(overrides(os.environ))
+
+    config_dir = os.path.dirname(path)
+    root = os.path.dirname(config_dir)
+    for key in PATHS:
+        if key in values:
+            values[key] = resolve(values[key], root)
+    values['CONFIG_PATH'] = config_dir + os.sep
+
+    return Config(values)
+
+def load_config(CONFIG_PATH, config_name='config.yaml'):
+    """Shared Config of CONFIG_PATH/config_name, parsed on the first call only."""
+    return parse_config(os.path.realpath(os.path.join(CONFIG_PATH, config_name)))
+
+@lru_cache(maxsize=None)
+def load_poses(path):
+    """(x, y, yaw) of every position of a pose file, parsed on the first call only."""
+    with open(path) as file:
+        data = yaml.safe_load(file)
+    return tuple(tuple(float(str(value).strip('[]')) for value in pose['position'][:3]) for pose in data)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+import torch
+import torch.multiprocessing as mp
+import numpy as np
+import queue
+import time
+import os
+
+from reinforcement.agent import Agent
+from reinforcement.model import Actor
+from reinforcement.pool import EnvironmentPool
+from reinforcement.checkpoint import CheckpointWriter, resume_training, save_checkpoint
+from collections import deque
+
+import rospy
+
+def make_env(param, CONFIG_PATH, seed):
+    """Create the environment of a rollout worker for the configured backend."""
+    if param["BACKEND"] == 'sim':
+        from reinforcement.simulation import SimEnv
+        return SimEnv(CONFIG_PATH, seed=seed)
+
+    from reinforcement.environment import Env
+    return Env(CONFIG_PATH)
+
+def check_workers(param):
+    """Raise ValueError when several workers would drive the same Gazebo robot.
+
+    With BACKEND 'gazebo' every worker needs its own instance: one worker may use the running
+    simulation (GAZEBO_INSTANCES 0), more need an EnvironmentPool with an instance per worker.
+    """
+    num_workers, instances = param["NUM_WORKERS"], param["GAZEBO_INSTANCES"]
+    if param["BACKEND"] != 'gazebo' or num_workers <= max(instances, 1):
+        return
+    if instances == 0:
+        raise ValueError('NUM_WORKERS ({}) > 1 with BACKEND gazebo needs GAZEBO_INSTANCES >= NUM_WORKERS, '
+                         'every worker would drive the robot of the running simulation'.format(num_workers))
+    raise ValueError('NUM_WORKERS ({}) must not exceed GAZEBO_INSTANCES ({}): workers sharing an instance command the same robot'
+                     .format(num_workers, instances))
+
+def stop_workers(workers, stops, transitions, timeout=10.0):
+    """Ask the workers to exit and join them, terminating only those still running after timeout.
+
+    The queue is drained meanwhile, so that a worker blocked on put can exit; the drained
+    items are returned. Terminating a worker during put would corrupt the queue of the others.
+    """
+    for stop in stops:
+        stop.set()
+
+    drained = []
+    deadline = time.monotonic() + timeout
+    while any(worker.is_alive() for worker in workers) and time.monotonic() < deadline:
+        try:
+            drained.append(transitions.get(timeout=0.1))
+        except queue.Empty:
+            pass
+
+    for worker in workers:
+        if worker.is_alive():
+            rospy.logwarn('Distributed                 => Worker did not exit within {} s, terminating it'.format(timeout))
+            worker.terminate()
+        worker.join()
+    return drained
+
+def rollout_worker(worker_id, param, CONFIG_PATH, shared_actor, version, transitions, stop, environment=None):
+    """Run episodes with a local copy of the shared actor and send them to the learner.
+
+    Params
+    ======
+        worker_id (int): index of the worker, used as random seed
+        param (dict): training configuration of the learner
+        shared_actor (Actor): actor in shared memory, refreshed by the learner
+        version (mp.Value): incremented by the learner each time shared_actor changes
+        transitions (mp.Queue): (worker_id, episode transitions, score) sent after every episode
+        stop (mp.Event): set by the learner to end this worker
+        environment (dict): ROS_MASTER_URI / GAZEBO_MASTER_URI of the Gazebo instance of the worker
+    """
+    os.environ.update(environment or {})
+    torch.set_num_threads(1)
+    torch.manual_seed(worker_id)
+    np.random.seed(worker_id)
+
+    max_t = param["MAX_TIMESTEP"]
+    env = make_env(param, CONFIG_PATH, worker_id)
+
+    actor = Actor(param["ENVIRONMENT_DIM"] + param["ROBOT_DIM"])
+    local_version = -1
+
+    while not stop.is_set():
+        # ================== REFRESH ACTOR WEIGHTS ================== #
+        if version.value != local_version:
+            with version.get_lock():
+                local_version = version.value
+                actor.load_state_dict(shared_actor.state_dict())
+
+        # ================== RUN ONE EPISODE ================== #
+        episode = []
+        score = 0.0
+        state = env.reset_env()
+        for t in range(max_t):
+            with torch.no_grad():
+                action = actor(torch.as_tensor(state, dtype=torch.float32).view(1, -1)).numpy().flatten()
+            action = [(action[0] + 1) / 2, action[1]]
+            next_state, reward, done, _ = env.step_env(action)
+            episode.append((state, action, reward, next_state, done))
+            state = next_state
+            score += reward
+            if done or stop.is_set():
+                break
+
+        transitions.put((worker_id, episode, score))
+
+def train_distributed(n_episodes, max_t, score_solved, param, CONFIG_PATH, checkpoints_dir):
+    """Train with NUM_WORKERS rollout processes feeding a learner that owns the agent.
+
+    The learner trains continuously on the replay buffer and publishes the actor
+    weights to the workers every SYNC_EVERY learning iterations.
+
+    Params
+    ======
+        n_episodes (int): maximum number of training episodes (summed over all workers)
+        max_t(int): maximum number of timesteps per episode
+    """
+    state_dim = param["ENVIRONMENT_DIM"] + param["ROBOT_DIM"]
+    action_dim = param["ACTION_DIM"]
+    num_workers = param["NUM_WORKERS"]
+    sync_every = param["SYNC_EVERY"]
+    policy_freq = param["POLICY_FREQ"]
+
+    check_workers(param)
+
+    torch.manual_seed(0)
+    np.random.seed(0)
+
+    agent = Agent(state_size=state_dim, action_size=action_dim, random_seed=0, CONFIG_PATH=CONFIG_PATH)
+
+    agent.actor_local.load_state_dict(torch.load(param["TRAIN"] + "actor_model.pth", map_location=torch.device('cpu')))
+    agent.critic_local.load_state_dict(torch.load(param["TRAIN"] + "critic_model.pth", map_location=torch.device('cpu')))
+    writer = CheckpointWriter(checkpoints_dir, param["KEEP_CHECKPOINTS"])
+
+    scores_window = deque(maxlen=100)                                   # scores of the most recent episodes
+    scores = []                                                         # list of scores of each episode
+    i_episode = 0
+    iteration = 0
+
+    # ================== RESUME TRAINING ================== #
+    # the workers start from the resumed actor, their episodes in progress are not saved
+    if param["TYPE"] == 1:
+        path, state = resume_training(checkpoints_dir, agent)
+        if state is None:
+            rospy.logwarn('No checkpoint in ' + checkpoints_dir + ', training from the pre-trained model')
+        else:
+            scores = state["scores"]
+            scores_window.extend(state["scores_window"])
+            i_episode = state["episode"]
+            rospy.loginfo('Resuming training from ' + path)
+
+    # ================== START ROLLOUT WORKERS ================== #
+    ctx = mp.get_context('spawn')
+    shared_actor = Actor(state_dim)
+    shared_actor.load_state_dict(agent.actor_local.state_dict())
+    shared_actor.share_memory()
+    version = ctx.Value('i', 0)
+    transitions = ctx.Queue(maxsize=4 * num_workers)
+    stops = [None] * num_workers                                        # stop event of each worker, so a single one can be restarted
+    pending = deque()                                                   # episodes drained while stopping workers
+
+    # one Gazebo instance per worker, GAZEBO_INSTANCES 0 -> the worker uses the running simulation
+    pool = None
+    if param["BACKEND"] == 'gazebo' and param["GAZEBO_INSTANCES"] > 0:
+        pool = EnvironmentPool.from_config(param, log_dir=os.path.join(param["RESULTS"], 'gazebo')).start()
+
+    def start_worker(i):
+        environment = pool.environment(i) if pool is not None else None
+        stops[i] = ctx.Event()
+        worker = ctx.Process(target=rollout_worker, args=(i, param, CONFIG_PATH, shared_actor, version, transitions, stops[i], environment), daemon=True)
+        worker.start()
+        return worker
+
+    workers = [start_worker(i) for i in range(num_workers)]
+
+    try:
+        while i_episode < n_episodes:
+            # ================== COLLECT FINISHED EPISODES ================== #
+            # block only while there is nothing to train on yet
+            block = len(agent.memory) <= agent.batch_size
+            while True:
+                try:
+                    worker_id, episode, score = pending.popleft() if pending else transitions.get(block=block, timeout=1.0)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        raise RuntimeError('All rollout workers exited')
+                    break
+                block = False
+
+                for t, (state, action, reward, next_state, done) in enumerate(episode):
+                    agent.step(state, action, reward, next_state, done, t, i_episode, scores)
+                scores_window.append(score)
+                scores.append(score)
+                i_episode += 1
+
+                print('\rEpisode {}\tWorker {}\tAverage Score: {:.2f}\tScore: {:.2f}'.format(i_episode, worker_id, np.mean(scores_window), score), end="")
+
+                if i_episode % param["CHECKPOINT_EVERY"] == 0:
+                    save_checkpoint(writer, agent, i_episode, scores, scores_window)
+
+            if len(scores_window) > 0 and np.mean(scores_window) >= score_solved:
+                rospy.logwarn('Environment solved in ' + str(i_episode) + ' episodes!' + ' Average Score: ' + str(np.mean(scores_window)))
+                writer.save('actor_checkpoint.pth', agent.actor_local.state_dict())
+                writer.save('critic_checkpoint.pth', agent.critic_local.state_dict())
+                break
+
+            # ================== RESTART WORKERS OF RESTARTED INSTANCES ================== #
+            if pool is not None:
+                for i in pool.poll_restarted(num_workers):
+                    rospy.logwarn('Distributed                 => Restarting worker {} with its Gazebo instance'.format(i))
+                    pending.extend(stop_workers([workers[i]], [stops[i]], transitions))
+                    workers[i] = start_worker(i)
+
+            # ================== LEARN ================== #
+            # POLICY_FREQ critic updates and one delayed actor update per iteration
+            agent.learn(policy_freq)
+            iteration += 1
+
+            # ================== PUBLISH ACTOR WEIGHTS ================== #
+            if iteration % sync_every == 0:
+                with version.get_lock():
+                    with torch.no_grad():
+                        for shared, local in zip(shared_actor.parameters(), agent.actor_local.parameters()):
+                            shared.copy_(local)
+                    version.value += 1
+
+    finally:
+        stop_workers(workers, stops, transitions)
+        if pool is not None:
+            pool.close()
+        writer.close()
+
+    return scores
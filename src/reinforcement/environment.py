@@ -3,24 +3,36 @@
 import rospy
 import numpy as np
 import time
-import math
 
 from geometry_msgs.msg import Twist
 from sensor_msgs.msg import LaserScan
 from nav_msgs.msg import Odometry
 from gazebo_msgs.msg import ModelState
-from gazebo_msgs.srv import SetLightProperties
+from gazebo_msgs.srv import SetLightProperties, SetModelState
 
 from std_srvs.srv import Empty
-from squaternion import Quaternion
 
-from utils import Extension
+from reinforcement.utils import Extension
+from reinforcement.geometry import robot_state, distance_to_goal, yaw_from_quaternion
+from reinforcement.scan import ScanProcessor
+from reinforcement.observation import ObservationBuffer
+from reinforcement.stepping import ros_world_stepper
+from reinforcement.inference import LatencyTracker
+from reinforcement.sampler import PoseSampler
 
 class Env():
-    def __init__(self, CONFIG_PATH):
+    def __init__(self, CONFIG_PATH, node_name="gym", gazebo_ns="/gazebo"):
+        """Initialize an Env object.
+        Params
+        ======
+            CONFIG_PATH (str): folder of config.yaml
+            node_name (str): name of the ROS node, made unique with anonymous=True
+            gazebo_ns (str): namespace of the Gazebo services and topics
+        """
 
         self.useful = Extension(CONFIG_PATH)
-        rospy.init_node("gym", anonymous=True)
+        self.gazebo_ns = gazebo_ns.rstrip('/')
+        rospy.init_node(node_name, anonymous=True)
 
         # Function to load yaml configuration file
         param = self.useful.load_config("config.yaml")
@@ -37,23 +49,28 @@ class Env():
         self.odom = param["TOPIC_ODOM"]
         self.scan = param["TOPIC_SCAN"]
         self.max_range = param["MAX_RANGE"]
+        self.step_mode = param["STEP_MODE"]
+        self.reset_mode = param["RESET_MODE"]
+        self.reset_tolerance = param["RESET_TOLERANCE"]
+        self.reset_timeout = param["RESET_TIMEOUT"]
 
         # initialize global variables
-        self.odomX = 0                                          
-        self.odomY = 0
-        self.goalX = 1                                          
-        self.goalY = 0.0
+        self.odom_x = 0.0
+        self.odom_y = 0.0
+        self.goal_x = 1.0
+        self.goal_y = 0.0
 
         self.last_odom_y = None
         self.last_odom_x = None
 
-        self.path_waypoints = 'poses.yaml' # param["CONFIG_PATH"] + 'poses.yaml'
-        self.path_random = 'random.yaml' # param["CONFIG_PATH"] + 'random.yaml'
-
-        self.goals = self.useful.poses('poses.yaml')
-        self.objects = self.useful.poses('random.yaml')
+        # start/goal pairs precomputed on the map, POSE_BUCKET selects a curriculum bucket (-1 -> all)
+        self.sampler = PoseSampler.from_config(param)
+        self.pose_bucket = param["POSE_BUCKET"]
         self.last_odom = None
-        self.distOld = math.sqrt(math.pow(self.odomX - self.goalX, 2) + math.pow(self.odomY - self.goalY, 2))
+        self.distOld = distance_to_goal(self.odom_x, self.odom_y, self.goal_x, self.goal_y)
+
+        self.scan_processor = ScanProcessor(self.environment_dim, self.max_range, self.noise_sigma)
+        self.observations = ObservationBuffer()
 
         # ROS publications and subscriptions
         self.pub_cmd_vel = rospy.Publisher(self.cmd, Twist, queue_size=10)
@@ -61,37 +78,53 @@ class Env():
         self.scan = rospy.Subscriber(self.scan, LaserScan, self.scan_callback)
 
         # ROS services 
-        self.reset = rospy.ServiceProxy('gazebo/reset_world', Empty)
-        self.pause = rospy.ServiceProxy("/gazebo/pause_physics", Empty)
-        self.unpause = rospy.ServiceProxy("/gazebo/unpause_physics", Empty)
-        self.set_state = rospy.Publisher("gazebo/set_model_state", ModelState, queue_size=10)
-        self.set_light_properties = rospy.ServiceProxy("/gazebo/set_light_properties", SetLightProperties)
+        self.reset = rospy.ServiceProxy(self.gazebo_ns + '/reset_world', Empty)
+        self.pause = rospy.ServiceProxy(self.gazebo_ns + "/pause_physics", Empty)
+        self.unpause = rospy.ServiceProxy(self.gazebo_ns + "/unpause_physics", Empty)
+        self.set_light_properties = rospy.ServiceProxy(self.gazebo_ns + "/set_light_properties", SetLightProperties)
+        rospy.wait_for_service(self.gazebo_ns + "/set_model_state")
+        self.set_model_state = rospy.ServiceProxy(self.gazebo_ns + "/set_model_state", SetModelState, persistent=True)
+
+        self.reset_latency = LatencyTracker(window=100)     # seconds per reset_env, printed with reset_report()
+        self.full_resets = 0
+
+        # persistent pause/unpause proxies and sim-clock stepping, services are waited for once here
+        self.stepper = ros_world_stepper(self.time_delta, gazebo_ns=self.gazebo_ns) if self.step_mode == 'world_step' else None
 
         rospy.sleep(1)
 
     def odom_callback(self, msg):
-        self.last_odom = msg.pose.pose
+        self.observations.update_odom(msg.header.stamp.to_sec(), msg.pose.pose)
 
     def scan_callback(self, scan):
-        scan_range = []
-
-        for i in range(len(scan.ranges)):
-            if scan.ranges[i] == float('Inf'):
-                scan_range.append(self.max_range)
-            elif np.isnan(scan.ranges[i]):
-                scan_range.append(0)
-            else:
-                scan_range.append(scan.ranges[i])
-
-        # Select only 20 lidar data points
-        selected_ranges = scan_range[:20]
-
-        # Ensure the length is exactly 20, padding with zeros if needed
-        selected_ranges.extend([0] * (20 - len(selected_ranges)))
+        # inf/NaN replacement and min-pooling into ENVIRONMENT_DIM sectors, noise is added to the state only
+        self.observations.update_scan(scan.header.stamp.to_sec(), self.scan_processor.process(scan.ranges))
+
+    def read_observation(self):
+        """Take a consistent snapshot of the latest scan and the odometry paired with it."""
+        observation = self.observations.snapshot()
+        if observation is not None:
+            self.scan_data, self.last_odom = observation.scan, observation.odom
+
+    def run_physics(self):
+        """Unpause the simulation for one control period and pause it again."""
+        if self.step_mode == 'world_step':
+            self.stepper.step()
+            return
+
+        rospy.wait_for_service(self.gazebo_ns + "/unpause_physics")
+        stamp = rospy.get_time()
+        self.unpause()
+
+        if self.step_mode == 'event':
+            # return as soon as a scan taken after the unpause arrives (at most TIME_DELTA)
+            self.observations.wait_newer(stamp, self.time_delta)
+        else:
+            time.sleep(self.time_delta)
 
-        #print("Laser estado: ", np.array(selected_ranges))
+        rospy.wait_for_service(self.gazebo_ns + "/pause_physics")
 
-        self.scan_data = np.array(selected_ranges)
+        self.pause()
 
     def step_env(self, action):
         target = False
@@ -107,22 +140,18 @@ class Env():
             rospy.logerr('Publish Action              => Failed to publish action')
 
         # ================== UNPAUSE SIMULATION ================== #
-        rospy.wait_for_service("/gazebo/unpause_physics")
         try:
-            self.unpause()
-
-            time.sleep(self.time_delta)
-
-            rospy.wait_for_service("/gazebo/pause_physics")
-
-            self.pause()
+            self.run_physics()
             
         except:
             rospy.logerr('Unpause Simulation          => Error unpause simulation')
 
+        self.read_observation()
+
         # ================== READ SCAN DATA ================== #
+        # collisions are checked on the noise-free scan, NOISE_SIGMA only applies to the state
 
-        min_laser = min(self.scan_data)
+        min_laser = self.scan_data.min()
         if min_laser < self.collision_dist:
             done, collision, min_laser = True, True, min_laser
         else:
@@ -130,7 +159,7 @@ class Env():
 
         try:
             v_state = []
-            v_state[:] = self.scan_data[:]
+            v_state[:] = self.scan_processor.add_noise(self.scan_data)
             state_laser = [v_state]
         
         except:
@@ -145,14 +174,8 @@ class Env():
             self.odom_x = self.last_odom.position.x
             self.odom_y = self.last_odom.position.y
 
-            quaternion = Quaternion(
-                self.last_odom.orientation.x,
-                self.last_odom.orientation.y,
-                self.last_odom.orientation.z,
-                self.last_odom.orientation.w
-            )
-            euler = quaternion.to_euler(degrees=False)
-            angle = round(euler[2], 4)
+            orientation = self.last_odom.orientation
+            angle = round(yaw_from_quaternion(orientation.x, orientation.y, orientation.z, orientation.w), 4)
         except:
             rospy.logfatal('Read Odom Data              => Error reading odometry data')
             self.odom_x = 0.0
@@ -160,26 +183,11 @@ class Env():
             angle = 0.0
 
         # ================== CALCULATE DISTANCE AND THETA ================== #
-        Dist = math.sqrt(math.pow(self.odomX - self.goalX, 2) + math.pow(self.odomY - self.goalY, 2))
-        skewX = self.goalX - self.odomX
-        skewY = self.goalY - self.odomY
-        dot = skewX * 1 + skewY * 0
-        mag1 = math.sqrt(math.pow(skewX, 2) + math.pow(skewY, 2))
-        mag2 = math.sqrt(math.pow(1, 2) + math.pow(0, 2))
-        beta = math.acos(dot / (mag1 * mag2))
-        if skewY < 0:
-            if skewX < 0: beta = -beta
-            else: beta = 0 - beta
-        beta2 = (beta - angle)
-        if beta2 > np.pi:
-            beta2 = np.pi - beta2
-            beta2 = -np.pi - beta2
-        if beta2 < -np.pi:
-            beta2 = -np.pi - beta2
-            beta2 = np.pi - beta2
+        toGoal = robot_state(self.odom_x, self.odom_y, self.goal_x, self.goal_y, angle, action[0], action[1])
+        Dist = toGoal[0]
 
         r3 = lambda x: 1 - x if x < 1 else 0.0
-        reward = action[0] / 2 - abs(action[1]) / 2 - r3(min(state_laser[0])) / 2
+        reward = action[0] / 2 - abs(action[1]) / 2 - r3(min_laser) / 2
         self.distOld = Dist
 
         # ================== ORIENTATION GOAL ================== #
@@ -197,13 +205,11 @@ class Env():
         if Dist < 0.3:
             target = True
             done = True
-            self.distOld = math.sqrt(math.pow(self.odomX - self.goalX, 2) + math.pow(self.odomY - self.goalY, 2))
+            self.distOld = Dist
             reward = 80
         if collision:
             reward = -100
 
-        toGoal = [Dist, beta2, action[0], action[1]]
-
         state = np.append(state_laser, toGoal)
 
         # reward = 0.0
@@ -233,92 +239,89 @@ class Env():
 
         return state, reward, done, target
 
-    def reset_env(self):
-
-        rospy.wait_for_service("/gazebo/reset_simulation")
+    def reset_world(self):
         try:
             self.reset()
+        except rospy.ServiceException:
+            rospy.logerr('Reset World                 => Failed service call failed')
+
+    def model_state(self, name, x, y, yaw):
+        state = ModelState()
+        state.model_name = name
+        state.pose.position.x = x
+        state.pose.position.y = y
+        state.pose.position.z = 0.0
+        state.pose.orientation.z = np.sin(yaw / 2)
+        state.pose.orientation.w = np.cos(yaw / 2)
+        return state
 
-        except:
-            rospy.logerr('Reset Simulation           => Failed service call failed')
-
-        # ================== SET RANDOM ANGLE ================== #
-        angle = np.random.uniform(-np.pi, np.pi)
-        quaternion = Quaternion.from_euler(0.0, 0.0, angle)
+    def place_models(self, robot_x, robot_y, yaw, goal_x, goal_y):
+        """Stop the robot, teleport it and the target, run one control period and return the first observation after it.
 
-        # ================== SET RANDOM ORIENTATION ================== #
+        The set_model_state calls return once Gazebo applied them, so no fixed sleeps are needed.
+        """
+        self.pub_cmd_vel.publish(Twist())
         try:
-            self.goal_orientation = np.random.uniform(-np.pi, np.pi)
-        
-        except:
-            rospy.logerr('Set Random Orientation      => Error setting random orientation')
-            self.goal_orientation = 0.0
+            self.set_model_state(self.model_state(self.robot, robot_x, robot_y, yaw))
+            self.set_model_state(self.model_state('target', goal_x, goal_y, 0.0))
+        except rospy.ServiceException:
+            rospy.logerr('Set Model State             => Error teleporting the robot and target models')
 
-        # ================== SET RANDOM POSITION ================== #
+        stamp = rospy.get_time()
+        try:
+            self.run_physics()
+        except rospy.ServiceException:
+            rospy.logerr('Unpause Simulation          => Error unpause simulation')
+        return self.observations.wait_newer(stamp, self.reset_timeout)
 
-        time.sleep(self.time_delta)
+    def pose_reached(self, observation, x, y):
+        """The odometry published after the teleport puts the robot within RESET_TOLERANCE of (x, y)."""
+        if observation is None or observation.odom is None:
+            return False
+        position = observation.odom.position
+        return distance_to_goal(position.x, position.y, x, y) < self.reset_tolerance
 
-        goal, robot = self.select_poses(self.goals)
+    def reset_report(self):
+        return 'Reset {} | full resets {}'.format(self.reset_latency.report(), self.full_resets)
 
-        # ================== SET RANDOM ROBOT MODEL ================== #
-        try:
-            set_robot = ModelState()
-            set_robot.model_name = self.robot
-            set_robot.pose.position.x = 0
-            set_robot.pose.position.y = 2
-            set_robot.pose.position.z = 0.0
-            set_robot.pose.orientation.x = quaternion.x
-            set_robot.pose.orientation.y = quaternion.y
-            set_robot.pose.orientation.z = quaternion.z
-            set_robot.pose.orientation.w = quaternion.w
-            self.set_state.publish(set_robot)
-            self.odom_x, self.odom_y = 0, 2
-        
-        except:
-            rospy.logerr('Set Random Robot Model       => Error setting random robot model')
+    def reset_env(self, start=None, goal=None):
+        """Place the robot and the target, start (x, y, yaw) and goal (x, y) are fixed for evaluation.
 
-        time.sleep(self.time_delta)
+        RESET_MODE 'teleport' only moves the two models and checks the new robot pose through
+        odometry, the world is reset only when the robot did not get there; 'full' always resets it.
+        """
+        begin = time.perf_counter()
 
-        # ================== SET RANDOM GOAL MODEL ================== #
-        try:
-            set_target = ModelState()
-            set_target.model_name = 'target'
-            set_target.pose.position.x = 0
-            set_target.pose.position.y = -2
-            set_target.pose.position.z = 0.0
-            set_target.pose.orientation.x = 0.0
-            set_target.pose.orientation.y = 0.0
-            set_target.pose.orientation.z = 0.0
-            set_target.pose.orientation.w = 1.0
-            self.set_state.publish(set_target)
-            self.goal_x, self.goal_y = 0, -2
-        
-        except:
-            rospy.logerr('Set Random Goal Model       => Error setting random goal model')
-        
-        time.sleep(self.time_delta)
-
-        self.distOld = math.sqrt(math.pow(self.odomX - self.goalX, 2) + math.pow(self.odomY - self.goalY, 2))     
+        # ================== SET RANDOM ORIENTATION ================== #
+        self.goal_orientation = np.random.uniform(-np.pi, np.pi)
 
+        # ================== SET RANDOM POSITION AND ANGLE ================== #
+        sampled_start, sampled_goal = self.sampler.sample(np.random, self.pose_bucket)
+        robot_x, robot_y, angle = sampled_start if start is None else start[:3]
+        goal_x, goal_y = sampled_goal if goal is None else goal[:2]
 
-        # ================== UNPAUSE SIMULATION ================== #
-        rospy.wait_for_service("/gazebo/unpause_physics")
-        try:
-            self.unpause()
+        # ================== TELEPORT ROBOT AND GOAL MODELS ================== #
+        if self.reset_mode == 'full':
+            self.reset_world()
+        observation = self.place_models(robot_x, robot_y, angle, goal_x, goal_y)
 
-            time.sleep(self.time_delta)
+        if self.reset_mode == 'teleport' and not self.pose_reached(observation, robot_x, robot_y):
+            rospy.logwarn('Reset                       => Robot not at its start pose, resetting the world')
+            self.full_resets += 1
+            self.reset_world()
+            observation = self.place_models(robot_x, robot_y, angle, goal_x, goal_y)
 
-            rospy.wait_for_service("/gazebo/pause_physics")
+        self.odom_x, self.odom_y = robot_x, robot_y
+        self.goal_x, self.goal_y = goal_x, goal_y
+        self.distOld = distance_to_goal(self.odom_x, self.odom_y, self.goal_x, self.goal_y)
+        self.reset_latency.record(time.perf_counter() - begin)
 
-            self.pause()
-            
-        except:
-            rospy.logerr('Unpause Simulation          => Error unpause simulation')
+        self.read_observation()
 
         # ================== GET STATE SCAN ================== #
         try:
             v_state = []
-            v_state[:] = self.scan_data[:]
+            v_state[:] = self.scan_processor.add_noise(self.scan_data)
 
             state_laser = [v_state] 
 
@@ -343,48 +346,9 @@ class Env():
         # robot_state = [distance, theta, 0.0, 0.0]
         # state = np.append(state_laser, robot_state)
 
-        Dist = math.sqrt(math.pow(self.odomX - self.goalX, 2) + math.pow(self.odomY - self.goalY, 2))
-        skewX = self.goalX - self.odomX
-        skewY = self.goalY - self.odomY
-        dot = skewX * 1 + skewY * 0
-        mag1 = math.sqrt(math.pow(skewX, 2) + math.pow(skewY, 2))
-        mag2 = math.sqrt(math.pow(1, 2) + math.pow(0, 2))
-        beta = math.acos(dot / (mag1 * mag2))
-
-        if skewY < 0:
-            if skewX < 0: beta = -beta
-            else:beta = 0 - beta
-        beta2 = (beta - angle)
-        if beta2 > np.pi:
-            beta2 = np.pi - beta2
-            beta2 = -np.pi - beta2
-        if beta2 < -np.pi:
-            beta2 = -np.pi - beta2
-            beta2 = np.pi - beta2
-        toGoal = [Dist, beta2, 0.0, 0.0]
+        toGoal = robot_state(self.odom_x, self.odom_y, self.goal_x, self.goal_y, angle, 0.0, 0.0)
 
         state = np.append(state_laser, toGoal)
                   # ================== RETURN STATE ================== #
           # return np.array(state)
         return state
-     
-     # ==== Random Functions ==== #
-    def select_poses(self, poses):
-        """Select two random poses from the list of poses."""
-
-        if len(poses) < 2:
-            raise ValueError("The 'poses' list must have at least two elements")
-
-        index_robot = int(round(np.random.uniform(0, len(poses))))
-        index_target = int(round(np.random.uniform(0, len(poses))))
-
-        # Make sure that the robot and target are not the same
-        while index_robot == index_target:
-            index_target = int(round(np.random.uniform(0, len(poses))))
-
-        # Make sure that the robot and target are not too close to each other
-        while index_robot >= len(poses) or index_target >= len(poses):
-            index_robot = int(round(np.random.uniform(0, len(poses))))
-            index_target = int(round(np.random.uniform(0, len(poses))))
-
-        return poses[index_robot], poses[index_target]
\ No newline at end of file
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import multiprocessing as mp
+from statistics import NormalDist
+import numpy as np
+import torch
+import time
+import sys
+import os
+
+from reinforcement.utils import Extension
+from reinforcement.inference import ActorPolicy
+from reinforcement.pool import EnvironmentPool
+
+def free_poses(occupancy_map, poses, clearance=0.5):
+    """Poses whose disc of radius clearance is free in the occupancy map of the NumPy simulator."""
+    poses = np.asarray(poses, dtype=np.float64)
+    ring = np.linspace(0, 2 * np.pi, 16, endpoint=False)
+    x = np.column_stack([poses[:, 0], poses[:, 0, None] + clearance * np.cos(ring)])
+    y = np.column_stack([poses[:, 1], poses[:, 1, None] + clearance * np.sin(ring)])
+    return poses[~occupancy_map.is_occupied(x, y).any(axis=1)]
+
+def scenarios(poses, n_episodes, seed=0, min_distance=1.0):
+    """Fixed (start (x, y, yaw), goal (x, y)) pairs of distinct poses, the same for a given seed."""
+    poses = np.asarray(poses, dtype=np.float64)[:, :2]
+    distance = np.hypot(*(poses[:, None, :] - poses[None, :, :]).transpose(2, 0, 1))
+    starts, goals = np.nonzero(distance >= min_distance)
+    if len(starts) == 0:
+        raise ValueError("No pair of poses is at least {} m apart".format(min_distance))
+
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(starts), n_episodes)
+    yaw = rng.uniform(-np.pi, np.pi, n_episodes)
+    return [((poses[s, 0], poses[s, 1], y), (poses[g, 0], poses[g, 1])) for s, g, y in zip(starts[pick], goals[pick], yaw)]
+
+def run_episode(env, policy, start, goal, max_t, time_delta):
+    """Run one episode from start to goal with the deterministic policy and measure it."""
+    state = env.reset_env(start, goal)
+    x, y = env.odom_x, env.odom_y
+    path_length, score = 0.0, 0.0
+    target = collision = False
+
+    for t in range(1, max_t + 1):
+        action = policy(state)
+        state, reward, done, target = env.step_env([(action[0] + 1) / 2, action[1]])
+        path_length += np.hypot(env.odom_x - x, env.odom_y - y)
+        x, y = env.odom_x, env.odom_y
+        score += reward
+        if done:
+            collision = not target
+            break
+
+    return {'success': bool(target), 'collision': bool(collision), 'steps': t,
+            'time_to_goal': t * time_delta if target else np.nan, 'path_length': path_length, 'score': score}
+
+def local_environments(backend, n_workers):
+    """Environment variables of the workers without an EnvironmentPool.
+
+    Several workers are only safe with the NumPy simulator: with BACKEND 'gazebo' they would all
+    drive the robot of the running simulation and reset each other's episodes, so one worker is used.
+    """
+    if backend == 'gazebo' and n_workers > 1:
+        print('EVAL_WORKERS ({}) > 1 with BACKEND gazebo needs GAZEBO_INSTANCES, evaluating with a single worker'.format(n_workers))
+        n_workers = 1
+    return [{}] * n_workers
+
+def evaluate_chunk(task):
+    """Worker process: build the environment and the policy once, then run its share of the scenarios."""
+    CONFIG_PATH, policy_path, environment, chunk, seed, worker = task
+    os.environ.update(environment)              # e.g. ROS_MASTER_URI / GAZEBO_MASTER_URI of the instance
+    torch.set_num_threads(1)
+    np.random.seed(seed + worker)
+
+    from reinforcement.distributed import make_env
+    param = Extension(CONFIG_PATH).load_config("config.yaml")
+    env = make_env(param, CONFIG_PATH, seed + worker)
+    policy = ActorPolicy.load(policy_path, param["ENVIRONMENT_DIM"] + param["ROBOT_DIM"], param["INFERENCE_BACKEND"])
+
+    results = []
+    for index, (start, goal) in chunk:
+        # the scan noise of an episode does not depend on the worker running it
+        env.scan_processor.reseed([seed, index])
+        results.append((index, run_episode(env, policy, start, goal, param["MAX_TIMESTEP"], param["TIME_DELTA"])))
+    return results
+
+def evaluate(CONFIG_PATH, policy_path, n_episodes=None, n_workers=None, seed=None, backend=None, environments=None):
+    """Evaluate an actor checkpoint on fixed scenarios spread over a pool of environment processes.
+
+    Params
+    ======
+        CONFIG_PATH (str): folder of config.yaml
+        policy_path (str): actor checkpoint (actor_model.pth)
+        n_episodes, n_workers, seed: default to EVAL_EPISODES, EVAL_WORKERS and EVAL_SEED
+        backend (str): 'sim' or 'gazebo', defaults to BACKEND
+        environments (list): environment variables of each worker, by default one per GAZEBO_INSTANCES launched instance
+    """
+    param = Extension(CONFIG_PATH).load_config("config.yaml")
+    n_episodes = param["EVAL_EPISODES"] if n_episodes is None else n_episodes
+    n_workers = param["EVAL_WORKERS"] if n_workers is None else n_workers
+    seed = param["EVAL_SEED"] if seed is None else seed
+    backend = param["BACKEND"] if backend is None else backend
+    if environments is None and backend == 'gazebo' and param["GAZEBO_INSTANCES"] > 0:
+        # one worker per launched Gazebo instance
+        with EnvironmentPool.from_config(param) as pool:
+            return evaluate(CONFIG_PATH, policy_path, n_episodes, n_workers, seed, backend, pool.environments())
+    if environments is None:
+        environments = local_environments(backend, n_workers)
+    n_workers = len(environments)
+
+    # ================== FIXED SCENARIOS ================== #
+    poses = Extension(CONFIG_PATH).poses(param["EVAL_POSES"])
+    if backend == 'sim':
+        from reinforcement.raycast import OccupancyMap
+        poses = free_poses(OccupancyMap(os.path.join(CONFIG_PATH, 'map', 'map.yaml')), poses)
+    episodes = list(enumerate(scenarios(poses, n_episodes, seed, 2 * param["GOAL_REACHED_DIST"])))
+
+    # ================== RUN ON THE POOL ================== #
+    tasks = [(CONFIG_PATH, policy_path, dict(environment, REINFORCEMENT_BACKEND=backend), episodes[i::n_workers], seed, i)
+             for i, environment in enumerate(environments)]
+    context = mp.get_context('spawn')
+    with context.Pool(n_workers, maxtasksperchild=1) as pool:
+        chunks = pool.map(evaluate_chunk, tasks, chunksize=1)
+
+    return [result for _, result in sorted((item for chunk in chunks for item in chunk), key=lambda item: item[0])]
+
+# ================== STATISTICS ================== #
+
+def rate_interval(successes, n, confidence=0.95):
+    """Wilson score interval of a proportion."""
+    if n == 0:
+        return np.nan, np.nan
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return center - half, center + half
+
+def mean_interval(values, confidence=0.95, n_resamples=2000, seed=0):
+    """Percentile bootstrap interval of a mean."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.nan, np.nan
+    resampled = values[np.random.default_rng(seed).integers(0, len(values), (n_resamples, len(values)))].mean(axis=1)
+    return tuple(np.quantile(resampled, [0.5 - confidence / 2, 0.5 + confidence / 2]))
+
+def summarize(results, confidence=0.95):
+    """Success and collision rates, time to goal and path length of the successful episodes and score, with intervals."""
+    n = len(results)
+    success = np.array([r['success'] for r in results])
+    collision = np.array([r['collision'] for r in results])
+    summary = {'episodes': n}
+    summary['success_rate'] = (success.mean() if n else np.nan,) + rate_interval(success.sum(), n, confidence)
+    summary['collision_rate'] = (collision.mean() if n else np.nan,) + rate_interval(collision.sum(), n, confidence)
+    for key, mask in [('time_to_goal', success), ('path_length', success), ('score', np.ones(n, dtype=bool))]:
+        values = np.array([r[key] for r in results])[mask]
+        summary[key] = (values.mean() if len(values) else np.nan,) + mean_interval(values, confidence)
+    return summary
+
+def report(summary):
+    lines = ['Episodes {}'.format(summary['episodes'])]
+    for key, unit in [('success_rate', ''), ('collision_rate', ''), ('time_to_goal', ' s'), ('path_length', ' m'), ('score', '')]:
+        value, low, high = summary[key]
+        lines.append('{:<15} {:8.3f}{}  [{:.3f}, {:.3f}]'.format(key, value, unit, low, high))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    """Evaluate an actor checkpoint, POLICY by default: evaluation.py [actor_model.pth]."""
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+    param = Extension(CONFIG_PATH).load_config("config.yaml")
+    policy_path = sys.argv[1] if len(sys.argv) > 1 else param["POLICY"]
+
+    start = time.perf_counter()
+    results = evaluate(CONFIG_PATH, policy_path)
+    print(report(summarize(results)))
+    print('Evaluated in {:.1f} s'.format(time.perf_counter() - start))
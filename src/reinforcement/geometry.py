@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+# Every function takes scalars or (N,) arrays, one entry per robot.
+
+def wrap_angle(theta):
+    """Wrap angles to [-pi, pi]."""
+    return np.arctan2(np.sin(theta), np.cos(theta))
+
+def distance_to_goal(odom_x, odom_y, goal_x, goal_y):
+    """Distance between the robots and their goals."""
+    return np.hypot(goal_x - odom_x, goal_y - odom_y)
+
+def angles(odom_x, odom_y, goal_x, goal_y, yaw):
+    """Angle between the heading of the robots and the direction of their goals.
+
+    On the goal itself the direction is arctan2(0, 0) = 0, so the angle is -yaw wrapped.
+    """
+    return wrap_angle(np.arctan2(goal_y - odom_y, goal_x - odom_x) - yaw)
+
+def yaw_from_quaternion(x, y, z, w):
+    """Rotation around the z axis of orientation quaternions."""
+    return np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+def robot_state(odom_x, odom_y, goal_x, goal_y, yaw, linear, angular, out=None):
+    """Robot part of the state: distance and angle to the goal followed by the last action.
+
+    Returns shape (4,) for a single robot and (N, 4) for N robots; out can be a
+    preallocated array of that shape (a view into the full state works).
+    """
+    dx = goal_x - odom_x
+    dy = goal_y - odom_y
+    if out is None:
+        out = np.empty(np.shape(dx) + (4,))
+    out[..., 0] = np.hypot(dx, dy)
+    out[..., 1] = wrap_angle(np.arctan2(dy, dx) - yaw)
+    out[..., 2] = linear
+    out[..., 3] = angular
+    return out
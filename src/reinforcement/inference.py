@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import torch
+import torch.nn as nn
+import copy
+import time
+import os
+
+from reinforcement.model import Actor
+
+class LatencyTracker():
+    """Keeps the latency of the most recent calls and reports its percentiles."""
+
+    def __init__(self, window=1000):
+        """Initialize a LatencyTracker object.
+        Params
+        ======
+            window (int): number of recent calls kept
+        """
+
+        self.samples = np.zeros(window)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+
+    def percentiles(self, q=(50, 99)):
+        """Latency percentiles of the recent calls (in microseconds), empty before the first call."""
+        if self.count == 0:
+            return {}
+        recent = self.samples[:min(self.count, len(self.samples))]
+        return {'p{}'.format(p): value * 1e6 for p, value in zip(q, np.percentile(recent, q))}
+
+    def report(self):
+        return ' '.join('{}: {:.1f} us'.format(k, v) for k, v in self.percentiles().items())
+
+class ActorPolicy():
+    """Deterministic Actor for deployment: eval mode, no autograd, no allocation per call.
+
+    The backend 'numpy' folds the Linear layers of Actor.CFC into NumPy matmuls writing into
+    preallocated buffers (Dropout is the identity in eval mode). The backend 'torchscript'
+    runs a frozen TorchScript module on a tensor sharing memory with the input buffer.
+    """
+
+    ACTIVATIONS = {nn.ReLU: lambda x: np.maximum(x, 0.0, out=x), nn.Tanh: lambda x: np.tanh(x, out=x)}
+
+    def __init__(self, actor, backend='numpy', window=1000):
+        """Initialize an ActorPolicy object.
+        Params
+        ======
+            actor (Actor): trained actor network, copied (the caller's module is left as it is)
+            backend (str): 'numpy' or 'torchscript'
+            window (int): number of recent calls used for the latency percentiles
+        """
+
+        actor = copy.deepcopy(actor).cpu().eval()
+        linears = [layer for layer in actor.CFC if isinstance(layer, nn.Linear)]
+
+        self.backend = backend
+        self.latency = LatencyTracker(window)
+        self.input = np.zeros(linears[0].in_features, dtype=np.float32)
+
+        if backend == 'numpy':
+            # (weight.T, bias, activation, output buffer) of each Linear layer
+            self.layers = []
+            for layer in actor.CFC:
+                if isinstance(layer, nn.Linear):
+                    weight = layer.weight.detach().numpy().T.copy()
+                    bias = layer.bias.detach().numpy().copy()
+                    self.layers.append([weight, bias, None, np.zeros(layer.out_features, dtype=np.float32)])
+                elif type(layer) in self.ACTIVATIONS:
+                    self.layers[-1][2] = self.ACTIVATIONS[type(layer)]
+            self.output = self.layers[-1][3]
+
+        elif backend == 'torchscript':
+            with torch.no_grad():
+                self.module = torch.jit.freeze(torch.jit.script(actor))
+            self.input_tensor = torch.from_numpy(self.input)
+            self.output = np.zeros(linears[-1].out_features, dtype=np.float32)
+
+        else:
+            raise ValueError("Unknown inference backend '{}', expected 'numpy' or 'torchscript'".format(backend))
+
+    @classmethod
+    def load(cls, path, state_dim=24, backend='numpy', window=1000):
+        """Build the policy from an actor_model.pth checkpoint."""
+        actor = Actor(state_dim)
+        actor.load_state_dict(torch.load(path, map_location=torch.device('cpu')))
+        return cls(actor, backend, window)
+
+    def forward(self):
+        """Run the network on self.input, the result is written into self.output."""
+        if self.backend == 'numpy':
+            x = self.input
+            for weight, bias, activation, out in self.layers:
+                np.dot(x, weight, out=out)
+                out += bias
+                if activation is not None:
+                    activation(out)
+                x = out
+        else:
+            with torch.no_grad():
+                self.output[:] = self.module(self.input_tensor).numpy()
+
+    def __call__(self, state):
+        """Return the action for a single state.
+
+        The returned array is reused by the next call, copy it to keep it.
+        """
+        start = time.perf_counter()
+        self.input[:] = state
+        self.forward()
+        self.latency.record(time.perf_counter() - start)
+        return self.output
+
+if __name__ == '__main__':
+    """Measure the latency of the inference backends against Agent.action."""
+
+    torch.set_num_threads(1)
+    checkpoint = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config', 'models', 'actor_model.pth')
+    actor = Actor(24)
+    if os.path.exists(checkpoint):
+        actor.load_state_dict(torch.load(checkpoint, map_location=torch.device('cpu')))
+
+    states = np.random.uniform(0, 10, (5000, 24)).astype(np.float32)
+
+    # Agent.action: train mode, autograd, new tensor per call
+    baseline = LatencyTracker(len(states))
+    for state in states:
+        start = time.perf_counter()
+        actor(torch.as_tensor(state).view(-1, 24)).cpu().data.numpy().flatten()
+        baseline.record(time.perf_counter() - start)
+    print('Agent.action  ', baseline.report())
+
+    for backend in ['torchscript', 'numpy']:
+        policy = ActorPolicy(actor, backend, window=len(states))
+        for state in states:
+            policy(state)
+        print('{:<14}'.format(backend), policy.latency.report())
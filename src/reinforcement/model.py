@@ -70,6 +70,69 @@ class Critic(nn.Module):
         
         return q1, q2
 
+class FusedCritic(nn.Module):
+    """Twin critic evaluating both Q heads with one batched matmul per layer.
+
+    Same layers and outputs as Critic; the weights of both heads are stacked as
+    (2, in, out) so a layer is a single baddbmm. state_dict() uses the Critic keys
+    (SA.* and _SA.*), so checkpoints are interchangeable between the two classes.
+    """
+
+    LAYERS = [0, 2, 4]  # indices of the nn.Linear layers in Critic.SA / Critic._SA
+    HEADS = ['SA', '_SA']
+
+    def __init__(self, state_dim = 24, action_dim = 2):
+        super(FusedCritic, self).__init__()
+        self.cat_len = 128
+        sizes = [state_dim + action_dim, 3*self.cat_len, 64, 1]
+
+        self.weights = nn.ParameterList()
+        self.biases = nn.ParameterList()
+        for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+            # same initialization as the nn.Linear layers of Critic
+            heads = [nn.Linear(n_in, n_out) for _ in self.HEADS]
+            self.weights.append(nn.Parameter(torch.stack([head.weight.detach().t() for head in heads])))
+            self.biases.append(nn.Parameter(torch.stack([head.bias.detach() for head in heads]).unsqueeze(1)))
+
+        self._register_state_dict_hook(FusedCritic.to_critic_keys)
+        self._register_load_state_dict_pre_hook(self.from_critic_keys)
+
+    @staticmethod
+    def to_critic_keys(module, state_dict, prefix, local_metadata):
+        """Store the stacked parameters under the per-head Critic keys."""
+        for i, layer in enumerate(module.LAYERS):
+            weight = state_dict.pop(prefix + 'weights.' + str(i))
+            bias = state_dict.pop(prefix + 'biases.' + str(i))
+            for h, head in enumerate(module.HEADS):
+                state_dict[prefix + head + '.' + str(layer) + '.weight'] = weight[h].t()
+                state_dict[prefix + head + '.' + str(layer) + '.bias'] = bias[h, 0]
+        return state_dict
+
+    def from_critic_keys(self, state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs):
+        """Stack the per-head Critic weights of a checkpoint into the fused parameters."""
+        for i, layer in enumerate(self.LAYERS):
+            names = [prefix + head + '.' + str(layer) for head in self.HEADS]
+            if not all(name + '.weight' in state_dict for name in names):
+                continue
+            state_dict[prefix + 'weights.' + str(i)] = torch.stack([state_dict.pop(name + '.weight').t() for name in names])
+            state_dict[prefix + 'biases.' + str(i)] = torch.stack([state_dict.pop(name + '.bias') for name in names]).unsqueeze(1)
+
+    def forward(self, state, action):
+
+        sa = torch.cat([state, action], dim = -1)
+        batch_shape = sa.shape[:-1]
+
+        # both heads read the same input: (2, batch, in) view without copy
+        x = sa.reshape(1, -1, sa.shape[-1]).expand(len(self.HEADS), -1, -1)
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = torch.baddbmm(bias, x, weight)
+            if i < len(self.weights) - 1:
+                x = F.relu(x)
+
+        q = x.view(len(self.HEADS), *batch_shape)
+
+        return q[0], q[1]
+
 
 # class Critic(nn.Module):
 #     def __init__(self, state_dim, action_dim, l1=800, l2=600):
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import rospy
+import numpy as np
+import time
+
+from geometry_msgs.msg import Twist, PoseStamped
+from sensor_msgs.msg import LaserScan
+from nav_msgs.msg import Odometry
+from std_msgs.msg import Float64
+
+from reinforcement.utils import Extension
+from reinforcement.geometry import robot_state, yaw_from_quaternion
+from reinforcement.scan import ScanProcessor
+from reinforcement.observation import ObservationBuffer
+from reinforcement.inference import ActorPolicy
+
+class Navigation():
+    """Runs the trained actor on the live robot at CONTROL_RATE, without Gazebo in the loop.
+
+    The state is built as in Env.step_env: the ENVIRONMENT_DIM laser sectors, the distance
+    and heading to the goal and the last action. The robot is stopped when there is no goal,
+    the goal is reached or the scan or the odometry is older than SENSOR_TIMEOUT.
+    """
+
+    def __init__(self, CONFIG_PATH):
+
+        self.useful = Extension(CONFIG_PATH)
+        rospy.init_node("navigation", anonymous=True)
+
+        # Function to load yaml configuration file
+        param = self.useful.load_config("config.yaml")
+
+        self.environment_dim = param["ENVIRONMENT_DIM"]
+        self.goal_reached_dist = param["GOAL_REACHED_DIST"]
+        self.max_range = param["MAX_RANGE"]
+        self.control_rate = param["CONTROL_RATE"]
+        self.sensor_timeout = param["SENSOR_TIMEOUT"]
+
+        self.policy = ActorPolicy.load(param["POLICY"], self.environment_dim + param["ROBOT_DIM"], param["INFERENCE_BACKEND"])
+        self.scan_processor = ScanProcessor(self.environment_dim, self.max_range)
+        self.observations = ObservationBuffer()
+
+        self.goal = None
+        self.last_action = np.zeros(2)
+        self.state = np.zeros(self.environment_dim + param["ROBOT_DIM"], dtype=np.float32)
+
+        # ROS publications and subscriptions
+        self.pub_cmd_vel = rospy.Publisher(param["TOPIC_CMD"], Twist, queue_size=1)
+        self.pub_latency = rospy.Publisher("~latency", Float64, queue_size=1)  # wall-clock time of each tick (in seconds)
+        self.odom = rospy.Subscriber(param["TOPIC_ODOM"], Odometry, self.odom_callback, queue_size=1)
+        self.scan = rospy.Subscriber(param["TOPIC_SCAN"], LaserScan, self.scan_callback, queue_size=1)
+        self.goal_sub = rospy.Subscriber(param["TOPIC_GOAL"], PoseStamped, self.goal_callback, queue_size=1)
+
+        rospy.on_shutdown(self.stop)
+
+    def odom_callback(self, msg):
+        self.observations.update_odom(msg.header.stamp.to_sec(), msg.pose.pose)
+
+    def scan_callback(self, scan):
+        self.observations.update_scan(scan.header.stamp.to_sec(), self.scan_processor.process(scan.ranges))
+
+    def goal_callback(self, msg):
+        self.goal = (msg.pose.position.x, msg.pose.position.y)
+        rospy.loginfo('Navigation                  => New goal ({:.2f}, {:.2f})'.format(*self.goal))
+
+    def stale(self, observation, now):
+        """True when the scan or the odometry of the observation is older than SENSOR_TIMEOUT."""
+        if observation is None or observation.odom is None:
+            return True
+        return now - min(observation.scan_stamp, observation.odom_stamp) > self.sensor_timeout
+
+    def build_state(self, observation):
+        """Laser sectors, distance and heading to the goal and last action; returns the distance."""
+        pose = observation.odom
+        yaw = yaw_from_quaternion(pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w)
+
+        self.state[:self.environment_dim] = observation.scan
+        robot_state(pose.position.x, pose.position.y, self.goal[0], self.goal[1], yaw,
+                    self.last_action[0], self.last_action[1], out=self.state[self.environment_dim:])
+        return self.state[self.environment_dim]
+
+    def publish(self, linear, angular):
+        vel_cmd = Twist()
+        vel_cmd.linear.x = linear
+        vel_cmd.angular.z = angular
+        self.pub_cmd_vel.publish(vel_cmd)
+
+    def stop(self):
+        self.last_action[:] = 0.0
+        self.publish(0.0, 0.0)
+
+    def tick(self):
+        """Compute and publish one velocity command."""
+        observation = self.observations.snapshot()
+
+        if self.goal is None:
+            self.stop()
+            return
+
+        if self.stale(observation, rospy.get_time()):
+            rospy.logwarn_throttle(1.0, 'Navigation                  => Stale scan or odometry, stopping the robot')
+            self.stop()
+            return
+
+        if self.build_state(observation) < self.goal_reached_dist:
+            rospy.loginfo('Navigation                  => Goal reached')
+            self.goal = None
+            self.stop()
+            return
+
+        # same mapping as training: linear velocity in [0, 1], angular velocity in [-1, 1]
+        action = self.policy(self.state)
+        self.last_action[:] = (action[0] + 1) / 2, action[1]
+        self.publish(self.last_action[0], self.last_action[1])
+
+    def spin(self):
+        rate = rospy.Rate(self.control_rate)
+        while not rospy.is_shutdown():
+            start = time.perf_counter()
+            self.tick()
+            self.pub_latency.publish(Float64(time.perf_counter() - start))
+            rospy.loginfo_throttle(10.0, 'Navigation                  => Policy latency ' + self.policy.latency.report())
+            rate.sleep()
+
+if __name__ == '__main__':
+    """Start the navigation node."""
+
+    # folder to load config file
+    CONFIG_PATH = rospy.get_param('CONFIG_PATH')
+
+    Navigation(CONFIG_PATH).spin()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque, namedtuple
+
+Observation = namedtuple("Observation", field_names=["scan", "odom", "scan_stamp", "odom_stamp"])
+
+class ObservationBuffer():
+    """Latest scan paired with the odometry closest in time, shared between ROS callbacks and the training loop.
+
+    Writers (the odometry and scan callbacks) are serialized by a lock, so a re-paired
+    odometry never overwrites a newer scan. Each publication is a new Observation holding its
+    own copy of the scan, set with a single attribute assignment, so readers get a consistent
+    scan/odom pair without taking any lock.
+    """
+
+    def __init__(self, history=16):
+        """Initialize an ObservationBuffer object.
+        Params
+        ======
+            history (int): number of recent odometry messages kept to pair with scans
+        """
+
+        self.odoms = deque(maxlen=history)  # (stamp, pose) of the recent odometry messages
+        self.latest = None                  # last published Observation
+        self.fresh = threading.Event()      # set after every publication
+        self.lock = threading.Lock()        # serializes the writers
+
+    def update_odom(self, stamp, pose):
+        """Store an odometry message; re-pair the latest scan if this one is closer in time."""
+        with self.lock:
+            self.odoms.append((stamp, pose))
+
+            latest = self.latest
+            if latest is not None and abs(stamp - latest.scan_stamp) < abs(latest.odom_stamp - latest.scan_stamp):
+                self.publish(latest._replace(odom=pose, odom_stamp=stamp))
+
+    def update_scan(self, stamp, scan):
+        """Publish a copy of a processed scan together with the odometry message closest to its stamp."""
+        # copied outside the lock: the processor reuses its output arrays
+        scan = scan.copy()
+        with self.lock:
+            if self.odoms:
+                odom_stamp, odom = min(self.odoms, key=lambda o: abs(o[0] - stamp))
+            else:
+                odom_stamp, odom = float('-inf'), None
+
+            self.publish(Observation(scan, odom, stamp, odom_stamp))
+
+    def publish(self, observation):
+        """Make observation the latest one; callers hold self.lock. Scans older than the latest are dropped."""
+        latest = self.latest
+        if latest is not None and observation.scan_stamp < latest.scan_stamp:
+            return
+        self.latest = observation
+        self.fresh.set()
+
+    def snapshot(self):
+        """Return the latest consistent Observation (None before the first scan)."""
+        return self.latest
+
+    def wait_newer(self, stamp, timeout):
+        """Wait until a scan stamped after `stamp` is published.
+
+        Returns the new Observation, or None when nothing arrived within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # clear before checking: a publication after the check sets the event again
+            self.fresh.clear()
+            observation = self.latest
+            if observation is not None and observation.scan_stamp > stamp:
+                return observation
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.fresh.wait(remaining)
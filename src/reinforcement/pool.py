@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import subprocess
+import threading
+import signal
+import time
+import sys
+import os
+
+import rospy
+
+class GazeboInstance():
+    """One headless Gazebo simulation with its own ROS master, started from launch/view.launch.
+
+    Instance i uses the ROS master port base_ros_port + i and the Gazebo master port
+    base_gazebo_port + i, so the instances share neither topics nor services. Processes
+    using the instance get its ROS_MASTER_URI and GAZEBO_MASTER_URI from environment().
+    """
+
+    def __init__(self, index, world='simulation.world', base_ros_port=11411, base_gazebo_port=11445, log_dir=None):
+        """Initialize a GazeboInstance object.
+        Params
+        ======
+            index (int): index of the instance, offsets both ports
+            world (str): world file in world/
+            base_ros_port (int): ROS master port of instance 0
+            base_gazebo_port (int): Gazebo master port of instance 0
+            log_dir (str): folder of the roslaunch output, discarded when None
+        """
+
+        self.index = index
+        self.world = world
+        self.ros_port = base_ros_port + index
+        self.gazebo_port = base_gazebo_port + index
+        self.log_dir = log_dir
+        self.process = None
+        self.restarts = 0
+
+    def environment(self):
+        """Environment variables pointing ROS and Gazebo clients at this instance."""
+        return {'ROS_MASTER_URI': 'http://localhost:{}'.format(self.ros_port),
+                'GAZEBO_MASTER_URI': 'http://localhost:{}'.format(self.gazebo_port)}
+
+    def command(self):
+        # roslaunch -p starts a roscore on that port when none is running
+        return ['roslaunch', '-p', str(self.ros_port), 'reinforcement', 'view.launch',
+                'gui:=false', 'world_name:=' + self.world]
+
+    def start(self):
+        env = dict(os.environ, **self.environment())
+        if self.log_dir is not None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            output = open(os.path.join(self.log_dir, 'gazebo_{}.log'.format(self.index)), 'ab')
+        else:
+            output = subprocess.DEVNULL
+        # own process group, so stop() also reaches gzserver and the roscore started by roslaunch
+        self.process = subprocess.Popen(self.command(), env=env, stdout=output, stderr=subprocess.STDOUT, start_new_session=True)
+        if output is not subprocess.DEVNULL:
+            output.close()
+
+    def ready(self):
+        """The master answers and the Gazebo services are advertised."""
+        import rosgraph
+        try:
+            master = rosgraph.Master('/pool', master_uri=self.environment()['ROS_MASTER_URI'])
+            master.lookupService('/gazebo/get_physics_properties')
+            return True
+        except Exception:
+            return False
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def healthy(self):
+        return self.alive() and self.ready()
+
+    def wait_ready(self, timeout=60.0):
+        """Block until the instance is healthy, False if it is not within timeout or its process exited."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive():
+                return False
+            if self.ready():
+                return True
+            time.sleep(0.5)
+        return False
+
+    def stop(self, timeout=10.0):
+        """SIGINT the process group like Ctrl-C, SIGKILL it when it does not exit within timeout."""
+        if self.process is None:
+            return
+        for sig in [signal.SIGINT, signal.SIGKILL]:
+            try:
+                os.killpg(self.process.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                self.process.wait(timeout)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+        self.process = None
+
+    def restart(self, timeout=60.0):
+        self.stop()
+        self.start()
+        ready = self.wait_ready(timeout)
+        self.restarts += 1
+        return ready
+
+class EnvironmentPool():
+    """K isolated Gazebo instances, health-checked on a background thread and restarted when they fail.
+
+    Worker w is assigned instance w, so at most K workers can use the pool and no two of them
+    command the same robot. A worker connected to a restarted instance has lost its ROS node,
+    poll_restarted() tells the owner of the workers which ones to restart.
+    """
+
+    def __init__(self, n_instances, world='simulation.world', base_ros_port=11411, base_gazebo_port=11445,
+                 check_every=5.0, startup_timeout=60.0, log_dir=None, instance_class=GazeboInstance):
+        """Initialize an EnvironmentPool object.
+        Params
+        ======
+            n_instances (int): number of Gazebo instances
+            check_every (float): seconds between health checks
+            startup_timeout (float): seconds an instance has to become healthy
+            instance_class: GazeboInstance or a subclass with another command
+        """
+
+        self.instances = [instance_class(i, world, base_ros_port, base_gazebo_port, log_dir) for i in range(n_instances)]
+        self.check_every = check_every
+        self.startup_timeout = startup_timeout
+
+        self.lock = threading.Lock()
+        self.restarted = set()          # instances restarted since the last poll_restarted()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, param, log_dir=None):
+        return cls(param["GAZEBO_INSTANCES"], param["GAZEBO_WORLD"], param["ROS_BASE_PORT"], param["GAZEBO_BASE_PORT"],
+                   param["HEALTH_CHECK_EVERY"], log_dir=log_dir)
+
+    def start(self):
+        """Launch every instance, wait until all are healthy and start the health checks."""
+        for instance in self.instances:
+            instance.start()
+        for instance in self.instances:
+            if not instance.wait_ready(self.startup_timeout) and not instance.restart(self.startup_timeout):
+                self.close()
+                raise RuntimeError('Gazebo instance {} (ROS master port {}) did not start'.format(instance.index, instance.ros_port))
+
+        self.thread = threading.Thread(target=self.monitor, daemon=True)
+        self.thread.start()
+        return self
+
+    def instance(self, worker_id):
+        if not 0 <= worker_id < len(self.instances):
+            raise ValueError('Worker {} has no Gazebo instance, the pool has {} (one per worker)'.format(worker_id, len(self.instances)))
+        return self.instances[worker_id]
+
+    def environment(self, worker_id):
+        """Environment variables of worker worker_id, to be set before it creates its Env."""
+        return self.instance(worker_id).environment()
+
+    def environments(self, n_workers=None):
+        return [self.environment(i) for i in range(len(self.instances) if n_workers is None else n_workers)]
+
+    def check(self):
+        """Restart the instances that are not healthy, returns their indices."""
+        failed = [instance for instance in self.instances if not instance.healthy()]
+        for instance in failed:
+            rospy.logwarn('Environment Pool            => Gazebo instance {} failed, restarting'.format(instance.index))
+            if not instance.restart(self.startup_timeout):
+                rospy.logerr('Environment Pool            => Gazebo instance {} did not come back'.format(instance.index))
+        with self.lock:
+            self.restarted.update(instance.index for instance in failed)
+        return [instance.index for instance in failed]
+
+    def monitor(self):
+        while not self.stopped.wait(self.check_every):
+            self.check()
+
+    def poll_restarted(self, n_workers):
+        """Workers whose instance was restarted since the last call."""
+        with self.lock:
+            restarted, self.restarted = self.restarted, set()
+        return [w for w in range(n_workers) if w in restarted]
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for instance in self.instances:
+            instance.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+def stepping_worker(CONFIG_PATH, environment, duration, steps):
+    """Step an Env with random actions for duration seconds, the step count goes into steps (mp.Value)."""
+    import numpy as np
+    os.environ.update(environment)
+    from reinforcement.environment import Env
+    env = Env(CONFIG_PATH)
+    env.reset_env()
+    start, n = time.monotonic(), 0
+    while time.monotonic() - start < duration:
+        env.step_env([np.random.uniform(0, 1), np.random.uniform(-1, 1)])
+        n += 1
+    steps.value = n / (time.monotonic() - start)
+
+if __name__ == '__main__':
+    """Aggregate environment steps per second with 1..K Gazebo instances: pool.py [K]."""
+    import multiprocessing as mp
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+    max_instances = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() // 2
+    context = mp.get_context('spawn')
+
+    for k in sorted({1, 2, max_instances // 2, max_instances} - {0}):
+        with EnvironmentPool(k) as pool:
+            rates = [context.Value('d', 0.0) for _ in range(k)]
+            workers = [context.Process(target=stepping_worker, args=(CONFIG_PATH, pool.environment(i), 30.0, rates[i])) for i in range(k)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            print('{:>3} instances {:8.1f} steps/s'.format(k, sum(rate.value for rate in rates)))
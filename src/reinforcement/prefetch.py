@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import threading
+import queue
+import numpy as np
+import torch
+
+class BatchPrefetcher():
+    """Samples the next minibatches on a background thread while the current one is trained on.
+
+    Ring-based memories (RingReplayBuffer, MemmapReplayBuffer, PrioritizedReplayBuffer) are
+    gathered straight into tensors: on a GPU into preallocated pinned staging slots, so the
+    host-to-device copy is asynchronous, on the CPU into new tensors (there the batch is the
+    gathered memory itself). Other memories are sampled with their own sample().
+    Batches come out of get() in the same format as memory.sample() and are never overwritten
+    by later batches, so they can be kept. Writes to the memory must hold self.lock.
+    """
+
+    def __init__(self, memory, device, depth=2, lock=None):
+        """Initialize a BatchPrefetcher object.
+        Params
+        ======
+            memory: replay memory to sample from
+            device (torch.device): device of the returned tensors
+            depth (int): number of batches sampled ahead
+            lock (threading.Lock): lock taken while sampling, shared with the writers of the memory
+        """
+
+        self.memory = memory
+        self.device = device
+        self.depth = depth
+        self.lock = lock if lock is not None else threading.Lock()
+        self.prioritized = hasattr(memory, 'update_priorities')
+        self.staged = hasattr(memory, 'gather')
+        self.copied_out = device.type != 'cpu'      # batches are device copies of the staging tensors
+
+        self.batches = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = None
+
+        if self.staged:
+            self.allocate()
+
+    def allocate(self):
+        """Staging slots of the device copies: depth queued + one being filled + one in use by the learner."""
+        batch_size, state_size, action_size = self.memory.batch_size, self.memory.state_size, self.memory.action_size
+        self.shapes = [(batch_size, state_size), (batch_size, action_size), (batch_size, 1), (batch_size, state_size), (batch_size, 1)]
+        if self.prioritized:
+            self.shapes.append((batch_size,))
+
+        self.slots = [self.tensors() for _ in range(self.depth + 2)] if self.copied_out else []
+        self.copied = [None] * len(self.slots)  # CUDA events: the slot may be refilled once its copy is done
+        self.slot = 0
+
+    def tensors(self):
+        """One set of batch tensors, pinned when the device is a GPU."""
+        pin = self.device.type == 'cuda'
+        return [torch.empty(shape, dtype=torch.float32, pin_memory=pin) for shape in self.shapes]
+
+    def fill(self, staging):
+        """Sample indices and gather the experiences into the staging tensors."""
+        with self.lock:
+            indices = self.memory.sample_indices()
+            arrays = (self.memory.states, self.memory.actions, self.memory.rewards, self.memory.next_states, self.memory.dones)
+            for array, tensor in zip(arrays, staging):
+                np.take(array, indices, axis=0, out=tensor.numpy())
+            if self.prioritized:
+                staging[5].numpy()[:] = self.memory.weights(indices)
+                self.memory.beta = min(1.0, self.memory.beta + self.memory.beta_increment)
+        return indices
+
+    def produce(self):
+        """Background thread: keep depth batches ready on the device."""
+        while not self.stopped.is_set():
+            if not self.staged:
+                with self.lock:
+                    batch = self.memory.sample()
+            elif not self.copied_out:
+                batch = tuple(self.tensors())
+                indices = self.fill(batch)
+            else:
+                slot = self.slot
+                self.slot = (slot + 1) % len(self.slots)
+                if self.copied[slot] is not None:
+                    self.copied[slot].synchronize()
+
+                indices = self.fill(self.slots[slot])
+                batch = tuple(t.to(self.device, non_blocking=True) for t in self.slots[slot])
+                if self.device.type == 'cuda':
+                    self.copied[slot] = torch.cuda.Event()
+                    self.copied[slot].record()
+            if self.staged and self.prioritized:
+                batch = batch + (indices,)
+
+            while not self.stopped.is_set():
+                try:
+                    self.batches.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def get(self):
+        """Next minibatch on the device, the background thread is started by the first call."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.produce, daemon=True)
+            self.thread.start()
+        return self.batches.get()
+
+    def close(self):
+        """Stop the background thread and drop the batches sampled ahead."""
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+            self.stopped.clear()
+            self.batches = queue.Queue(maxsize=self.depth)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import subprocess
+import time
+import sys
+import os
+
+# the runtime only needs NumPy: torch is imported inside the export and verification functions
+
+ACTIVATIONS = {'relu': lambda x: np.maximum(x, 0.0, out=x), 'tanh': lambda x: np.tanh(x, out=x), 'none': lambda x: x}
+
+def quantize_weight(weight):
+    """Symmetric per-output-channel int8 quantization of an (out, in) weight, returns (int8 weight, scales)."""
+    scales = np.abs(weight).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.clip(np.round(weight / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+def export_actor(actor_path, output_path, state_dim=24):
+    """Export an actor_model.pth checkpoint to an int8 .npz artifact.
+
+    Each Linear layer of Actor.CFC is stored as int8 weights with one float32 scale per
+    output channel and a float32 bias, followed by the name of its activation.
+    """
+    import torch
+    import torch.nn as nn
+    from reinforcement.model import Actor
+
+    actor = Actor(state_dim)
+    actor.load_state_dict(torch.load(actor_path, map_location=torch.device('cpu')))
+
+    arrays = {}
+    layers = [layer for layer in actor.CFC if not isinstance(layer, nn.Dropout)]
+    n = 0
+    for layer, following in zip(layers, layers[1:] + [None]):
+        if not isinstance(layer, nn.Linear):
+            continue
+        q, scales = quantize_weight(layer.weight.detach().numpy())
+        arrays['weight_{}'.format(n)] = q
+        arrays['scale_{}'.format(n)] = scales
+        arrays['bias_{}'.format(n)] = layer.bias.detach().numpy().astype(np.float32)
+        arrays['activation_{}'.format(n)] = np.array({nn.ReLU: 'relu', nn.Tanh: 'tanh'}.get(type(following), 'none'))
+        n += 1
+
+    np.savez(output_path, **arrays)
+    return output_path
+
+class QuantizedActor():
+    """NumPy-only runtime of the int8 actor artifact written by export_actor.
+
+    With dequantize=True the int8 weights are expanded to float32 once at load time, the fastest
+    path. With dequantize=False the weights stay int8 in memory and every layer quantizes its
+    input to int8 on the fly and accumulates in int32.
+    """
+
+    def __init__(self, path, dequantize=True):
+        """Initialize a QuantizedActor object.
+        Params
+        ======
+            path (str): .npz artifact written by export_actor
+            dequantize (bool): expand the weights to float32 at load time
+        """
+
+        self.dequantize = dequantize
+        self.layers = []
+        with np.load(path) as artifact:
+            n = 0
+            while 'weight_{}'.format(n) in artifact:
+                q = artifact['weight_{}'.format(n)]
+                scale = artifact['scale_{}'.format(n)]
+                bias = artifact['bias_{}'.format(n)]
+                activation = ACTIVATIONS[str(artifact['activation_{}'.format(n)])]
+                weight = (q.astype(np.float32) * scale[:, None]).T.copy() if dequantize else q.T.copy()
+                self.layers.append((weight, scale, bias, activation, np.zeros(len(bias), dtype=np.float32)))
+                n += 1
+
+        self.input = np.zeros(self.layers[0][0].shape[0], dtype=np.float32)
+        self.output = self.layers[-1][4]
+        self.q_input = np.zeros(max(layer[0].shape[0] for layer in self.layers), dtype=np.int8)
+        self.accumulator = np.zeros(max(len(layer[2]) for layer in self.layers), dtype=np.int32)
+
+    def nbytes(self):
+        """Memory taken by the weights, scales and biases."""
+        return sum(weight.nbytes + scale.nbytes + bias.nbytes for weight, scale, bias, _, _ in self.layers)
+
+    def __call__(self, state):
+        """Return the action for a single state, the returned array is reused by the next call."""
+        self.input[:] = state
+        x = self.input
+        for weight, scale, bias, activation, out in self.layers:
+            if self.dequantize:
+                np.dot(x, weight, out=out)
+            else:
+                # dynamic per-tensor int8 quantization of the layer input
+                x_scale = max(float(np.abs(x).max()) / 127.0, 1e-12)
+                q_x = self.q_input[:len(x)]
+                np.rint(x / x_scale, out=q_x, casting='unsafe')
+                acc = self.accumulator[:len(out)]
+                np.matmul(q_x, weight, out=acc, dtype=np.int32)
+                np.multiply(acc, scale, out=out)
+                out *= x_scale
+            out += bias
+            activation(out)
+            x = out
+        return self.output
+
+def verify(actor_path, artifact_path, states, state_dim=24, dequantize=True):
+    """Absolute action error of the int8 artifact against the float Actor (eval mode) over (N, state_dim) states."""
+    import torch
+    from reinforcement.model import Actor
+
+    actor = Actor(state_dim).eval()
+    actor.load_state_dict(torch.load(actor_path, map_location=torch.device('cpu')))
+    with torch.no_grad():
+        expected = actor(torch.as_tensor(states, dtype=torch.float32)).numpy()
+
+    runtime = QuantizedActor(artifact_path, dequantize)
+    actions = np.array([runtime(state).copy() for state in states])
+    error = np.abs(actions - expected)
+    return {'max': float(error.max()), 'p99': float(np.percentile(error, 99)), 'mean': float(error.mean())}
+
+def record_states(CONFIG_PATH, actor_path, n_states, seed=0):
+    """Record (n_states, state) observations of the float policy driving the NumPy simulator."""
+    import torch
+    from reinforcement.model import Actor
+    from reinforcement.simulation import SimEnv
+
+    env = SimEnv(CONFIG_PATH, seed=seed)
+    actor = Actor(env.environment_dim + 4).eval()
+    actor.load_state_dict(torch.load(actor_path, map_location=torch.device('cpu')))
+
+    states = np.zeros((n_states, env.environment_dim + 4), dtype=np.float32)
+    state = env.reset_env()
+    for i in range(n_states):
+        states[i] = state
+        with torch.no_grad():
+            action = actor(torch.as_tensor(state, dtype=torch.float32)).numpy()
+        state, _, done, _ = env.step_env([(action[0] + 1) / 2, action[1]])
+        if done:
+            state = env.reset_env()
+    return states
+
+def load_time(code):
+    """Wall-clock time of running code in a fresh interpreter (imports included)."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.realpath(__file__)))
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    """Export config/models/actor_model.pth to int8, verify it on recorded states and measure it."""
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+    actor_path = os.path.join(CONFIG_PATH, 'models', 'actor_model.pth')
+    artifact_path = os.path.join(CONFIG_PATH, 'models', 'actor_model_int8.npz')
+    states_path = os.path.join(CONFIG_PATH, 'models', 'states.npy')
+
+    export_actor(actor_path, artifact_path)
+
+    # ================== VERIFY ON RECORDED STATES ================== #
+    if os.path.exists(states_path):
+        states = np.load(states_path)
+    else:
+        states = record_states(CONFIG_PATH, actor_path, 2000)
+    for dequantize in [True, False]:
+        error = verify(actor_path, artifact_path, states, dequantize=dequantize)
+        print('Action error (dequantize={}): max {:.2e} p99 {:.2e} mean {:.2e} over {} states'.format(
+            dequantize, error['max'], error['p99'], error['mean'], len(states)))
+
+    # ================== FOOTPRINT ================== #
+    print('File size: float32 {:.1f} kB, int8 {:.1f} kB'.format(os.path.getsize(actor_path) / 1e3, os.path.getsize(artifact_path) / 1e3))
+    for dequantize in [True, False]:
+        print('Weights in memory (dequantize={}): {:.1f} kB'.format(dequantize, QuantizedActor(artifact_path, dequantize).nbytes() / 1e3))
+
+    # ================== LOAD TIME ================== #
+    print('Load time: torch Actor {:.3f} s, NumPy runtime {:.3f} s'.format(
+        load_time("import torch; from model import Actor; a = Actor(24); a.load_state_dict(torch.load('{}', map_location='cpu'))".format(actor_path)),
+        load_time("from quantize import QuantizedActor; QuantizedActor('{}')".format(artifact_path))))
+
+    # ================== LATENCY ================== #
+    for dequantize in [True, False]:
+        runtime = QuantizedActor(artifact_path, dequantize)
+        latency = np.zeros(len(states))
+        for i, state in enumerate(states):
+            start = time.perf_counter()
+            runtime(state)
+            latency[i] = time.perf_counter() - start
+        print('Latency (dequantize={}): p50 {:.1f} us p99 {:.1f} us'.format(dequantize, *np.percentile(latency, [50, 99]) * 1e6))
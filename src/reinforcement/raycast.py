@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import yaml
+import time
+import os
+
+from scipy import ndimage
+
+# ==== Hokuyo front laser (robots/robot/hera_base.urdf.xacro) ==== #
+LASER_MIN_ANGLE = -1.45     # first beam angle (in radians)
+LASER_MAX_ANGLE = 1.45      # last beam angle (in radians)
+LASER_OFFSET = 0.3          # laser mounted 0.3 m ahead of the base
+LASER_SAMPLES = 150         # beams of a scan (robots/urdf/simulation/hokuyo_utm.gazebo.xacro)
+
+class OccupancyMap():
+    """Occupancy grid loaded from a map_server map (yaml + pgm)."""
+
+    def __init__(self, map_yaml):
+        with open(map_yaml) as file:
+            info = yaml.safe_load(file)
+
+        # the image path is written for the docker image, fall back to the yaml directory
+        image = info["image"]
+        if not os.path.isabs(image) or not os.path.exists(image):
+            image = os.path.join(os.path.dirname(map_yaml), os.path.basename(image))
+
+        pixels = self.read_pgm(image).astype(np.float32)
+        if not info.get("negate", 0):
+            pixels = 255.0 - pixels
+        occupancy = pixels / 255.0
+
+        # unknown space is treated as occupied, so the robot and the rays stay inside the map
+        self.occupied = np.flipud(occupancy > info["free_thresh"])
+        self.resolution = info["resolution"]
+        self.origin = np.array(info["origin"][:2], dtype=np.float64)
+        self.height, self.width = self.occupied.shape
+
+    @staticmethod
+    def read_pgm(path):
+        """Read a binary (P5) PGM image into an array."""
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        fields = []
+        offset = 0
+        while len(fields) < 4:
+            # skip whitespace and comments between header fields
+            while data[offset:offset + 1].isspace():
+                offset += 1
+            if data[offset:offset + 1] == b'#':
+                offset = data.index(b'\n', offset) + 1
+                continue
+            end = offset
+            while not data[end:end + 1].isspace():
+                end += 1
+            fields.append(data[offset:end])
+            offset = end
+        offset += 1
+
+        if fields[0] != b'P5':
+            raise ValueError("Only binary (P5) PGM maps are supported")
+
+        width, height, maxval = int(fields[1]), int(fields[2]), int(fields[3])
+        dtype = np.uint8 if maxval < 256 else np.dtype('>u2')
+        return np.frombuffer(data, dtype=dtype, count=width * height, offset=offset).reshape(height, width)
+
+    def world_to_grid(self, x, y):
+        """Convert world coordinates (in meters) to (row, col) cell indices."""
+        col = np.floor((np.asarray(x) - self.origin[0]) / self.resolution).astype(np.int64)
+        row = np.floor((np.asarray(y) - self.origin[1]) / self.resolution).astype(np.int64)
+        return row, col
+
+    def is_occupied(self, x, y):
+        """Return True for points on an obstacle or outside the map."""
+        row, col = self.world_to_grid(x, y)
+        inside = (row >= 0) & (row < self.height) & (col >= 0) & (col < self.width)
+        occupied = np.ones(np.shape(row), dtype=bool)
+        occupied[inside] = self.occupied[row[inside], col[inside]]
+        return occupied
+
+    def raycast(self, x, y, yaw, angles, max_range):
+        """Cast beams from (x, y, yaw) and return the range of each one (max_range when nothing is hit).
+
+        Poses can be scalars or (N,) arrays, the result has shape (len(angles),) or (N, len(angles)).
+        """
+        steps = np.arange(1, int(np.ceil(max_range / (self.resolution / 2))) + 1) * (self.resolution / 2)
+        beam = np.asarray(yaw)[..., None] + angles
+
+        xs = np.asarray(x)[..., None, None] + np.cos(beam)[..., None] * steps
+        ys = np.asarray(y)[..., None, None] + np.sin(beam)[..., None] * steps
+        hits = self.is_occupied(xs, ys)
+
+        first = np.argmax(hits, axis=-1)
+        ranges = np.where(hits.any(axis=-1), steps[first], max_range)
+        return np.minimum(ranges, max_range)
+
+
+class Raycaster():
+    """Batched laser emulation by sphere tracing over a precomputed Euclidean distance field.
+
+    Each ray advances by the distance to the nearest obstacle, so it crosses free space in a
+    few large steps and only marches finely (half a cell) next to walls.
+    """
+
+    def __init__(self, occupancy_map, angles, max_range):
+        """Initialize a Raycaster object.
+        Params
+        ======
+            occupancy_map (OccupancyMap): grid to cast the beams against
+            angles (array): beam angles relative to the laser heading (in radians)
+            max_range (float): range reported for beams that hit nothing (MAX_RANGE)
+        """
+
+        self.map = occupancy_map
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.max_range = max_range
+
+        # distance (in meters) from each cell to the nearest occupied cell, 0 on obstacles;
+        # a one-cell occupied border keeps the rays inside the map
+        padded = np.pad(self.map.occupied, 1, constant_values=True)
+        self.distance = ndimage.distance_transform_edt(~padded) * self.map.resolution
+
+        # step allowed from any point of a cell: a lower bound of the distance to the obstacle
+        # boundaries, at least half a cell in free space and 0 on obstacles (a hit)
+        resolution = self.map.resolution
+        self.min_step = resolution / 2
+        step = np.maximum(self.distance - np.sqrt(2) * resolution, self.min_step)
+        step[padded] = 0.0
+        self.step = step.ravel()
+        self.rows, self.cols = padded.shape
+
+        # sphere tracing stops after trace_iterations or once few beams are left, the remaining
+        # (grazing) beams are then marched densely in one vectorized call
+        self.trace_iterations = 32
+        self.dense_beams = 32
+
+    def lookup(self, x, y):
+        """Sphere-tracing step at world points (0 on obstacles and outside the map)."""
+        col = np.floor((x - self.map.origin[0]) / self.map.resolution).astype(np.int64) + 1
+        row = np.floor((y - self.map.origin[1]) / self.map.resolution).astype(np.int64) + 1
+        np.clip(col, 0, self.cols - 1, out=col)
+        np.clip(row, 0, self.rows - 1, out=row)
+        return self.step[row * self.cols + col]
+
+    def cast(self, x, y, yaw):
+        """Cast all beams from (N,) laser poses in one call.
+
+        Returns an (N, len(angles)) array of ranges (or (len(angles),) for scalar poses),
+        with max_range for beams that hit nothing, the layout of the LaserScan ranges.
+        """
+        scalar = np.ndim(x) == 0
+        x, y, yaw = np.atleast_1d(x, y, yaw)
+
+        beam = yaw[:, None] + self.angles
+        ox = np.repeat(x, len(self.angles))
+        oy = np.repeat(y, len(self.angles))
+        dx = np.cos(beam).ravel()
+        dy = np.sin(beam).ravel()
+
+        ranges = np.full(ox.shape, float(self.max_range))
+        t = np.zeros(ox.shape)
+        active = np.arange(len(ox))
+        dense_beams = max(self.dense_beams, len(ox) // 64)
+
+        for _ in range(self.trace_iterations):
+            if len(active) <= dense_beams:
+                break
+
+            step = self.lookup(ox + t * dx, oy + t * dy)
+
+            hit = step == 0
+            ranges[active[hit]] = t[hit]
+
+            # keep only the beams still travelling, compacting the working arrays
+            t += step
+            keep = ~hit & (t < self.max_range)
+            if not keep.all():
+                active, ox, oy, dx, dy, t = active[keep], ox[keep], oy[keep], dx[keep], dy[keep], t[keep]
+
+        # beams grazing along walls advance by half cells only: march them all at once
+        if len(active) > 0:
+            march = t[:, None] + np.arange(int(np.ceil(self.max_range / self.min_step)) + 1) * self.min_step
+            hits = self.lookup(ox[:, None] + march * dx[:, None], oy[:, None] + march * dy[:, None]) == 0
+            hits &= march < self.max_range
+            found = hits.any(axis=1)
+            ranges[active[found]] = march[found, np.argmax(hits[found], axis=1)]
+
+        ranges = np.minimum(ranges, self.max_range).reshape(beam.shape)
+        return ranges[0] if scalar else ranges
+
+if __name__ == '__main__':
+    """Benchmark sphere tracing against dense ray marching in beams per second."""
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+    with open(os.path.join(CONFIG_PATH, 'config.yaml')) as file:
+        param = yaml.safe_load(file)
+
+    occupancy_map = OccupancyMap(os.path.join(CONFIG_PATH, 'map', 'map.yaml'))
+    angles = np.linspace(LASER_MIN_ANGLE, LASER_MAX_ANGLE, LASER_SAMPLES)
+    raycaster = Raycaster(occupancy_map, angles, param["MAX_RANGE"])
+
+    # random poses in free space
+    rng = np.random.default_rng(0)
+    rows, cols = np.nonzero(~occupancy_map.occupied)
+    for n_poses in [1, 64, 1024]:
+        pick = rng.integers(0, len(rows), n_poses)
+        x = occupancy_map.origin[0] + (cols[pick] + 0.5) * occupancy_map.resolution
+        y = occupancy_map.origin[1] + (rows[pick] + 0.5) * occupancy_map.resolution
+        yaw = rng.uniform(-np.pi, np.pi, n_poses)
+
+        results = {}
+        for name, cast in [('dense', lambda: occupancy_map.raycast(x, y, yaw, angles, param["MAX_RANGE"])),
+                           ('sphere', lambda: raycaster.cast(x, y, yaw))]:
+            repeats = max(1, 2048 // n_poses)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                results[name] = cast()
+            elapsed = time.perf_counter() - start
+            print('{:>6} N={:<5} {:>12.0f} beams/s'.format(name, n_poses, repeats * results[name].size / elapsed))
+
+        print('{:>6} N={:<5} max difference {:.3f} m'.format('', n_poses, np.abs(results['dense'] - results['sphere']).max()))
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
 import numpy as np
+import contextlib
+import weakref
 import random
+import os
 import torch
 from collections import deque, namedtuple
+from functools import partial
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -30,7 +34,7 @@ class ReplayBuffer:
           self.memory.append(e)        
 
      def sample(self):
-          """Prioritized experience replay experience sampling."""
+          """Randomly sample a batch of experiences from memory."""
 
           experiences = random.sample(self.memory, k=self.batch_size)
 
@@ -42,6 +46,20 @@ class ReplayBuffer:
 
           return batch_state, batch_action, batch_rewards, batch_next_states, batch_dones
 
+     def state_dict(self, lock=None):
+          """Stored experiences (the sampling state is the global random module).
+
+          Only the deque is copied here, under lock; the experiences are converted to tuples
+          when the deferred part is resolved (checkpoint.resolve).
+          """
+          with lock if lock is not None else contextlib.nullcontext():
+               experiences = list(self.memory)
+          return {"experiences": partial(list, map(tuple, experiences))}
+
+     def load_state_dict(self, state):
+          self.memory.clear()
+          self.memory.extend(self.experience(*e) for e in state["experiences"])
+
      def erase(self):
           """Erase the memory."""
           self.memory = self.memory.clear()
@@ -50,4 +68,396 @@ class ReplayBuffer:
      def __len__(self):
           """Return the current size of internal memory."""
           return len(self.memory)
-     
\ No newline at end of file
+
+class RowSnapshot:
+     """Rows [0, size) of the arrays of a ring buffer as they were when the snapshot was taken.
+
+     The rows are copied later, chunk by chunk (RingReplayBuffer.copy_rows). Meanwhile the writers
+     call preserve() before overwriting rows, which keeps the original of every row not copied yet
+     (copy-on-write), so the copy does not mix experiences from before and after the snapshot.
+     """
+
+     def __init__(self, arrays, size):
+          self.arrays = arrays
+          self.size = size
+          self.copied = 0                               # rows [0, copied) are copied already
+          self.kept = np.zeros(size, dtype=bool)        # rows whose original is kept
+          self.indices = []
+          self.originals = {name: [] for name in arrays}
+
+     def preserve(self, indices):
+          """Keep the current value of the rows about to be overwritten, unless they are copied already."""
+          indices = np.unique(np.asarray(indices, dtype=np.int64))
+          indices = indices[(indices >= self.copied) & (indices < self.size)]
+          indices = indices[~self.kept[indices]]
+          if len(indices) == 0:
+               return
+          self.kept[indices] = True
+          self.indices.append(indices)
+          for name, array in self.arrays.items():
+               self.originals[name].append(array[indices])
+
+     def restore(self, copies):
+          """Put the kept originals back into the copied rows."""
+          if self.indices:
+               indices = np.concatenate(self.indices)
+               for name, copy in copies.items():
+                    copy[indices] = np.concatenate(self.originals[name])
+          return copies
+
+class RingReplayBuffer:
+     """Fixed-size buffer that stores experience tuples in preallocated arrays."""
+
+     FIELDS = ["states", "actions", "rewards", "next_states", "dones"]
+
+     def __init__(self, buffer_size, batch_size, state_size, action_size, seed=0):
+          """Initialize a RingReplayBuffer object.
+          Params
+          ======
+               buffer_size (int): maximum size of buffer
+               batch_size (int): size of each training batch
+               state_size (int): dimension of each state (ENVIRONMENT_DIM + ROBOT_DIM)
+               action_size (int): dimension of each action (ACTION_DIM)
+          """
+
+          self.buffer_size = int(buffer_size)
+          self.batch_size = batch_size
+          self.state_size = state_size
+          self.action_size = action_size
+          self.rng = np.random.default_rng(seed)
+
+          self.head = 0 # next position to write
+          self.size = 0 # number of stored experiences
+          self.snapshots = weakref.WeakSet() # RowSnapshots still being copied
+          self.allocate()
+
+     def allocate(self):
+          """Allocate the storage arrays."""
+          self.states = np.zeros((self.buffer_size, self.state_size), dtype=np.float32)
+          self.actions = np.zeros((self.buffer_size, self.action_size), dtype=np.float32)
+          self.rewards = np.zeros((self.buffer_size, 1), dtype=np.float32)
+          self.next_states = np.zeros((self.buffer_size, self.state_size), dtype=np.float32)
+          self.dones = np.zeros((self.buffer_size, 1), dtype=np.float32)
+
+     def add(self, state, action, reward, next_state, done):
+          """Add a new experience to memory, overwriting the oldest one when full."""
+          i = self.head
+          self.preserve([i])
+          self.states[i] = state
+          self.actions[i] = action
+          self.rewards[i] = reward
+          self.next_states[i] = next_state
+          self.dones[i] = done
+
+          self.head = (i + 1) % self.buffer_size
+          self.size = min(self.size + 1, self.buffer_size)
+
+     def sample_indices(self):
+          """Draw a batch of uniformly random indices over the stored experiences."""
+          return self.rng.integers(0, self.size, size=self.batch_size)
+
+     def gather(self, indices):
+          """Gather the experiences at the given indices as contiguous arrays."""
+          return (self.states[indices], self.actions[indices], self.rewards[indices],
+                  self.next_states[indices], self.dones[indices])
+
+     def sample(self):
+          """Randomly sample a batch of experiences from memory."""
+
+          batch = self.gather(self.sample_indices())
+
+          return tuple(torch.from_numpy(b).to(device) for b in batch)
+
+     def rows(self):
+          """Arrays holding one row per experience slot, by name."""
+          return {name: getattr(self, name) for name in self.FIELDS}
+
+     def snapshot(self, lock=None):
+          """Register a RowSnapshot of the stored experiences, taken under lock."""
+          with lock if lock is not None else contextlib.nullcontext():
+               snapshot = RowSnapshot(self.rows(), self.size)
+               self.snapshots.add(snapshot)
+          return snapshot
+
+     def preserve(self, indices):
+          """Call before overwriting rows: the pending snapshots keep their original value."""
+          for snapshot in self.snapshots:
+               snapshot.preserve(indices)
+
+     def copy_rows(self, snapshot, lock=None, chunk=65536):
+          """Copy the rows of a snapshot, chunk rows at a time under lock.
+
+          Writers are only blocked for one chunk; the rows they overwrite meanwhile are copied
+          as they were when the snapshot was taken.
+          """
+          arrays = snapshot.arrays
+          copies = {name: np.empty((snapshot.size,) + array.shape[1:], dtype=array.dtype) for name, array in arrays.items()}
+          try:
+               for start in range(0, snapshot.size, chunk):
+                    end = min(start + chunk, snapshot.size)
+                    with lock if lock is not None else contextlib.nullcontext():
+                         for name, array in arrays.items():
+                              copies[name][start:end] = array[start:end]
+                         snapshot.copied = end
+          finally:
+               with lock if lock is not None else contextlib.nullcontext():
+                    self.snapshots.discard(snapshot)
+          return snapshot.restore(copies)
+
+     def state_dict(self, lock=None):
+          """Write position and sampling RNG; the stored experiences are a deferred copy_rows() (checkpoint.resolve)."""
+          return {"head": self.head, "size": self.size, "rng": self.rng.bit_generator.state,
+                  "rows": partial(self.copy_rows, self.snapshot(lock), lock)}
+
+     def load_state_dict(self, state):
+          self.size = int(state["size"])
+          self.head = int(state["head"])
+          self.load_rows(state["rows"])
+          self.rng.bit_generator.state = state["rng"]
+
+     def load_rows(self, rows):
+          for name in self.FIELDS:
+               getattr(self, name)[:self.size] = rows[name]
+
+     def erase(self):
+          """Erase the memory."""
+          self.head = 0
+          self.size = 0
+
+     def __len__(self):
+          """Return the current size of internal memory."""
+          return self.size
+
+
+class MemmapReplayBuffer(RingReplayBuffer):
+     """Ring buffer backed by np.memmap files, so the memory survives restarts."""
+
+     def __init__(self, buffer_size, batch_size, state_size, action_size, path, seed=0):
+          """Initialize a MemmapReplayBuffer object.
+          Params
+          ======
+               buffer_size (int): maximum size of buffer
+               batch_size (int): size of each training batch
+               state_size (int): dimension of each state (ENVIRONMENT_DIM + ROBOT_DIM)
+               action_size (int): dimension of each action (ACTION_DIM)
+               path (str): directory holding the buffer files (reopened if they match)
+          """
+
+          self.path = path
+          super(MemmapReplayBuffer, self).__init__(buffer_size, batch_size, state_size, action_size, seed)
+
+     def allocate(self):
+          """Open the buffer files, creating them when missing or of another shape."""
+          os.makedirs(self.path, exist_ok=True)
+
+          shapes = {
+               "states": (self.buffer_size, self.state_size),
+               "actions": (self.buffer_size, self.action_size),
+               "rewards": (self.buffer_size, 1),
+               "next_states": (self.buffer_size, self.state_size),
+               "dones": (self.buffer_size, 1),
+          }
+          layout = [self.buffer_size, self.state_size, self.action_size]
+
+          # header: head, size, buffer size, state size, action size
+          header_file = os.path.join(self.path, "header.dat")
+          reopen = os.path.exists(header_file) and all(
+               os.path.exists(os.path.join(self.path, name + ".dat")) for name in self.FIELDS)
+          if reopen:
+               self.header = np.memmap(header_file, dtype=np.int64, mode="r+", shape=(5,))
+               reopen = self.header[2:].tolist() == layout
+
+          if not reopen:
+               self.header = np.memmap(header_file, dtype=np.int64, mode="w+", shape=(5,))
+               self.header[:] = [0, 0] + layout
+
+          mode = "r+" if reopen else "w+"
+          for name in self.FIELDS:
+               setattr(self, name, np.memmap(os.path.join(self.path, name + ".dat"),
+                                             dtype=np.float32, mode=mode, shape=shapes[name]))
+
+          self.head, self.size = int(self.header[0]), int(self.header[1])
+
+     def add(self, state, action, reward, next_state, done):
+          """Add a new experience to memory and record the new head/size in the header."""
+          super(MemmapReplayBuffer, self).add(state, action, reward, next_state, done)
+          self.header[0] = self.head
+          self.header[1] = self.size
+
+     def state_dict(self, lock=None):
+          """Write position and sampling RNG; the experiences stay in the files, flushed when the state is resolved."""
+          return {"head": self.head, "size": self.size, "rng": self.rng.bit_generator.state,
+                  "flushed": partial(self.flush)}
+
+     def load_state_dict(self, state):
+          self.size = int(state["size"])
+          self.head = int(state["head"])
+          self.rng.bit_generator.state = state["rng"]
+          self.header[0] = self.head
+          self.header[1] = self.size
+
+     def flush(self):
+          """Write pending changes to disk."""
+          for name in self.FIELDS:
+               getattr(self, name).flush()
+          self.header.flush()
+
+     def erase(self):
+          """Erase the memory."""
+          super(MemmapReplayBuffer, self).erase()
+          self.header[0] = 0
+          self.header[1] = 0
+
+
+class SumTree:
+     """Binary tree whose internal nodes hold the sum of the priorities below them."""
+
+     def __init__(self, capacity):
+          """Initialize a SumTree object.
+          Params
+          ======
+               capacity (int): number of leaves (priorities) stored in the tree
+          """
+
+          self.capacity = int(capacity)
+          # leaves live at [size, 2 * size), the root at index 1
+          self.size = 1
+          while self.size < self.capacity:
+               self.size *= 2
+          self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+     def total(self):
+          """Return the sum of all priorities."""
+          return self.tree[1]
+
+     def max(self):
+          """Return the largest leaf priority."""
+          return self.tree[self.size:self.size + self.capacity].max()
+
+     def get(self, indices):
+          """Return the priorities at the given leaf indices."""
+          return self.tree[self.size + np.asarray(indices)]
+
+     def update(self, indices, priorities):
+          """Set the priorities of a batch of leaves and refresh their ancestors in O(log N)."""
+          nodes = self.size + np.asarray(indices)
+          self.tree[nodes] = priorities
+
+          nodes = np.unique(nodes // 2)
+          while nodes[0] >= 1:
+               self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+               if nodes[0] == 1:
+                    break
+               nodes = np.unique(nodes // 2)
+
+     def find(self, values, n_leaves=None):
+          """Return the leaf indices whose cumulative priority range contains each value.
+
+          Values are clipped just below the total and the result to the first n_leaves leaves
+          (all by default), so rounding never ends the descent on an unfilled, zero-priority leaf.
+          """
+          values = np.minimum(np.array(values, dtype=np.float64), self.total() * (1 - 1e-12))
+          nodes = np.ones(len(values), dtype=np.int64)
+
+          while nodes[0] < self.size:
+               left = 2 * nodes
+               go_right = values > self.tree[left]
+               values = np.where(go_right, values - self.tree[left], values)
+               nodes = np.where(go_right, left + 1, left)
+
+          return np.minimum(nodes - self.size, (self.capacity if n_leaves is None else n_leaves) - 1)
+
+
+class PrioritizedReplayBuffer(RingReplayBuffer):
+     """Ring buffer that samples experiences in proportion to their TD error."""
+
+     def __init__(self, buffer_size, batch_size, state_size, action_size, alpha=0.6, beta=0.4, beta_increment=1e-6, epsilon=1e-6, seed=0):
+          """Initialize a PrioritizedReplayBuffer object.
+          Params
+          ======
+               buffer_size (int): maximum size of buffer
+               batch_size (int): size of each training batch
+               state_size (int): dimension of each state (ENVIRONMENT_DIM + ROBOT_DIM)
+               action_size (int): dimension of each action (ACTION_DIM)
+               alpha (float): how much prioritization is used (0 -> uniform)
+               beta (float): initial importance-sampling correction (1 -> full correction)
+               beta_increment (float): beta annealing step per sampled batch
+               epsilon (float): small constant so that no priority is zero
+          """
+
+          super(PrioritizedReplayBuffer, self).__init__(buffer_size, batch_size, state_size, action_size, seed)
+          self.alpha = alpha
+          self.beta = beta
+          self.beta_increment = beta_increment
+          self.epsilon = epsilon
+          self.tree = SumTree(self.buffer_size)
+          self.max_priority = 1.0
+
+     def add(self, state, action, reward, next_state, done):
+          """Add a new experience to memory with the highest priority seen so far."""
+          i = self.head
+          super(PrioritizedReplayBuffer, self).add(state, action, reward, next_state, done)
+          self.tree.update([i], self.max_priority)
+
+     def sample_indices(self):
+          """Draw one index per equal-mass segment of the priority distribution (stratified)."""
+          segment = self.tree.total() / self.batch_size
+          values = (np.arange(self.batch_size) + self.rng.random(self.batch_size)) * segment
+          return self.tree.find(values, self.size)
+
+     def weights(self, indices):
+          """Importance-sampling weights of the given indices, normalized by their maximum."""
+          probs = self.tree.get(indices) / self.tree.total()
+          weights = np.power(self.size * probs, -self.beta)
+          return (weights / weights.max()).astype(np.float32)
+
+     def sample(self):
+          """Sample a batch of experiences by priority.
+
+          Returns the usual (state, action, reward, next_state, done) tensors followed by
+          the importance-sampling weights and the indices to pass to update_priorities.
+          """
+
+          indices = self.sample_indices()
+          weights = self.weights(indices)
+          self.beta = min(1.0, self.beta + self.beta_increment)
+
+          batch = tuple(torch.from_numpy(b).to(device) for b in self.gather(indices))
+
+          return batch + (torch.from_numpy(weights).to(device), indices)
+
+     def update_priorities(self, indices, td_errors):
+          """Set the priorities of sampled experiences from their absolute TD errors."""
+          priorities = np.power(np.abs(td_errors) + self.epsilon, self.alpha)
+          self.max_priority = max(self.max_priority, float(priorities.max()))
+          self.preserve(indices)
+          self.tree.update(indices, priorities)
+
+     def rows(self):
+          """Experience arrays and the priority of each slot (the leaves of the tree)."""
+          rows = super(PrioritizedReplayBuffer, self).rows()
+          rows["priorities"] = self.tree.tree[self.tree.size:self.tree.size + self.tree.capacity]
+          return rows
+
+     def state_dict(self, lock=None):
+          state = super(PrioritizedReplayBuffer, self).state_dict(lock)
+          state.update(max_priority=self.max_priority, beta=self.beta)
+          return state
+
+     def load_state_dict(self, state):
+          super(PrioritizedReplayBuffer, self).load_state_dict(state)
+          self.max_priority = state["max_priority"]
+          self.beta = state["beta"]
+
+     def load_rows(self, rows):
+          """Load the experiences and rebuild the tree from their priorities."""
+          super(PrioritizedReplayBuffer, self).load_rows(rows)
+          self.tree = SumTree(self.buffer_size)
+          if self.size > 0:
+               self.tree.update(np.arange(self.size), rows["priorities"])
+
+     def erase(self):
+          """Erase the memory."""
+          super(PrioritizedReplayBuffer, self).erase()
+          self.tree = SumTree(self.buffer_size)
+          self.max_priority = 1.0
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+from functools import lru_cache
+import numpy as np
+import os
+
+from scipy import ndimage, spatial
+
+from reinforcement.config import load_poses
+from reinforcement.raycast import OccupancyMap
+
+class PoseSampler():
+    """Start/goal pairs precomputed on the occupancy map and drawn in O(1).
+
+    Candidate positions are the poses of a pose file or, by default, free cells of the map on a
+    spacing grid. Only candidates whose distance to the nearest obstacle (or the map border) is
+    at least clearance are kept, and a pair is valid when both ends lie in the same connected
+    region of that free space and are between min_distance and max_distance apart. The valid
+    pairs are found once with a KD-tree, sorted by distance and split into equally sized
+    distance buckets for a curriculum.
+    """
+
+    def __init__(self, occupancy_map, poses=None, clearance=0.6, min_distance=2.0, max_distance=6.0, n_buckets=1, spacing=0.25):
+        """Initialize a PoseSampler object.
+        Params
+        ======
+            occupancy_map (OccupancyMap): map of the environment
+            poses (array): (N, 2+) candidate positions, free cells every spacing meters when None
+            clearance (float): minimum distance of a start or goal to the obstacles (in meters)
+            min_distance, max_distance (float): allowed distance between start and goal (in meters)
+            n_buckets (int): distance buckets of the curriculum
+            spacing (float): distance between the map candidates (in meters)
+        """
+
+        self.map = occupancy_map
+
+        # ================== FREE SPACE ================== #
+        # the border counts as an obstacle, like the space outside the map in is_occupied
+        occupied = np.pad(occupancy_map.occupied, 1, constant_values=True)
+        self.obstacle_distance = ndimage.distance_transform_edt(~occupied)[1:-1, 1:-1] * occupancy_map.resolution
+        self.regions, _ = ndimage.label(self.obstacle_distance >= clearance)
+
+        # ================== CANDIDATES ================== #
+        if poses is None:
+            stride = max(1, int(round(spacing / occupancy_map.resolution)))
+            rows, cols = np.nonzero(self.regions[::stride, ::stride])
+            rows, cols = rows * stride, cols * stride
+            positions = occupancy_map.origin + (np.column_stack([cols, rows]) + 0.5) * occupancy_map.resolution
+        else:
+            positions = np.asarray(poses, dtype=np.float64).reshape(len(poses), -1)[:, :2]
+            rows, cols = occupancy_map.world_to_grid(positions[:, 0], positions[:, 1])
+            inside = (rows >= 0) & (rows < occupancy_map.height) & (cols >= 0) & (cols < occupancy_map.width)
+            positions, rows, cols = positions[inside], rows[inside], cols[inside]
+            free = self.regions[rows, cols] > 0
+            positions, rows, cols = positions[free], rows[free], cols[free]
+        self.positions = positions
+        region = self.regions[rows, cols]
+
+        # ================== VALID PAIRS ================== #
+        pairs = np.empty((0, 2), dtype=np.int64)
+        if len(positions) > 1:
+            pairs = spatial.cKDTree(positions).query_pairs(max_distance, output_type='ndarray')
+        distance = np.hypot(*(positions[pairs[:, 0]] - positions[pairs[:, 1]]).T)
+        keep = (distance >= min_distance) & (region[pairs[:, 0]] == region[pairs[:, 1]])
+        pairs, distance = pairs[keep], distance[keep]
+        if len(pairs) < n_buckets:
+            raise ValueError('{} start/goal pairs with {} m clearance between {} and {} m, {} buckets requested'.format(
+                len(pairs), clearance, min_distance, max_distance, n_buckets))
+
+        # both directions, sorted by distance
+        pairs = np.vstack([pairs, pairs[:, ::-1]])
+        distance = np.concatenate([distance, distance])
+        order = np.argsort(distance, kind='stable')
+        self.pairs, self.distance = pairs[order], distance[order]
+
+        # bucket b holds self.pairs[edges[b]:edges[b + 1]]
+        self.edges = np.linspace(0, len(self.pairs), n_buckets + 1).round().astype(np.int64)
+
+    @classmethod
+    def from_config(cls, param):
+        """Sampler of config.yaml, built once per process and shared (see load_sampler)."""
+        map_yaml = os.path.join(param["CONFIG_PATH"], 'map', 'map.yaml')
+        pose_file = None if param["POSE_SOURCE"] == 'map' else os.path.join(param["CONFIG_PATH"], 'pose', param["POSE_SOURCE"])
+        return load_sampler(map_yaml, pose_file, param["POSE_CLEARANCE"], param["MIN_GOAL_DISTANCE"],
+                            param["MAX_GOAL_DISTANCE"], param["DISTANCE_BUCKETS"])
+
+    @property
+    def n_buckets(self):
+        return len(self.edges) - 1
+
+    def bucket_range(self, bucket):
+        """Shortest and longest start/goal distance of a bucket (in meters)."""
+        return self.distance[self.edges[bucket]], self.distance[self.edges[bucket + 1] - 1]
+
+    def indices(self, rng, n=None, bucket=None):
+        if bucket is not None and bucket >= self.n_buckets:
+            raise ValueError('Bucket {} requested, the sampler has {} (DISTANCE_BUCKETS)'.format(bucket, self.n_buckets))
+        low, high = (0, len(self.pairs)) if bucket is None or bucket < 0 else self.edges[bucket:bucket + 2]
+        # rng.random works with both np.random and a Generator
+        return low + np.floor(rng.random(n) * (high - low)).astype(np.int64)
+
+    def sample(self, rng=np.random, bucket=None):
+        """Random start (x, y, yaw) and goal (x, y), from every pair or only those of bucket."""
+        start, goal = self.pairs[self.indices(rng, None, bucket)]
+        yaw = rng.uniform(-np.pi, np.pi)
+        return (self.positions[start, 0], self.positions[start, 1], yaw), tuple(self.positions[goal])
+
+    def sample_batch(self, n, rng=np.random, bucket=None):
+        """n random pairs at once: (n, 3) starts and (n, 2) goals."""
+        pairs = self.pairs[self.indices(rng, n, bucket)]
+        starts = np.column_stack([self.positions[pairs[:, 0]], rng.uniform(-np.pi, np.pi, n)])
+        return starts, self.positions[pairs[:, 1]]
+
+@lru_cache(maxsize=None)
+def load_sampler(map_yaml, pose_file=None, clearance=0.6, min_distance=2.0, max_distance=6.0, n_buckets=1):
+    """PoseSampler of a map and an optional pose file, precomputed once per process."""
+    poses = None if pose_file is None else load_poses(pose_file)
+    return PoseSampler(OccupancyMap(map_yaml), poses, clearance, min_distance, max_distance, n_buckets)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+class ScanProcessor():
+    """Turns raw laser ranges into the ENVIRONMENT_DIM sectors of the state, without per-message allocation."""
+
+    def __init__(self, environment_dim, max_range, noise_sigma=0.0, seed=None):
+        """Initialize a ScanProcessor object.
+        Params
+        ======
+            environment_dim (int): number of sectors in the state (ENVIRONMENT_DIM)
+            max_range (float): value used for inf readings and cap of every range (MAX_RANGE)
+            noise_sigma (float): std of the gaussian noise of add_noise (NOISE_SIGMA), 0 -> no noise
+            seed (int): random seed of the noise
+        """
+
+        self.environment_dim = environment_dim
+        self.max_range = max_range
+        self.noise_sigma = noise_sigma
+        self.rng = np.random.default_rng(seed)
+
+        # two output buffers used in turn, so the array returned by the previous call
+        # is not modified while a reader on another thread may still hold it
+        self.outputs = np.zeros((2, environment_dim))
+        self.current = 0
+        self.noise = np.zeros(environment_dim)
+        self.noisy = np.zeros(environment_dim)
+        self.ranges = np.zeros(0)
+        self.starts = None
+
+    def resize(self, n_ranges):
+        """Allocate the buffers for scans of n_ranges readings (only when the scan length changes)."""
+        self.ranges = np.zeros(n_ranges)
+        self.nan = np.zeros(n_ranges, dtype=bool)
+        # first reading of each sector, sectors split the scan into equal angular bins
+        if n_ranges >= self.environment_dim:
+            self.starts = np.linspace(0, n_ranges, self.environment_dim + 1).astype(np.int64)[:-1]
+        else:
+            self.starts = None
+
+    def clean(self, ranges):
+        """Copy raw ranges into the internal buffer with inf -> max_range and NaN -> 0, capped at max_range."""
+        if len(ranges) != len(self.ranges):
+            self.resize(len(ranges))
+
+        self.ranges[:] = ranges
+        np.isnan(self.ranges, out=self.nan)
+        np.copyto(self.ranges, 0.0, where=self.nan)
+        np.minimum(self.ranges, self.max_range, out=self.ranges)
+        return self.ranges
+
+    def process(self, ranges):
+        """Return the min-pooled sectors of a scan, without noise (see add_noise).
+
+        The result is written into one of two preallocated arrays used in turn, so it stays
+        valid until the next-but-one call.
+        """
+        self.clean(ranges)
+        self.current = 1 - self.current
+        out = self.outputs[self.current]
+
+        # ================== MIN-POOL INTO SECTORS ================== #
+        if self.starts is not None:
+            np.minimum.reduceat(self.ranges, self.starts, out=out)
+        else:
+            # fewer readings than sectors: pad with zeros
+            out[:] = 0.0
+            out[:len(self.ranges)] = self.ranges
+
+        return out
+
+    def pool(self, ranges):
+        """Min-pool a batch of clean (N, n_ranges) scans into new (N, ENVIRONMENT_DIM) sectors.
+
+        The sectors are the ones of process(), for scans that need no inf/NaN replacement
+        (e.g. the beams of the NumPy simulator).
+        """
+        ranges = np.asarray(ranges)
+        if ranges.shape[-1] != len(self.ranges):
+            self.resize(ranges.shape[-1])
+
+        if self.starts is not None:
+            return np.minimum.reduceat(ranges, self.starts, axis=-1)
+        out = np.zeros(ranges.shape[:-1] + (self.environment_dim,))
+        out[..., :ranges.shape[-1]] = ranges
+        return out
+
+    def reseed(self, seed):
+        """Restart the noise from seed, e.g. to give an evaluation episode the same noise on every worker."""
+        self.rng = np.random.default_rng(seed)
+
+    def add_noise(self, sectors):
+        """Return sectors with gaussian noise of std noise_sigma, clipped to [0, max_range].
+
+        Only the state given to the agent is noisy, collisions are checked on the sectors
+        from process(). The result is written into a preallocated array reused by the next call
+        (reallocated only when the shape of sectors changes, e.g. for a batch of robots).
+        """
+        if self.noisy.shape != np.shape(sectors):
+            self.noisy = np.zeros(np.shape(sectors))
+            self.noise = np.zeros(np.shape(sectors))
+        out = self.noisy
+        out[:] = sectors
+        if self.noise_sigma > 0:
+            self.rng.standard_normal(out=self.noise)
+            self.noise *= self.noise_sigma
+            out += self.noise
+            np.clip(out, 0.0, self.max_range, out=out)
+        return out
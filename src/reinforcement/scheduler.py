@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+from reinforcement.inference import LatencyTracker
+
+class UpdateScheduler():
+    """Decides when the agent learns and times every learn call.
+
+    'episode' mode keeps the original schedule: t gradient steps when an episode of t
+    steps ends. 'ratio' mode runs UPDATE_RATIO gradient steps per environment step, in
+    calls of GRADIENT_STEPS, once the replay buffer holds UPDATE_WARMUP transitions; with
+    background=True the gradient steps run on a separate thread while the environment steps.
+    Acting and storing transitions must then hold self.lock.
+    """
+
+    def __init__(self, agent, mode='episode', ratio=1.0, warmup=1000, gradient_steps=1, background=False):
+        """Initialize an UpdateScheduler object.
+        Params
+        ======
+            agent (Agent): agent trained by the scheduler
+            mode (str): 'episode' or 'ratio'
+            ratio (float): gradient steps per environment step ('ratio' mode)
+            warmup (int): transitions in the replay buffer before the first gradient step ('ratio' mode)
+            gradient_steps (int): gradient steps per learn call ('ratio' mode)
+            background (bool): run the gradient steps on a separate thread ('ratio' mode)
+        """
+
+        self.agent = agent
+        self.mode = mode
+        self.ratio = ratio
+        self.warmup = warmup
+        self.gradient_steps = gradient_steps
+        self.background = background and mode == 'ratio'
+
+        self.lock = threading.RLock()           # held by every learn call, acting and storing transitions
+        self.pending = threading.Condition()    # signals new gradient steps to the background thread
+        self.credit = 0.0                       # gradient steps owed to the environment steps taken
+        self.env_steps = 0
+        self.updates = 0
+        self.learn_time = 0.0
+        self.latency = LatencyTracker()
+        self.start_time = time.perf_counter()
+
+        self.stopped = False
+        self.thread = None
+        if self.background:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    @classmethod
+    def from_config(cls, agent, param):
+        return cls(agent, param["UPDATE_MODE"], param["UPDATE_RATIO"], param["UPDATE_WARMUP"],
+                   param["GRADIENT_STEPS"], param["BACKGROUND_TRAINING"])
+
+    def learn(self, n):
+        """Run n gradient steps under the lock and record the duration of the call."""
+        start = time.perf_counter()
+        with self.lock:
+            iteration = self.agent.iteration
+            self.agent.learn(n)
+            done = self.agent.iteration - iteration  # 0 while the buffer holds less than a batch
+        elapsed = time.perf_counter() - start
+
+        if done > 0:
+            self.latency.record(elapsed)
+            self.learn_time += elapsed
+            self.updates += done
+
+    def step(self, n_env_steps=1):
+        """Account for n_env_steps environment steps, learning in the foreground when due."""
+        self.env_steps += n_env_steps
+        if self.mode != 'ratio' or len(self.agent.memory) < max(self.warmup, self.agent.batch_size + 1):
+            return
+
+        with self.pending:
+            self.credit += self.ratio * n_env_steps
+            if self.background:
+                self.pending.notify()
+                return
+
+        while self.credit >= self.gradient_steps:
+            self.credit -= self.gradient_steps
+            self.learn(self.gradient_steps)
+
+    def end_episode(self, t):
+        """Learn at the end of an episode of t steps ('episode' mode only)."""
+        if self.mode == 'episode':
+            self.learn(t)
+
+    def run(self):
+        """Background thread: run the gradient steps owed by step()."""
+        while True:
+            with self.pending:
+                while self.credit < self.gradient_steps and not self.stopped:
+                    self.pending.wait()
+                if self.stopped:
+                    return
+                self.credit -= self.gradient_steps
+            self.learn(self.gradient_steps)
+
+    def stop(self):
+        """Stop the background thread, the gradient steps still owed are dropped."""
+        if self.thread is not None:
+            with self.pending:
+                self.stopped = True
+                self.pending.notify()
+            self.thread.join()
+
+    def state_dict(self):
+        return {'credit': self.credit, 'env_steps': self.env_steps, 'updates': self.updates}
+
+    def load_state_dict(self, state):
+        with self.pending:
+            self.credit = state['credit']
+        self.env_steps = state['env_steps']
+        self.updates = state['updates']
+
+    def stats(self):
+        """Timing of the learn calls and achieved update/environment step ratio."""
+        wall = time.perf_counter() - self.start_time
+        stats = {'env_steps': self.env_steps,
+                 'updates': self.updates,
+                 'ratio': self.updates / max(self.env_steps, 1),
+                 'learn_time': self.learn_time,
+                 'learn_fraction': self.learn_time / wall,
+                 'updates_per_second': self.updates / max(self.learn_time, 1e-9)}
+        stats.update(self.latency.percentiles())
+        return stats
+
+    def report(self):
+        stats = self.stats()
+        return 'Updates {} / Env steps {} (ratio {:.2f}) | learn {:.0f}% of wall time, {:.0f} updates/s, p50 {:.1f} ms p99 {:.1f} ms per call'.format(
+            stats['updates'], stats['env_steps'], stats['ratio'], 100 * stats['learn_fraction'], stats['updates_per_second'],
+            stats.get('p50', 0.0) / 1e3, stats.get('p99', 0.0) / 1e3)
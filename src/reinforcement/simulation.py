@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import time
+import os
+
+from reinforcement.config import load_config
+from reinforcement.geometry import robot_state
+from reinforcement.raycast import OccupancyMap, Raycaster, LASER_MIN_ANGLE, LASER_MAX_ANGLE, LASER_OFFSET, LASER_SAMPLES
+from reinforcement.scan import ScanProcessor
+from reinforcement.sampler import PoseSampler
+
+def integrate(occupancy_map, x, y, yaw, linear, angular, time_delta, sim_step):
+    """Integrate unicycle kinematics for (N,) robots over time_delta in sim_step sub-steps.
+
+    All sub-steps are evaluated at once, each robot stops at its last free pose before an obstacle.
+    """
+    n_steps = max(1, int(round(time_delta / sim_step)))
+    dt = time_delta / n_steps
+    ticks = np.arange(1, n_steps + 1)
+
+    yaws = yaw[:, None] + angular[:, None] * dt * ticks
+    xs = x[:, None] + np.cumsum(linear[:, None] * np.cos(yaws) * dt, axis=1)
+    ys = y[:, None] + np.cumsum(linear[:, None] * np.sin(yaws) * dt, axis=1)
+
+    blocked = occupancy_map.is_occupied(xs, ys)
+    free = np.where(blocked.any(axis=1), np.argmax(blocked, axis=1), n_steps)
+    last = np.maximum(free - 1, 0)
+    rows = np.arange(len(x))
+    moved = free > 0
+
+    new_x = np.where(moved, xs[rows, last], x)
+    new_y = np.where(moved, ys[rows, last], y)
+    new_yaw = np.where(moved, yaws[rows, last], yaw)
+    return new_x, new_y, np.arctan2(np.sin(new_yaw), np.cos(new_yaw))
+
+
+class SimEnv():
+    """Gazebo-free environment that simulates the robot and its laser on the occupancy grid.
+
+    Same step_env/reset_env contract as environment.Env, no ROS install required.
+    """
+
+    def __init__(self, CONFIG_PATH, seed=None):
+
+        # shared configuration, read without Extension so that rospy is never imported
+        param = load_config(CONFIG_PATH)
+
+        self.environment_dim = param["ENVIRONMENT_DIM"]
+        self.time_delta = param["TIME_DELTA"]
+        self.collision_dist = param["COLLISION_DIST"]
+        self.max_range = param["MAX_RANGE"]
+        self.sim_step = param["SIM_STEP"]
+
+        self.map = OccupancyMap(os.path.join(CONFIG_PATH, 'map', 'map.yaml'))
+        # full Hokuyo fan, min-pooled into sectors and made noisy exactly as in environment.Env
+        self.angles = np.linspace(LASER_MIN_ANGLE, LASER_MAX_ANGLE, LASER_SAMPLES)
+        self.raycaster = Raycaster(self.map, self.angles, self.max_range)
+        self.rng = np.random.default_rng(seed)
+        self.scan_processor = ScanProcessor(self.environment_dim, self.max_range, param["NOISE_SIGMA"],
+                                            self.rng.integers(2 ** 32))
+        self.sampler = PoseSampler.from_config(param)
+        self.pose_bucket = param["POSE_BUCKET"]
+
+        self.odom_x, self.odom_y, self.yaw = 0.0, 2.0, 0.0
+        self.goal_x, self.goal_y = 0.0, -2.0
+        self.scan_data = np.full(self.environment_dim, self.max_range)
+
+    def scan(self):
+        """Simulate the laser scan from the current pose, min-pooled into ENVIRONMENT_DIM sectors."""
+        laser_x = self.odom_x + LASER_OFFSET * np.cos(self.yaw)
+        laser_y = self.odom_y + LASER_OFFSET * np.sin(self.yaw)
+        return self.scan_processor.process(self.raycaster.cast(laser_x, laser_y, self.yaw))
+
+    def robot_state(self, action):
+        """Distance and heading to the goal followed by the last action."""
+        robot = robot_state(self.odom_x, self.odom_y, self.goal_x, self.goal_y, self.yaw, action[0], action[1])
+        return robot[0], robot
+
+    def step_env(self, action):
+        target = False
+
+        # ================== INTEGRATE UNICYCLE KINEMATICS ================== #
+        x, y, yaw = integrate(self.map, np.array([self.odom_x]), np.array([self.odom_y]), np.array([self.yaw]),
+                              np.array([action[0]]), np.array([action[1]]), self.time_delta, self.sim_step)
+        self.odom_x, self.odom_y, self.yaw = x[0], y[0], yaw[0]
+
+        # ================== READ SCAN DATA ================== #
+        self.scan_data = self.scan()
+        min_laser = self.scan_data.min()
+        collision = min_laser < self.collision_dist
+        done = collision
+
+        # ================== CALCULATE DISTANCE AND THETA ================== #
+        distance, toGoal = self.robot_state(action)
+
+        r3 = lambda x: 1 - x if x < 1 else 0.0
+        reward = action[0] / 2 - abs(action[1]) / 2 - r3(min_laser) / 2
+
+        # ================== SET STATE ================== #
+        if distance < 0.3:
+            target = True
+            done = True
+            reward = 80
+        if collision:
+            reward = -100
+
+        state = np.append(self.scan_processor.add_noise(self.scan_data), toGoal)
+
+        return state, reward, done, target
+
+    def reset_env(self, start=None, goal=None):
+        """Reset the robot and the goal, start (x, y, yaw) and goal (x, y) are fixed for evaluation."""
+
+        # ================== SET RANDOM ROBOT AND GOAL ================== #
+        (self.odom_x, self.odom_y, self.yaw), (self.goal_x, self.goal_y) = self.sampler.sample(self.rng, self.pose_bucket)
+        if start is not None:
+            self.odom_x, self.odom_y, self.yaw = start
+        if goal is not None:
+            self.goal_x, self.goal_y = goal[:2]
+
+        # ================== GET STATE SCAN ================== #
+        self.scan_data = self.scan()
+        _, toGoal = self.robot_state([0.0, 0.0])
+
+        state = np.append(self.scan_processor.add_noise(self.scan_data), toGoal)
+
+        return state
+
+class VecSimEnv():
+    """N independent simulated robots stepped in lockstep.
+
+    step_env takes an (N, 2) action array and returns (N, state) next states with (N,) rewards,
+    dones and targets. Instances that finish (done or MAX_TIMESTEP reached) are reset
+    automatically; the returned next states are the final ones and self.states holds the
+    observations to act on at the next tick.
+    """
+
+    def __init__(self, CONFIG_PATH, num_envs, seed=None):
+
+        # shared configuration, read without Extension so that rospy is never imported
+        param = load_config(CONFIG_PATH)
+
+        self.num_envs = num_envs
+        self.environment_dim = param["ENVIRONMENT_DIM"]
+        self.time_delta = param["TIME_DELTA"]
+        self.collision_dist = param["COLLISION_DIST"]
+        self.max_range = param["MAX_RANGE"]
+        self.sim_step = param["SIM_STEP"]
+        self.max_t = param["MAX_TIMESTEP"]
+
+        self.map = OccupancyMap(os.path.join(CONFIG_PATH, 'map', 'map.yaml'))
+        # full Hokuyo fan, min-pooled into sectors and made noisy exactly as in environment.Env
+        self.angles = np.linspace(LASER_MIN_ANGLE, LASER_MAX_ANGLE, LASER_SAMPLES)
+        self.raycaster = Raycaster(self.map, self.angles, self.max_range)
+        self.rng = np.random.default_rng(seed)
+        self.scan_processor = ScanProcessor(self.environment_dim, self.max_range, param["NOISE_SIGMA"],
+                                            self.rng.integers(2 ** 32))
+        self.sampler = PoseSampler.from_config(param)
+        self.pose_bucket = param["POSE_BUCKET"]
+
+        self.odom_x = np.zeros(num_envs)
+        self.odom_y = np.zeros(num_envs)
+        self.yaw = np.zeros(num_envs)
+        self.goal_x = np.zeros(num_envs)
+        self.goal_y = np.zeros(num_envs)
+        self.timesteps = np.zeros(num_envs, dtype=np.int64)
+        self.states = np.zeros((num_envs, self.environment_dim + 4))
+
+    def scan(self, mask=slice(None)):
+        """Simulate the laser scans of the selected robots, min-pooled into sectors, shape (n, ENVIRONMENT_DIM)."""
+        x, y, yaw = self.odom_x[mask], self.odom_y[mask], self.yaw[mask]
+        laser_x = x + LASER_OFFSET * np.cos(yaw)
+        laser_y = y + LASER_OFFSET * np.sin(yaw)
+        return self.scan_processor.pool(self.raycaster.cast(laser_x, laser_y, yaw))
+
+    def robot_state(self, actions, mask=slice(None)):
+        """Distance and heading to the goal of the selected robots followed by their last action, shape (n, 4)."""
+        return robot_state(self.odom_x[mask], self.odom_y[mask], self.goal_x[mask], self.goal_y[mask], self.yaw[mask],
+                           actions[:, 0], actions[:, 1])
+
+    def reset_env(self, mask=None):
+        """Reset the instances selected by mask (all by default) and return self.states."""
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        n = int(mask.sum())
+
+        # ================== SET RANDOM ROBOT AND GOAL ================== #
+        starts, goals = self.sampler.sample_batch(n, self.rng, self.pose_bucket)
+        self.odom_x[mask], self.odom_y[mask], self.yaw[mask] = starts.T
+        self.goal_x[mask], self.goal_y[mask] = goals.T
+        self.timesteps[mask] = 0
+
+        # ================== GET STATE SCAN ================== #
+        scans = self.scan(mask)
+        robot = self.robot_state(np.zeros((n, 2)), mask)
+        self.states[mask] = np.hstack([self.scan_processor.add_noise(scans), robot])
+
+        return self.states
+
+    def step_env(self, actions):
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, 2)
+
+        # ================== INTEGRATE UNICYCLE KINEMATICS ================== #
+        self.odom_x, self.odom_y, self.yaw = integrate(self.map, self.odom_x, self.odom_y, self.yaw,
+                                                       actions[:, 0], actions[:, 1], self.time_delta, self.sim_step)
+        self.timesteps += 1
+
+        # ================== READ SCAN DATA ================== #
+        scans = self.scan()
+        min_laser = scans.min(axis=1)
+        collision = min_laser < self.collision_dist
+
+        # ================== CALCULATE DISTANCE AND THETA ================== #
+        robot = self.robot_state(actions)
+
+        r3 = np.where(min_laser < 1, 1 - min_laser, 0.0)
+        rewards = actions[:, 0] / 2 - np.abs(actions[:, 1]) / 2 - r3 / 2
+
+        # ================== SET STATE ================== #
+        targets = robot[:, 0] < 0.3
+        rewards[targets] = 80
+        rewards[collision] = -100
+        dones = targets | collision
+
+        next_states = np.hstack([self.scan_processor.add_noise(scans), robot])
+        self.states = next_states.copy()
+
+        # ================== AUTOMATIC RESET ================== #
+        finished = dones | (self.timesteps >= self.max_t)
+        if finished.any():
+            self.reset_env(finished)
+
+        return next_states, rewards, dones, targets
+
+if __name__ == '__main__':
+    """Benchmark the simulator with random actions."""
+
+    CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'config'))
+    env = SimEnv(CONFIG_PATH, seed=0)
+    max_t = load_config(CONFIG_PATH)["MAX_TIMESTEP"]
+
+    n_steps = 5000
+    env.reset_env()
+    start = time.perf_counter()
+    for t in range(n_steps):
+        _, _, done, _ = env.step_env([np.random.uniform(0, 1), np.random.uniform(-1, 1)])
+        if done or t % max_t == 0:
+            env.reset_env()
+    elapsed = time.perf_counter() - start
+
+    print('SimEnv: {} steps in {:.2f} s ({:.0f} steps/s)'.format(n_steps, elapsed, n_steps / elapsed))
+
+    for num_envs in [1, 8, 64]:
+        env = VecSimEnv(CONFIG_PATH, num_envs, seed=0)
+        env.reset_env()
+        n_ticks = max(1, n_steps // num_envs)
+        start = time.perf_counter()
+        for _ in range(n_ticks):
+            actions = np.column_stack([np.random.uniform(0, 1, num_envs), np.random.uniform(-1, 1, num_envs)])
+            env.step_env(actions)
+        elapsed = time.perf_counter() - start
+
+        print('VecSimEnv (N={}): {} steps in {:.2f} s ({:.0f} steps/s)'.format(
+            num_envs, n_ticks * num_envs, elapsed, n_ticks * num_envs / elapsed))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import rospy
+
+class WorldStepper():
+    """Advances the simulation by a fixed number of physics iterations per control step.
+
+    Physics is unpaused until the simulation clock has moved by iterations * step_size and
+    paused again, so the control period is fixed in simulation time whatever the real-time
+    factor. The clock is fed through tick() (the /clock topic with ROS), its publish rate
+    bounds the overshoot: set /gazebo/pub_clock_frequency to the physics update rate to stop
+    within an iteration or two of the target.
+    """
+
+    def __init__(self, iterations, step_size, pause, unpause, timeout=5.0):
+        """Initialize a WorldStepper object.
+        Params
+        ======
+            iterations (int): physics iterations per control step
+            step_size (float): duration of one physics iteration (max_step_size of the world)
+            pause (callable): pauses the physics
+            unpause (callable): unpauses the physics
+            timeout (float): maximum wall-clock time to wait for the iterations (in seconds)
+        """
+
+        self.iterations = iterations
+        self.step_size = step_size
+        self.pause = pause
+        self.unpause = unpause
+        self.timeout = timeout
+
+        self.sim_time = None
+        self.ticked = threading.Event()
+
+    def tick(self, sim_time):
+        """Record the current simulation time (called for every clock message)."""
+        self.sim_time = sim_time
+        self.ticked.set()
+
+    def wait_until(self, target):
+        """Wait until the simulation time reaches target; False on timeout."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            self.ticked.clear()
+            if self.sim_time is not None and self.sim_time >= target:
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.ticked.wait(remaining)
+
+    def step(self):
+        """Run the physics for one control step and return the number of iterations executed."""
+        start = self.sim_time if self.sim_time is not None else 0.0
+        # half an iteration of slack against floating point error on the clock
+        target = start + (self.iterations - 0.5) * self.step_size
+
+        self.unpause()
+        reached = self.wait_until(target)
+        self.pause()
+
+        if not reached:
+            rospy.logwarn('World Step                  => Clock did not advance {} iterations in {} s'.format(self.iterations, self.timeout))
+
+        end = self.sim_time if self.sim_time is not None else start
+        return int(round((end - start) / self.step_size))
+
+def ros_world_stepper(time_delta, timeout=5.0, gazebo_ns="/gazebo"):
+    """Create a WorldStepper over the Gazebo services, running TIME_DELTA of simulation per step.
+
+    The service proxies are persistent and waited for once, here.
+    """
+    from std_srvs.srv import Empty
+    from gazebo_msgs.srv import GetPhysicsProperties
+    from rosgraph_msgs.msg import Clock
+
+    for service in ["/pause_physics", "/unpause_physics", "/get_physics_properties"]:
+        rospy.wait_for_service(gazebo_ns + service)
+
+    pause = rospy.ServiceProxy(gazebo_ns + "/pause_physics", Empty, persistent=True)
+    unpause = rospy.ServiceProxy(gazebo_ns + "/unpause_physics", Empty, persistent=True)
+    step_size = rospy.ServiceProxy(gazebo_ns + "/get_physics_properties", GetPhysicsProperties)().time_step
+
+    iterations = max(1, int(round(time_delta / step_size)))
+    stepper = WorldStepper(iterations, step_size, pause, unpause, timeout)
+    stepper.clock = rospy.Subscriber("/clock", Clock, lambda msg: stepper.tick(msg.clock.to_sec()))
+
+    return stepper
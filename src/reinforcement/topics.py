@@ -2,10 +2,10 @@
 #! /usr/bin/env python3
 
 from geometry_msgs.msg import Twist
-import yaml
-import os
 import rospy
 
+from reinforcement.config import load_config
+
 class Mensage():
      def __init__(self, CONFIG_PATH):       
 
@@ -30,10 +30,7 @@ class Mensage():
                     self.rate.sleep()
 
      def load_config(self, config_name):
-          with open(os.path.join(self.CONFIG_PATH, config_name)) as file:
-               param = yaml.safe_load(file)
-
-          return param
+          return load_config(self.CONFIG_PATH, config_name)
 
      def shutdownhook(self):
           """Shutdown hook for the node."""
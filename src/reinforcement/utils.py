@@ -1,11 +1,12 @@
 #! /usr/bin/env python3
 
 import numpy as np
-import math
-import yaml
 import os
 import rospy
 
+from reinforcement.config import load_config, load_poses
+from reinforcement import geometry
+
 class Extension():
      def __init__(self, CONFIG_PATH):       
 
@@ -19,59 +20,17 @@ class Extension():
      def angles(self, odom_x, odom_y, goal_x, goal_y, angle):
           """Calculate the relative angle between the robots heading and heading toward the goal."""
 
-          skew_x = goal_x - odom_x
-          skew_y = goal_y - odom_y
-          dot = skew_x * 1 + skew_y * 0
-          mag1 = math.sqrt(math.pow(skew_x, 2) + math.pow(skew_y, 2))
-          mag2 = math.sqrt(math.pow(1, 2) + math.pow(0, 2))
-          if mag1 * mag2 == 0:
-               beta = 0
-          else:
-               beta = math.acos(dot / (mag1 * mag2))
-          if skew_y < 0:
-               if skew_x < 0:
-                    beta = -beta
-               else:
-                    beta = 0 - beta
-          theta = beta - angle
-          if theta > np.pi:
-               theta = np.pi - theta
-               theta = -np.pi - theta
-          if theta < -np.pi:
-               theta = -np.pi - theta
-               theta = np.pi - theta
-
-          return theta
+          return geometry.angles(odom_x, odom_y, goal_x, goal_y, angle)
 
      def distance_to_goal(self, odom_x: float, odom_y: float, goal_x: float, goal_y: float):
           """Calculate the distance between the robot and the goal."""
 
-          distance = math.hypot(goal_x - odom_x, goal_y - odom_y)
-
-          return distance
+          return geometry.distance_to_goal(odom_x, odom_y, goal_x, goal_y)
 
      def poses(self, path_waypoints):
           """Load the waypoints from the yaml file."""
           
-          goals = []
-          list = []
-
-          with open('/home/user/ws/src/reinforcement/config/pose/' + path_waypoints) as f:
-               data = yaml.safe_load(f)
-               for i in data:
-                    list.append(i['position'])
-
-               for i in list:
-                    str_x = str(i[0]).strip('[]')
-                    str_y = str(i[1]).strip('[]')
-                    str_yaw = str(i[2]).strip('[]')
-                    
-                    x = float(str_x)
-                    y = float(str_y)
-                    yaw = float(str_yaw)
-                    goals.append((x, y, yaw))
-
-          return goals
+          return list(load_poses(os.path.join(self.CONFIG_PATH, 'pose', path_waypoints)))
      
      # ==== Reward Functions ==== #
      
@@ -102,16 +61,11 @@ class Extension():
      def range(self, scan):
           """Returns an array of the minimum distances from the laser scan data"""
 
-          scan_range = []
-          for i in range(len(scan.ranges)):
-               if scan.ranges[i] == float('Inf'):
-                    scan_range.append(self.max_range)
-               elif np.isnan(scan.ranges[i]):
-                    scan_range.append(0)
-               else:
-                    scan_range.append(scan.ranges[i])
-     
-          return np.array(scan_range)
+          scan_range = np.array(scan.ranges, dtype=np.float64)
+          scan_range[np.isposinf(scan_range)] = self.max_range
+          scan_range[np.isnan(scan_range)] = 0
+
+          return scan_range
      
      # ==== Helper Functions === #
      def shutdownhook(self):
@@ -119,29 +73,19 @@ class Extension():
           rospy.is_shutdown()
 
      def load_config(self, config_name):
-          with open(os.path.join('/home/user/ws/src/reinforcement/config/config.yaml')) as file:
-               param = yaml.safe_load(file)
-
-          return param
+          """Configuration shared by the whole process, parsed once (see config.py)."""
+          return load_config(self.CONFIG_PATH, config_name)
 
      # ==== Random Functions ==== #
      def select_poses(self, poses):
-          """Select two random poses from the list of poses."""
+          """Select two different random poses from the list of poses."""
 
           if len(poses) < 2:
                raise ValueError("The 'poses' list must have at least two elements")
 
-          index_robot = int(round(np.random.uniform(0, len(poses))))
-          index_target = int(round(np.random.uniform(0, len(poses))))
-
-          # Make sure that the robot and target are not the same
-          while index_robot == index_target:
-               index_target = int(round(np.random.uniform(0, len(poses))))
-
-          # Make sure that the robot and target are not too close to each other
-          while index_robot >= len(poses) or index_target >= len(poses):
-               index_robot = int(round(np.random.uniform(0, len(poses))))
-               index_target = int(round(np.random.uniform(0, len(poses))))
+          # the target is drawn among the other len(poses) - 1 poses, no rejection needed
+          index_robot = np.random.randint(len(poses))
+          index_target = (index_robot + 1 + np.random.randint(len(poses) - 1)) % len(poses)
 
           return poses[index_robot], poses[index_target]
 
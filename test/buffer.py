@@ -0,0 +1,256 @@
+#! /usr/bin/env python3
+
+from reinforcement.replaybuffer import RingReplayBuffer, MemmapReplayBuffer, PrioritizedReplayBuffer, SumTree
+from reinforcement.prefetch import BatchPrefetcher
+from reinforcement.checkpoint import resolve
+import torch
+import numpy as np
+import tempfile
+import time
+import unittest
+import rosunit
+
+PKG = 'reinforcement'
+NAME = 'buffer'
+
+print("\033[92mReplay Buffer Unit Tests\033[0m")
+
+class TestBuffer(unittest.TestCase):
+
+     def setUp(self):
+          self.state_size = 24
+          self.action_size = 2
+          self.memory = RingReplayBuffer(8, 4, self.state_size, self.action_size, seed=0)
+
+     def fill(self, memory, n):
+          for i in range(n):
+               state = np.full(self.state_size, i, dtype=np.float32)
+               memory.add(state, [i, -i], float(i), state + 1, i % 2 == 0)
+
+     """
+     Test: Ring buffer wraps around and keeps the newest experiences
+     ======
+          Input (int): number of experiences added
+          Output (int, array): size of the memory, stored rewards
+     """
+     def test_ring_wraparound(self):
+
+          self.fill(self.memory, 10)
+          self.assertEqual(len(self.memory), 8)
+          self.assertEqual(sorted(self.memory.rewards[:, 0].tolist()), [2, 3, 4, 5, 6, 7, 8, 9])
+
+     """
+     Test: Sampled batch shapes and consistency between fields
+     ======
+          Input (int): batch size
+          Output (tensor): state, action, reward, next state, done
+     """
+     def test_ring_sample(self):
+
+          self.fill(self.memory, 6)
+          state, action, reward, next_state, done = self.memory.sample()
+          self.assertEqual(tuple(state.shape), (4, self.state_size))
+          self.assertEqual(tuple(action.shape), (4, self.action_size))
+          self.assertEqual(tuple(reward.shape), (4, 1))
+          self.assertEqual(tuple(done.shape), (4, 1))
+          self.assertTrue(np.allclose(state[:, 0].cpu().numpy(), reward[:, 0].cpu().numpy()))
+          self.assertTrue(np.allclose(next_state.cpu().numpy(), state.cpu().numpy() + 1))
+
+     """
+     Test: Memory-mapped buffer is reopened with its contents and head/size
+     ======
+          Input (str): buffer directory
+          Output (int, array): size, head and stored rewards after reopening
+     """
+     def test_memmap_reopen(self):
+
+          with tempfile.TemporaryDirectory() as path:
+               memory = MemmapReplayBuffer(8, 4, self.state_size, self.action_size, path)
+               self.fill(memory, 5)
+               memory.flush()
+               del memory
+
+               memory = MemmapReplayBuffer(8, 4, self.state_size, self.action_size, path)
+               self.assertEqual(len(memory), 5)
+               self.assertEqual(memory.head, 5)
+               self.assertEqual(memory.rewards[:5, 0].tolist(), [0, 1, 2, 3, 4])
+               self.assertEqual(len(memory.sample()), 5)
+
+               # a buffer with another layout starts from scratch
+               memory = MemmapReplayBuffer(16, 4, self.state_size, self.action_size, path)
+               self.assertEqual(len(memory), 0)
+
+     """
+     Test: Sum tree totals and prefix-sum search
+     ======
+          Input (array): leaf priorities
+          Output (float, array): total priority, leaves found for cumulative values
+     """
+     def test_sum_tree(self):
+
+          tree = SumTree(5)
+          tree.update([0, 1, 2, 3, 4], [1.0, 2.0, 3.0, 4.0, 0.0])
+          self.assertEqual(tree.total(), 10.0)
+          self.assertEqual(tree.find([0.5, 1.5, 3.5, 9.9]).tolist(), [0, 1, 2, 3])
+
+          tree.update([1, 1], [0.0, 5.0])
+          self.assertEqual(tree.total(), 13.0)
+          self.assertEqual(tree.max(), 5.0)
+
+          # values rounded above the total stay on the filled leaves
+          self.assertEqual(tree.find([tree.total() * (1 + 1e-9)], 4).tolist(), [3])
+
+     """
+     Test: Prioritized sampling follows the priorities and returns IS weights
+     ======
+          Input (array): TD errors of the stored experiences
+          Output (array, tensor): sampled indices, importance-sampling weights
+     """
+     def test_prioritized_sample(self):
+
+          memory = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          self.fill(memory, 8)
+          memory.update_priorities(np.arange(8), [0, 0, 0, 0, 0, 0, 0, 1])
+
+          state, action, reward, next_state, done, weights, indices = memory.sample()
+          self.assertEqual(indices.tolist(), [7, 7, 7, 7])
+          self.assertEqual(reward[:, 0].tolist(), [7, 7, 7, 7])
+          self.assertEqual(tuple(weights.shape), (4,))
+          self.assertTrue(np.allclose(weights.cpu().numpy(), 1.0))
+
+     """
+     Test: A partially filled prioritized buffer only samples stored experiences
+     ======
+          Input (int): 5 experiences in a buffer of 8 with uneven priorities
+          Output (array): sampled indices, finite importance-sampling weights
+     """
+     def test_prioritized_partial(self):
+
+          memory = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=0.6, epsilon=1e-6)
+          self.fill(memory, 5)
+          memory.update_priorities(np.arange(5), [0.1, 0.3, 0.7, 1.3, 2.9])
+
+          for _ in range(200):
+               *_, weights, indices = memory.sample()
+               self.assertTrue(np.all(indices < 5))
+               self.assertTrue(torch.isfinite(weights).all())
+
+     """
+     Test: Stored experiences are copied in chunks when the state is resolved, priorities rebuild the tree
+     ======
+          Input (int): 6 experiences, chunks of 4 rows
+          Output (array, float): rows and total priority of the restored memory
+     """
+     def test_state_dict(self):
+
+          memory = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          self.fill(memory, 6)
+          memory.update_priorities(np.arange(6), [1, 2, 3, 4, 5, 6])
+
+          rows = memory.copy_rows(memory.snapshot(), chunk=4)
+          self.assertEqual(rows["rewards"][:, 0].tolist(), [0, 1, 2, 3, 4, 5])
+          self.assertEqual(rows["priorities"].tolist(), [1, 2, 3, 4, 5, 6])
+
+          state = resolve(memory.state_dict())
+
+          restored = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          restored.load_state_dict(state)
+          self.assertEqual(len(restored), 6)
+          self.assertEqual(restored.head, 6)
+          self.assertTrue(np.array_equal(restored.states[:6], memory.states[:6]))
+          self.assertEqual(restored.tree.total(), 21.0)
+
+     """
+     Test: Experiences written while the copy of a saved memory is pending do not leak into it
+     ======
+          Input (int): full memory of 8, wrapped by 5 adds and re-prioritized before and between chunks of 2 rows
+          Output (array): restored rows and priorities equal to the memory at state_dict()
+     """
+     def test_state_dict_wrap(self):
+
+          memory = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          self.fill(memory, 8)
+          memory.update_priorities(np.arange(8), np.arange(1, 9))
+          saved = {name: array[:8].copy() for name, array in memory.rows().items()}
+
+          class WritingLock():
+               """Lock whose every acquisition lets a writer overwrite a row first, once writing is set."""
+               def __init__(self):
+                    self.n = 0
+                    self.writing = False
+               def __enter__(self):
+                    if self.writing:
+                         self.n += 1
+                         memory.add(np.zeros(memory.state_size), [0, 0], -1.0, np.zeros(memory.state_size), True)
+                         memory.update_priorities([self.n % 8], [100.0])
+               def __exit__(self, *args):
+                    return False
+
+          lock = WritingLock()
+          state = memory.state_dict(lock)
+          lock.writing = True
+          self.fill(memory, 2)
+          memory.update_priorities([6, 7], [50.0, 50.0])
+          state = resolve(state)
+          self.assertEqual(len(memory.snapshots), 0)
+
+          for name, rows in state["rows"].items():
+               self.assertTrue(np.array_equal(rows, saved[name]), name)
+          restored = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          restored.load_state_dict(state)
+          self.assertEqual(restored.tree.total(), 36.0)
+
+     """
+     Test: Prefetched batches have the sample() format and consistent rows
+     ======
+          Input (int): prefetch depth of 2, 10 batches
+          Output (tensor): fields of each batch
+     """
+     def test_prefetcher(self):
+
+          self.fill(self.memory, 8)
+          prefetcher = BatchPrefetcher(self.memory, torch.device('cpu'), depth=2)
+
+          for _ in range(10):
+               state, action, reward, next_state, done = prefetcher.get()
+               self.assertEqual(tuple(state.shape), (4, self.state_size))
+               self.assertTrue(torch.equal(state[:, 0], reward[:, 0]))
+               self.assertTrue(torch.equal(action[:, 0], reward[:, 0]))
+               self.assertTrue(torch.equal(next_state[:, 0], reward[:, 0] + 1))
+               self.assertTrue(torch.equal(done[:, 0], (reward[:, 0] % 2 == 0).float()))
+          prefetcher.close()
+
+          memory = PrioritizedReplayBuffer(8, 4, self.state_size, self.action_size, alpha=1.0, epsilon=0.0)
+          self.fill(memory, 8)
+          memory.update_priorities(np.arange(8), [0, 0, 0, 0, 0, 0, 1, 0])
+          prefetcher = BatchPrefetcher(memory, torch.device('cpu'), depth=2)
+
+          state, action, reward, next_state, done, weights, indices = prefetcher.get()
+          self.assertEqual(indices.tolist(), [6, 6, 6, 6])
+          self.assertEqual(reward[:, 0].tolist(), [6, 6, 6, 6])
+          self.assertEqual(tuple(weights.shape), (4,))
+          prefetcher.close()
+
+     """
+     Test: A prefetched batch is not overwritten by the batches taken after it
+     ======
+          Input (int): prefetch depth of 2, one batch kept across 8 further batches
+          Output (tensor): fields of the kept batch, unchanged
+     """
+     def test_prefetcher_lifetime(self):
+
+          self.fill(self.memory, 8)
+          prefetcher = BatchPrefetcher(self.memory, torch.device('cpu'), depth=2)
+
+          kept = prefetcher.get()
+          expected = [tensor.clone() for tensor in kept]
+          for _ in range(8):
+               time.sleep(0.01)         # let the background thread run ahead
+               prefetcher.get()
+          for tensor, copy in zip(kept, expected):
+               self.assertTrue(torch.equal(tensor, copy))
+          prefetcher.close()
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, NAME, TestBuffer)
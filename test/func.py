@@ -1,6 +1,11 @@
 #! /usr/bin/env python3
 
 from reinforcement.utils import Extension
+from reinforcement.geometry import angles, robot_state, yaw_from_quaternion
+from reinforcement.scan import ScanProcessor
+from reinforcement.observation import ObservationBuffer
+import threading
+import numpy as np
 import unittest
 import rosunit
 
@@ -58,9 +63,47 @@ class TestLibrary(unittest.TestCase):
     def test_angles(self):
 
         resp = self.rc.angles(1.0, 1.0, 2.0, 2.0, 0.0)
-        self.assertEquals(resp, 0.7853981633974484, "0.7853981633974484!=0.7853981633974484")
+        self.assertAlmostEqual(resp, 0.7853981633974484)
         self.rc.shutdownhook()
 
+    """
+    Test: Angles of a batch of robots match the scalar angle, also on the goal and across +-pi
+    ======
+        Input (array): odom x, odom y, goal x, goal y, yaw of 5 robots
+        Output (array): theta of each robot in [-pi, pi]
+    """
+    def test_angles_batch(self):
+
+        odom_x = np.array([1.0, 0.0, 0.0, 2.0, 0.0])
+        odom_y = np.array([1.0, 0.0, 0.0, 2.0, 0.0])
+        goal_x = np.array([2.0, -1.0, -1.0, 2.0, 0.0])
+        goal_y = np.array([2.0, 0.1, -0.1, 2.0, -3.0])
+        yaw = np.array([0.0, -3.0, 3.0, 0.5, 3.0])
+
+        theta = angles(odom_x, odom_y, goal_x, goal_y, yaw)
+        for i in range(5):
+            self.assertAlmostEqual(theta[i], self.rc.angles(odom_x[i], odom_y[i], goal_x[i], goal_y[i], yaw[i]))
+        self.assertAlmostEqual(theta[3], -0.5)
+        self.assertTrue(np.all(np.abs(theta) <= np.pi))
+
+    """
+    Test: Robot part of the state of a batch of robots, written into a preallocated state
+    ======
+        Input (array): poses, goals and actions of 3 robots
+        Output (array): distance, theta, linear and angular velocity of each robot
+    """
+    def test_robot_state(self):
+
+        state = np.zeros((3, 24))
+        robot_state(np.zeros(3), np.zeros(3), np.array([3.0, 0.0, 0.0]), np.array([4.0, 0.0, 2.0]), np.zeros(3),
+                    np.array([0.1, 0.2, 0.3]), np.array([-1.0, 0.0, 1.0]), out=state[:, 20:])
+
+        np.testing.assert_allclose(state[:, 20], [5.0, 0.0, 2.0])
+        np.testing.assert_allclose(state[:, 21], [np.arctan2(4.0, 3.0), 0.0, np.pi / 2])
+        np.testing.assert_allclose(state[:, 22:], [[0.1, -1.0], [0.2, 0.0], [0.3, 1.0]])
+        self.assertFalse(np.isnan(state).any())
+        self.assertAlmostEqual(yaw_from_quaternion(0.0, 0.0, np.sin(0.4), np.cos(0.4)), 0.8)
+
     """
     Test: Distance between robot and target
     ======
@@ -98,6 +141,74 @@ class TestLibrary(unittest.TestCase):
         self.assertFalse(collision, False)
         self.rc.shutdownhook()
 
+    """
+    Test: Scan preprocessing (inf/NaN replacement and min-pooling into sectors), noise kept out of the sectors
+    ======
+        Input (array): raw laser ranges
+        Output (array): ENVIRONMENT_DIM sectors, noisy copy for the state
+    """
+    def test_scan_processor(self):
+
+        processor = ScanProcessor(20, 10.0)
+        ranges = list(self.scan)
+        ranges[0], ranges[8] = float('inf'), float('nan')
+        sectors = processor.process(ranges)
+        self.assertEqual(sectors.shape, (20,))
+        self.assertEqual(sectors[1], 0.0)
+        self.assertEqual(sectors.min(), 0.0)
+        self.assertEqual(sectors[-1], min(self.scan[-8:]))
+
+        first = sectors.copy()
+        processor.process(self.scan)
+        self.assertTrue(np.array_equal(sectors, first), "previous result must not be overwritten")
+        self.assertTrue(np.array_equal(processor.process([float('inf')] * 4)[:5], [10.0, 10.0, 10.0, 10.0, 0.0]))
+
+        noisy = ScanProcessor(20, 10.0, noise_sigma=0.1, seed=0)
+        clean = noisy.process(self.scan)
+        self.assertTrue(np.array_equal(clean, processor.process(self.scan)), "process must not add noise")
+        state = noisy.add_noise(clean)
+        self.assertFalse(np.array_equal(state, clean))
+        self.assertTrue(np.all((state >= 0.0) & (state <= 10.0)))
+
+        resp = self.rc.range(type('Scan', (), {'ranges': [float('inf'), float('nan'), 1.5]}))
+        self.assertEqual(resp.tolist(), [self.rc.max_range, 0.0, 1.5])
+        self.rc.shutdownhook()
+
+    """
+    Test: Scan/odometry pairing by stamp and waiting for a fresh observation
+    ======
+        Input (float, object): stamped scans and odometry messages
+        Output (Observation): copy of the scan with the closest odometry, None on timeout
+    """
+    def test_observation_buffer(self):
+
+        buffer = ObservationBuffer()
+        self.assertIsNone(buffer.snapshot())
+
+        scan = np.full(4, 1.9)
+        buffer.update_odom(1.0, 'odom 1.0')
+        buffer.update_odom(2.0, 'odom 2.0')
+        buffer.update_scan(1.9, scan)
+        self.assertEqual(buffer.snapshot().odom, 'odom 2.0')
+        buffer.update_odom(3.0, 'odom 3.0')
+        self.assertEqual(buffer.snapshot().odom, 'odom 2.0')
+
+        scan[:] = 0.0
+        self.assertTrue(np.all(buffer.snapshot().scan == 1.9), "published scan must be a copy")
+
+        self.assertIsNone(buffer.wait_newer(1.9, 0.01))
+        timer = threading.Timer(0.05, buffer.update_scan, args=(2.6, np.full(4, 2.6)))
+        timer.start()
+        observation = buffer.wait_newer(1.9, 1.0)
+        timer.join()
+        self.assertEqual(observation.scan[0], 2.6)
+        self.assertEqual(observation.odom, 'odom 3.0')
+
+        # an older scan never replaces a newer one
+        buffer.update_scan(2.0, np.full(4, 2.0))
+        self.assertEqual(buffer.snapshot().scan_stamp, 2.6)
+        self.rc.shutdownhook()
+
 
 if __name__ == '__main__':
     rosunit.unitrun(PKG, NAME, TestLibrary)
\ No newline at end of file
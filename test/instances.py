@@ -0,0 +1,91 @@
+#! /usr/bin/env python3
+
+from reinforcement.pool import GazeboInstance, EnvironmentPool
+from reinforcement.distributed import check_workers
+import unittest
+import rosunit
+import time
+
+PKG = 'reinforcement'
+NAME = 'instances'
+
+print("\033[92mEnvironment Pool Unit Tests\033[0m")
+
+class FakeInstance(GazeboInstance):
+     """Stand-in for a Gazebo instance: a sleeping process, healthy while it runs."""
+
+     def command(self):
+          return ['sleep', '60']
+
+     def ready(self):
+          return True
+
+class TestPool(unittest.TestCase):
+
+     def setUp(self):
+          self.pool = EnvironmentPool(3, check_every=0.1, startup_timeout=5.0, instance_class=FakeInstance)
+
+     def tearDown(self):
+          self.pool.close()
+
+     """
+     Test: Every worker gets its own instance with its own ROS and Gazebo master
+     ======
+          Input (int): 3 instances, 3 then 4 workers
+          Output (list): environment variables of each worker, ValueError without a free instance
+     """
+     def test_assignment(self):
+
+          environments = self.pool.environments(3)
+          uris = {environment['ROS_MASTER_URI'] for environment in environments}
+          self.assertEqual(len(uris), 3)
+          self.assertEqual(len({environment['GAZEBO_MASTER_URI'] for environment in environments}), 3)
+          self.assertEqual(environments[1]['ROS_MASTER_URI'], 'http://localhost:11412')
+          with self.assertRaises(ValueError):
+               self.pool.environments(4)
+
+     """
+     Test: A crashed instance is restarted by the health check and its workers are reported
+     ======
+          Input (None): instance 1 killed
+          Output (list): workers to restart
+     """
+     def test_restart(self):
+
+          self.pool.start()
+          self.assertTrue(all(instance.healthy() for instance in self.pool.instances))
+
+          self.pool.instances[1].process.kill()
+          # the index is reported once the restart is over
+          restarted = []
+          deadline = time.monotonic() + 5.0
+          while not restarted and time.monotonic() < deadline:
+               restarted = self.pool.poll_restarted(3)
+               time.sleep(0.05)
+
+          self.assertEqual(restarted, [1])
+          self.assertEqual(self.pool.instances[1].restarts, 1)
+          self.assertTrue(self.pool.instances[1].healthy())
+          self.assertEqual(self.pool.poll_restarted(3), [])
+
+          self.pool.close()
+          self.assertFalse(any(instance.alive() for instance in self.pool.instances))
+
+     """
+     Test: Several Gazebo workers are only accepted with one instance each
+     ======
+          Input (dict): BACKEND, NUM_WORKERS and GAZEBO_INSTANCES
+          Output (None): ValueError when workers would share a robot
+     """
+     def test_worker_check(self):
+
+          check_workers({'BACKEND': 'gazebo', 'NUM_WORKERS': 1, 'GAZEBO_INSTANCES': 0})
+          check_workers({'BACKEND': 'gazebo', 'NUM_WORKERS': 3, 'GAZEBO_INSTANCES': 3})
+          check_workers({'BACKEND': 'sim', 'NUM_WORKERS': 4, 'GAZEBO_INSTANCES': 0})
+          with self.assertRaises(ValueError):
+               check_workers({'BACKEND': 'gazebo', 'NUM_WORKERS': 2, 'GAZEBO_INSTANCES': 0})
+          with self.assertRaises(ValueError):
+               check_workers({'BACKEND': 'gazebo', 'NUM_WORKERS': 4, 'GAZEBO_INSTANCES': 3})
+
+if __name__ == '__main__':
+     rosunit.unitrun(PKG, NAME, TestPool)
@@ -0,0 +1,192 @@
+#! /usr/bin/env python3
+
+from reinforcement.model import Actor, Critic, FusedCritic
+from reinforcement.inference import ActorPolicy, LatencyTracker
+from reinforcement.agent import SoftUpdater, flatten_parameters
+from reinforcement.quantize import quantize_weight, export_actor, verify, QuantizedActor
+import numpy as np
+import tempfile
+import os
+import torch
+import unittest
+import rosunit
+
+PKG = 'reinforcement'
+NAME = 'network'
+
+print("\033[92mNetwork Unit Tests\033[0m")
+
+class TestModel(unittest.TestCase):
+
+     def setUp(self):
+          torch.manual_seed(0)
+          self.state = torch.randn(32, 24)
+          self.action = torch.randn(32, 2)
+
+     """
+     Test: Fused critic loads a Critic checkpoint and returns the same Q values
+     ======
+          Input (dict): state_dict of Critic
+          Output (tensor): q1, q2 of both networks
+     """
+     def test_fused_critic_equivalence(self):
+
+          critic = Critic()
+          fused = FusedCritic()
+          fused.load_state_dict(critic.state_dict())
+
+          for q, q_fused in zip(critic(self.state, self.action), fused(self.state, self.action)):
+               self.assertEqual(q.shape, q_fused.shape)
+               self.assertTrue(torch.allclose(q, q_fused, atol=1e-6))
+
+     """
+     Test: Fused critic gradients match the per-head Critic gradients
+     ======
+          Input (tensor): loss on both Q values
+          Output (tensor): gradients of the first layer of each head
+     """
+     def test_fused_critic_gradients(self):
+
+          critic = Critic()
+          fused = FusedCritic()
+          fused.load_state_dict(critic.state_dict())
+
+          for network in [critic, fused]:
+               q1, q2 = network(self.state, self.action)
+               (q1.pow(2).mean() + q2.pow(2).mean()).backward()
+
+          self.assertTrue(torch.allclose(critic.SA[0].weight.grad, fused.weights[0].grad[0].t(), atol=1e-6))
+          self.assertTrue(torch.allclose(critic._SA[0].weight.grad, fused.weights[0].grad[1].t(), atol=1e-6))
+
+     """
+     Test: Fused critic checkpoints keep the Critic keys
+     ======
+          Input (dict): state_dict of FusedCritic
+          Output (list): keys of both state_dicts
+     """
+     def test_fused_critic_state_dict(self):
+
+          fused = FusedCritic()
+          critic = Critic()
+
+          self.assertEqual(sorted(fused.state_dict().keys()), sorted(critic.state_dict().keys()))
+          critic.load_state_dict(fused.state_dict())
+          self.assertTrue(torch.allclose(critic(self.state, self.action)[1], fused(self.state, self.action)[1], atol=1e-6))
+
+     """
+     Test: Inference backends return the actions of the actor in eval mode
+     ======
+          Input (array): states
+          Output (array): actions of Actor, NumPy and TorchScript policies
+     """
+     def test_actor_policy(self):
+
+          actor = Actor(24).eval()
+          with torch.no_grad():
+               expected = actor(self.state).numpy()
+
+          for backend in ['numpy', 'torchscript']:
+               policy = ActorPolicy(actor, backend)
+               for state, action in zip(self.state.numpy(), expected):
+                    np.testing.assert_allclose(policy(state), action, atol=1e-5)
+               self.assertEqual(policy.latency.count, len(expected))
+
+          # the policy works on a copy, the actor being trained is left in training mode
+          actor.train()
+          ActorPolicy(actor, 'numpy')
+          self.assertTrue(actor.training)
+
+     """
+     Test: Latency percentiles of the recent calls
+     ======
+          Input (list): latencies of 1 to 200 us in a window of 100 (101 to 200 us kept)
+          Output (dict): p50 and p99 in microseconds
+     """
+     def test_latency_tracker(self):
+
+          tracker = LatencyTracker(100)
+          self.assertEqual(tracker.percentiles(), {})
+          for us in range(1, 201):
+               tracker.record(us * 1e-6)
+
+          latency = tracker.percentiles()
+          self.assertAlmostEqual(latency['p50'], 150.5, places=3)
+          self.assertAlmostEqual(latency['p99'], 199.01, places=3)
+
+     """
+     Test: Per-channel int8 quantization error is at most half a step
+     ======
+          Input (array): float weights
+          Output (array): int8 weights, scales
+     """
+     def test_quantize_weight(self):
+
+          weight = np.random.default_rng(0).normal(0, 0.1, (16, 8)).astype(np.float32)
+          q, scales = quantize_weight(weight)
+
+          self.assertEqual(q.dtype, np.int8)
+          self.assertEqual(np.abs(q).max(axis=1).tolist(), [127] * 16)
+          self.assertTrue(np.all(np.abs(q * scales[:, None] - weight) <= scales[:, None] / 2 + 1e-7))
+
+     """
+     Test: Int8 artifact runs without torch and stays close to the float actor
+     ======
+          Input (str): actor_model.pth of a random actor
+          Output (dict): action error of both runtimes
+     """
+     def test_quantized_actor(self):
+
+          states = np.random.default_rng(0).uniform(0, 1, (200, 24)).astype(np.float32)
+          with tempfile.TemporaryDirectory() as directory:
+               actor_path = os.path.join(directory, 'actor_model.pth')
+               artifact_path = os.path.join(directory, 'actor_model_int8.npz')
+               torch.save(Actor(24).state_dict(), actor_path)
+               export_actor(actor_path, artifact_path)
+
+               for dequantize in [True, False]:
+                    error = verify(actor_path, artifact_path, states, dequantize=dequantize)
+                    self.assertLess(error['max'], 0.05)
+
+               self.assertLess(QuantizedActor(artifact_path, dequantize=False).nbytes(), 0.5 * sum(p.numel() * 4 for p in Actor(24).parameters()))
+
+     """
+     Test: Soft update moves the target towards the local network and leaves the local network unchanged
+     ======
+          Input (float): tau = 0.1
+          Output (tensor): parameters of both networks
+     """
+     def test_soft_update(self):
+
+          for local, target in [(Actor(24), Actor(24)), (FusedCritic(), FusedCritic())]:
+               local_before = [p.detach().clone() for p in local.parameters()]
+               target_before = [p.detach().clone() for p in target.parameters()]
+
+               SoftUpdater(local, target).update(0.1)
+
+               for p, before in zip(local.parameters(), local_before):
+                    self.assertTrue(torch.equal(p, before))
+               for p, before, source in zip(target.parameters(), target_before, local_before):
+                    self.assertTrue(torch.allclose(p, 0.1 * source + 0.9 * before, atol=1e-6))
+
+     """
+     Test: Flattened parameters stay views of the buffer through optimizer steps and checkpoint loading
+     ======
+          Input (Actor): actor with flattened parameters
+          Output (tensor): buffer and parameters after an Adam step and load_state_dict
+     """
+     def test_flatten_parameters(self):
+
+          actor = Actor(24)
+          flat = flatten_parameters(actor)
+          self.assertEqual(flat.numel(), sum(p.numel() for p in actor.parameters()))
+
+          optimizer = torch.optim.Adam(actor.parameters(), lr=0.01)
+          actor(self.state).pow(2).mean().backward()
+          optimizer.step()
+          self.assertTrue(torch.equal(flat, torch.cat([p.detach().reshape(-1) for p in actor.parameters()])))
+
+          actor.load_state_dict(Actor(24).state_dict())
+          self.assertTrue(torch.equal(flat, torch.cat([p.detach().reshape(-1) for p in actor.parameters()])))
+
+if __name__ == '__main__':
+     rosunit.unitrun(PKG, NAME, TestModel)
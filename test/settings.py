@@ -0,0 +1,141 @@
+#! /usr/bin/env python3
+
+from reinforcement.config import Config, load_config, load_poses
+from reinforcement.utils import Extension
+import tempfile
+import shutil
+import unittest
+import rosunit
+
+import os
+
+PKG = 'reinforcement'
+NAME = 'settings'
+
+print("\033[92mConfiguration Unit Tests\033[0m")
+
+class TestConfig(unittest.TestCase):
+
+     def setUp(self):
+          # each test parses its own copy of the package config, the parsed files are cached per path
+          current_dir = os.path.dirname(os.path.abspath(__file__))
+          self.package = tempfile.mkdtemp()
+          shutil.copytree(os.path.join(current_dir, os.pardir, 'config'), os.path.join(self.package, 'config'),
+                          ignore=shutil.ignore_patterns('models', 'map'))
+          self.config_dir = os.path.join(self.package, 'config')
+
+     def tearDown(self):
+          shutil.rmtree(self.package)
+
+     """
+     Test: The configuration is parsed once and shared by every component
+     ======
+          Input (str): CONFIG_PATH, with and without trailing slash
+          Output (Config): same object for every caller
+     """
+     def test_shared(self):
+
+          config = load_config(self.config_dir)
+          self.assertIs(load_config(self.config_dir + '/', 'config.yaml'), config)
+          self.assertIs(Extension(self.config_dir).load_config("config.yaml"), config)
+          self.assertEqual(config["BATCH_SIZE"], config.BATCH_SIZE)
+
+     """
+     Test: The configuration can not be modified
+     ======
+          Input (int): new batch size
+          Output (AttributeError, TypeError): attribute and item assignment fail
+     """
+     def test_frozen(self):
+
+          config = load_config(self.config_dir)
+          with self.assertRaises(AttributeError):
+               config.BATCH_SIZE = 1
+          with self.assertRaises(TypeError):
+               config["BATCH_SIZE"] = 1
+
+     """
+     Test: Relative paths start at the package folder, CONFIG_PATH is the loaded folder
+     ======
+          Input (str): CONFIG_PATH
+          Output (str): absolute paths
+     """
+     def test_paths(self):
+
+          config = load_config(self.config_dir)
+          self.assertEqual(config.CONFIG_PATH, os.path.realpath(self.config_dir) + os.sep)
+          self.assertEqual(config.TRAIN, os.path.join(os.path.realpath(self.package), 'config', 'models') + os.sep)
+          self.assertTrue(os.path.isabs(config.RESULTS))
+
+     """
+     Test: Parameters set in the environment override config.yaml
+     ======
+          Input (str): REINFORCEMENT_BATCH_SIZE=32, REINFORCEMENT_BUFFER_TYPE=deque
+          Output (int, str): typed values of the override
+     """
+     def test_overrides(self):
+
+          os.environ['REINFORCEMENT_BATCH_SIZE'] = '32'
+          os.environ['REINFORCEMENT_BUFFER_TYPE'] = 'deque'
+          try:
+               config = load_config(self.config_dir)
+          finally:
+               del os.environ['REINFORCEMENT_BATCH_SIZE']
+               del os.environ['REINFORCEMENT_BUFFER_TYPE']
+
+          self.assertEqual(config.BATCH_SIZE, 32)
+          self.assertEqual(config.BUFFER_TYPE, 'deque')
+
+     """
+     Test: Wrong types, unknown choices and unknown keys are all reported at load time
+     ======
+          Input (dict): parameters with a string batch size, an unknown buffer type, no TAU and a misspelled BATCHSIZE
+          Output (ValueError): message naming the four parameters
+     """
+     def test_validation(self):
+
+          values = dict(load_config(self.config_dir))
+          values.update(BATCH_SIZE='128', BUFFER_TYPE='list', BATCHSIZE=32)
+          del values['TAU']
+
+          with self.assertRaises(ValueError) as error:
+               Config(values)
+          for key in ['BATCH_SIZE', 'BUFFER_TYPE', 'TAU', 'BATCHSIZE']:
+               self.assertIn(key, str(error.exception))
+
+     """
+     Test: POSE_BUCKET must be -1 or one of the DISTANCE_BUCKETS
+     ======
+          Input (dict): parameters with 3 buckets and POSE_BUCKET -1, 2, 3 and -2
+          Output (ValueError): for the last two only
+     """
+     def test_pose_bucket(self):
+
+          values = dict(load_config(self.config_dir))
+          values.update(DISTANCE_BUCKETS=3)
+          for bucket in [-1, 2]:
+               self.assertEqual(Config(dict(values, POSE_BUCKET=bucket)).POSE_BUCKET, bucket)
+          for bucket in [3, -2]:
+               with self.assertRaises(ValueError) as error:
+                    Config(dict(values, POSE_BUCKET=bucket))
+               self.assertIn('POSE_BUCKET', str(error.exception))
+
+     """
+     Test: Pose files are read from CONFIG_PATH/pose once
+     ======
+          Input (str): poses.yaml
+          Output (list): (x, y, yaw) tuples, a new list for each caller
+     """
+     def test_poses(self):
+
+          rc = Extension(self.config_dir)
+          poses = rc.poses('poses.yaml')
+          self.assertTrue(all(len(pose) == 3 for pose in poses))
+          misses = load_poses.cache_info().misses
+          again = rc.poses('poses.yaml')
+          self.assertEqual(again, poses)
+          self.assertIsNot(again, poses)
+          self.assertEqual(load_poses.cache_info().misses, misses)
+
+if __name__ == '__main__':
+     rosunit.unitrun(PKG, NAME, TestConfig)
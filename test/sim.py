@@ -3,7 +3,7 @@
 from reinforcement.utils import Extension
 from std_srvs.srv import Empty
 from gazebo_msgs.msg import ModelState 
-from gazebo_msgs.srv import GetModelState
+from gazebo_msgs.srv import GetModelState, SetModelState
 
 import unittest
 import rospy
@@ -65,5 +65,22 @@ class TestROS(unittest.TestCase):
           model_state = get_model_state("target", "")
           self.assertEqual(model_state.success, True, "Getting model state failed")
 
+     def test_teleport_model(self):
+          # Move the target with the set_model_state service used by the teleport reset
+          rospy.wait_for_service("gazebo/set_model_state")
+          set_model_state = rospy.ServiceProxy("gazebo/set_model_state", SetModelState)
+          get_model_state = rospy.ServiceProxy("gazebo/get_model_state", GetModelState)
+
+          state = ModelState()
+          state.model_name = "target"
+          state.pose.position.x = 1.0
+          state.pose.position.y = -1.0
+          state.pose.orientation.w = 1.0
+          self.assertTrue(set_model_state(state).success, "Teleporting the target failed")
+
+          position = get_model_state("target", "").pose.position
+          self.assertAlmostEqual(position.x, 1.0, places=2)
+          self.assertAlmostEqual(position.y, -1.0, places=2)
+
 if __name__ == '__main__':
     rostest.rosrun(PKG, NAME, TestROS)
@@ -0,0 +1,269 @@
+#! /usr/bin/env python3
+
+from reinforcement.simulation import SimEnv, VecSimEnv
+from reinforcement.raycast import Raycaster, LASER_MIN_ANGLE, LASER_MAX_ANGLE, LASER_SAMPLES
+from reinforcement.scan import ScanProcessor
+from reinforcement.evaluation import evaluate, scenarios, free_poses, summarize, local_environments
+from reinforcement.sampler import PoseSampler
+from reinforcement.model import Actor
+from reinforcement.config import load_poses
+import xml.etree.ElementTree as ET
+import numpy as np
+import tempfile
+import torch
+import unittest
+import rosunit
+
+import os
+
+PKG = 'reinforcement'
+NAME = 'simulator'
+
+print("\033[92mSimulator Unit Tests\033[0m")
+
+class TestSimulator(unittest.TestCase):
+
+     def setUp(self):
+          current_dir = os.path.dirname(os.path.abspath(__file__))
+          parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+          config_dir = os.path.join(parent_dir, 'config')
+          self.config_dir = config_dir
+
+          self.env = SimEnv(config_dir, seed=0)
+          self.vec_env = VecSimEnv(config_dir, 4, seed=0)
+
+     """
+     Test: Reset returns the laser scan followed by distance, theta and the last action
+     ======
+          Input (None)
+          Output (array): state
+     """
+     def test_reset(self):
+
+          state = self.env.reset_env()
+          self.assertEqual(state.shape, (self.env.environment_dim + 4,))
+          self.assertTrue(np.all(state[:self.env.environment_dim] <= self.env.max_range))
+          self.assertAlmostEqual(state[-4], np.hypot(self.env.goal_x - self.env.odom_x, self.env.goal_y - self.env.odom_y))
+          self.assertEqual(state[-2:].tolist(), [0.0, 0.0])
+
+          # NOISE_SIGMA noise on the state only, as in Env
+          noise = state[:self.env.environment_dim] - self.env.scan_data
+          self.assertTrue(np.any(noise != 0.0))
+          self.assertLess(np.abs(noise).max(), 10 * self.env.scan_processor.noise_sigma)
+
+     """
+     Test: The robot moves along its heading and never enters an obstacle
+     ======
+          Input (array): linear and angular velocity
+          Output (float): robot position
+     """
+     def test_step(self):
+
+          self.env.reset_env((0.0, 2.0, -np.pi / 2), (0.0, -2.0))
+          self.env.step_env([0.5, 0.0])
+          self.assertAlmostEqual(self.env.odom_x, 0.0)
+          self.assertAlmostEqual(self.env.odom_y, 2.0 - 0.5 * self.env.time_delta)
+
+          for _ in range(50):
+               _, reward, done, _ = self.env.step_env([1.0, 0.0])
+               self.assertFalse(self.env.map.is_occupied(self.env.odom_x, self.env.odom_y))
+               if done:
+                    break
+          self.assertTrue(done)
+
+     """
+     Test: Lockstep stepping of N robots with automatic reset of finished ones
+     ======
+          Input (array): (N, 2) actions
+          Output (array): (N, state) next states, (N,) rewards, dones and targets
+     """
+     def test_vectorized_step(self):
+
+          states = self.vec_env.reset_env()
+          self.assertEqual(states.shape, (4, self.vec_env.environment_dim + 4))
+
+          self.vec_env.odom_x[:], self.vec_env.odom_y[:], self.vec_env.yaw[:] = 0.0, 2.0, -np.pi / 2
+          self.vec_env.goal_x[:], self.vec_env.goal_y[:] = 0.0, -2.0
+          self.vec_env.odom_y[0] = self.vec_env.goal_y[0] + 0.5
+          next_states, rewards, dones, targets = self.vec_env.step_env(np.tile([0.5, 0.0], (4, 1)))
+          self.assertEqual(next_states.shape, states.shape)
+          self.assertEqual(rewards.shape, (4,))
+          self.assertTrue(targets[0] and dones[0])
+          self.assertEqual(rewards[0], 80)
+          self.assertFalse(dones[1:].any())
+
+          # the finished robot starts over, the others keep going
+          self.assertEqual(self.vec_env.timesteps.tolist(), [0, 1, 1, 1])
+          self.assertAlmostEqual(self.vec_env.states[0, -4], np.hypot(self.vec_env.goal_x[0] - self.vec_env.odom_x[0],
+                                                                       self.vec_env.goal_y[0] - self.vec_env.odom_y[0]))
+
+     """
+     Test: Sampled starts and goals are free, reachable and within the distance limits of their bucket
+     ======
+          Input (int): seed and curriculum bucket
+          Output (array): (N, 3) starts and (N, 2) goals
+     """
+     def test_pose_sampler(self):
+
+          sampler = PoseSampler(self.env.map, clearance=0.6, min_distance=2.0, max_distance=6.0, n_buckets=3)
+          for bucket in range(sampler.n_buckets):
+               low, high = sampler.bucket_range(bucket)
+               starts, goals = sampler.sample_batch(500, np.random.default_rng(bucket), bucket)
+               distance = np.hypot(*(goals - starts[:, :2]).T)
+               self.assertTrue(np.all((distance >= low) & (distance <= high)))
+               self.assertTrue(np.all((distance >= 2.0) & (distance <= 6.0)))
+
+               for x, y in [starts[:, :2].T, goals.T]:
+                    row, col = self.env.map.world_to_grid(x, y)
+                    self.assertTrue(np.all(sampler.obstacle_distance[row, col] >= 0.6))
+                    self.assertFalse(self.env.map.is_occupied(x, y).any())
+               start_row, start_col = self.env.map.world_to_grid(starts[:, 0], starts[:, 1])
+               goal_row, goal_col = self.env.map.world_to_grid(goals[:, 0], goals[:, 1])
+               self.assertTrue(np.all(sampler.regions[start_row, start_col] == sampler.regions[goal_row, goal_col]))
+
+          # buckets are ordered by distance and the same seed gives the same episodes
+          self.assertLessEqual(sampler.bucket_range(0)[1], sampler.bucket_range(1)[0])
+          first = sampler.sample(np.random.default_rng(7))
+          self.assertEqual(sampler.sample(np.random.default_rng(7)), first)
+
+     """
+     Test: Poses of a pose file outside the free space are discarded, too few valid pairs are reported
+     ======
+          Input (list): (x, y, yaw) poses, one of them outside the map
+          Output (array): valid candidates, ValueError without any pair or for a bucket it does not have
+     """
+     def test_pose_sampler_poses(self):
+
+          poses = [(0.0, 2.0, 0.0), (0.0, -2.0, 0.0), (50.0, 50.0, 0.0)]
+          sampler = PoseSampler(self.env.map, poses, min_distance=2.0, max_distance=6.0)
+          self.assertEqual(sampler.positions.tolist(), [[0.0, 2.0], [0.0, -2.0]])
+          self.assertEqual(len(sampler.pairs), 2)
+
+          with self.assertRaises(ValueError):
+               PoseSampler(self.env.map, poses[:1])
+          with self.assertRaises(ValueError):
+               sampler.sample(np.random.default_rng(0), bucket=1)
+
+     """
+     Test: Sphere tracing over the distance field agrees with dense ray marching
+     ======
+          Input (array): batch of laser poses
+          Output (array): (N, LASER_SAMPLES) ranges, capped at MAX_RANGE
+     """
+     def test_raycast(self):
+
+          occupancy_map = self.env.map
+          rng = np.random.default_rng(0)
+          rows, cols = np.nonzero(~occupancy_map.occupied)
+          pick = rng.integers(0, len(rows), 128)
+          x = occupancy_map.origin[0] + (cols[pick] + 0.5) * occupancy_map.resolution
+          y = occupancy_map.origin[1] + (rows[pick] + 0.5) * occupancy_map.resolution
+          yaw = rng.uniform(-np.pi, np.pi, 128)
+
+          ranges = self.env.raycaster.cast(x, y, yaw)
+          dense = occupancy_map.raycast(x, y, yaw, self.env.angles, self.env.max_range)
+          self.assertEqual(ranges.shape, (128, LASER_SAMPLES))
+          self.assertLess(np.median(np.abs(ranges - dense)), occupancy_map.resolution)
+          self.assertEqual(self.env.raycaster.cast(x[0], y[0], yaw[0]).shape, (LASER_SAMPLES,))
+
+          short = Raycaster(occupancy_map, self.env.angles, 0.1).cast(x, y, yaw)
+          self.assertTrue(np.all(short <= 0.1))
+          self.assertTrue(np.any(short == 0.1))
+
+     """
+     Test: The simulated scan has the beams of the Gazebo laser and the sectors of Env.scan_callback
+     ======
+          Input (array): front Hokuyo description, batch of robot poses
+          Output (array): (N, ENVIRONMENT_DIM) sectors, equal to ScanProcessor.process of the full fan
+     """
+     def test_scan_layout(self):
+
+          robots = os.path.join(os.path.dirname(self.config_dir), 'robots')
+          sensor = ET.parse(os.path.join(robots, 'urdf', 'simulation', 'hokuyo_utm.gazebo.xacro'))
+          self.assertEqual(int(sensor.find('.//samples').text), LASER_SAMPLES)
+          base = ET.parse(os.path.join(robots, 'robot', 'hera_base.urdf.xacro'))
+          laser = base.find('{http://ros.org/wiki/xacro}gazebo_hokuyo_utm')
+          self.assertEqual((float(laser.get('min_angle')), float(laser.get('max_angle'))), (LASER_MIN_ANGLE, LASER_MAX_ANGLE))
+
+          self.vec_env.reset_env()
+          x, y, yaw = self.vec_env.odom_x, self.vec_env.odom_y, self.vec_env.yaw
+          fans = self.vec_env.raycaster.cast(x + 0.3 * np.cos(yaw), y + 0.3 * np.sin(yaw), yaw)
+          scans = self.vec_env.scan()
+          self.assertEqual(scans.shape, (4, self.vec_env.environment_dim))
+          processor = ScanProcessor(self.env.environment_dim, self.env.max_range)
+          for i in range(4):
+               self.assertEqual(scans[i].tolist(), processor.process(fans[i]).tolist())
+
+          self.env.odom_x, self.env.odom_y, self.env.yaw = x[0], y[0], yaw[0]
+          fan = self.env.raycaster.cast(x[0] + 0.3 * np.cos(yaw[0]), y[0] + 0.3 * np.sin(yaw[0]), yaw[0])
+          self.assertEqual(self.env.scan().tolist(), processor.process(fan).tolist())
+
+     """
+     Test: Reset places the robot and the goal at the given start and goal
+     ======
+          Input (tuple): start (x, y, yaw), goal (x, y)
+          Output (array): state with the distance and angle to the goal
+     """
+     def test_reset_start_goal(self):
+
+          state = self.env.reset_env((1.7, 0.2, 0.0), (1.7, 3.0))
+          self.assertEqual((self.env.odom_x, self.env.odom_y, self.env.yaw), (1.7, 0.2, 0.0))
+          self.assertAlmostEqual(state[-4], 2.8)
+          self.assertAlmostEqual(state[-3], np.pi / 2)
+
+     """
+     Test: Evaluation scenarios are fixed by the seed and made of free, distinct poses
+     ======
+          Input (int): seed
+          Output (list): (start, goal) pairs
+     """
+     def test_scenarios(self):
+
+          poses = free_poses(self.env.map, load_poses(os.path.join(self.config_dir, 'pose', 'random.yaml')))
+          self.assertFalse(self.env.map.is_occupied(poses[:, 0], poses[:, 1]).any())
+
+          first = scenarios(poses, 20, seed=3, min_distance=2.0)
+          self.assertEqual(first, scenarios(poses, 20, seed=3, min_distance=2.0))
+          self.assertNotEqual(first, scenarios(poses, 20, seed=4, min_distance=2.0))
+          for start, goal in first:
+               self.assertGreaterEqual(np.hypot(goal[0] - start[0], goal[1] - start[1]), 2.0)
+
+     """
+     Test: Parallel evaluation gives the same episodes as a single worker
+     ======
+          Input (str, int): actor checkpoint, 1 and 2 workers
+          Output (list, dict): episode results, rates and intervals
+     """
+     def test_evaluate(self):
+
+          torch.manual_seed(0)
+          with tempfile.TemporaryDirectory() as directory:
+               path = os.path.join(directory, 'actor_model.pth')
+               torch.save(Actor(self.env.environment_dim + 4).state_dict(), path)
+
+               single = evaluate(self.config_dir, path, n_episodes=6, n_workers=1, seed=0, backend='sim')
+               parallel = evaluate(self.config_dir, path, n_episodes=6, n_workers=2, seed=0, backend='sim')
+
+          self.assertEqual(len(parallel), 6)
+          for a, b in zip(single, parallel):
+               self.assertEqual(a['steps'], b['steps'])
+               self.assertAlmostEqual(a['path_length'], b['path_length'])
+
+          summary = summarize(parallel)
+          rate, low, high = summary['success_rate']
+          self.assertTrue(0.0 <= low <= rate <= high <= 1.0)
+          self.assertEqual(summary['episodes'], 6)
+
+     """
+     Test: Without Gazebo instances the evaluation does not run several workers on the same robot
+     ======
+          Input (str, int): backend, 4 workers
+          Output (list): one environment with gazebo, four with the simulator
+     """
+     def test_evaluate_workers(self):
+
+          self.assertEqual(local_environments('gazebo', 4), [{}])
+          self.assertEqual(len(local_environments('sim', 4)), 4)
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, NAME, TestSimulator)
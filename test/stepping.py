@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+
+from reinforcement.stepping import WorldStepper
+import threading
+import time
+import unittest
+import rosunit
+
+PKG = 'reinforcement'
+NAME = 'stepping'
+
+print("\033[92mWorld Stepping Unit Tests\033[0m")
+
+class FakeWorld():
+     """Stand-in for the Gazebo pause/unpause services and the /clock topic."""
+
+     def __init__(self, step_size, clock_every=1):
+          self.step_size = step_size
+          self.clock_every = clock_every
+          self.iterations = 0
+          self.running = threading.Event()
+          self.stopped = threading.Event()
+          self.calls = []
+          self.stepper = None
+
+     def pause(self):
+          self.calls.append('pause')
+          self.running.clear()
+
+     def unpause(self):
+          self.calls.append('unpause')
+          self.running.set()
+
+     def loop(self):
+          while not self.stopped.is_set():
+               if not self.running.wait(0.01):
+                    continue
+               self.iterations += 1
+               if self.iterations % self.clock_every == 0:
+                    self.stepper.tick(self.iterations * self.step_size)
+               time.sleep(0.0001)
+
+     def start(self, stepper):
+          self.stepper = stepper
+          self.thread = threading.Thread(target=self.loop, daemon=True)
+          self.thread.start()
+
+     def stop(self):
+          self.stopped.set()
+          self.thread.join()
+
+class TestStepping(unittest.TestCase):
+
+     def setUp(self):
+          self.world = FakeWorld(0.001)
+          self.stepper = WorldStepper(100, 0.001, self.world.pause, self.world.unpause, timeout=2.0)
+          self.world.start(self.stepper)
+
+     def tearDown(self):
+          self.world.stop()
+
+     """
+     Test: Each step runs the requested number of physics iterations
+     ======
+          Input (int): 100 iterations of 0.001 s per step
+          Output (int): iterations executed, simulation time advanced
+     """
+     def test_step_iterations(self):
+
+          for i in range(5):
+               executed = self.stepper.step()
+               self.assertGreaterEqual(executed, 100)
+               self.assertLessEqual(executed, 102)
+               self.assertFalse(self.world.running.is_set())
+
+          self.assertAlmostEqual(self.stepper.sim_time, self.world.iterations * 0.001, places=6)
+          self.assertEqual(self.world.calls, ['unpause', 'pause'] * 5)
+
+     """
+     Test: Step returns as soon as the clock reaches the target instead of sleeping a fixed time
+     ======
+          Input (int): 10 iterations per step
+          Output (float): wall-clock time of 10 steps
+     """
+     def test_step_latency(self):
+
+          self.stepper.iterations = 10
+          start = time.monotonic()
+          for i in range(10):
+               self.stepper.step()
+          self.assertLess(time.monotonic() - start, 1.0)
+
+     """
+     Test: Stepping gives up and pauses the physics when the clock stops
+     ======
+          Input (float): timeout of 0.1 s, no clock messages
+          Output (int): iterations reported, physics paused
+     """
+     def test_step_timeout(self):
+
+          world = FakeWorld(0.001)
+          stepper = WorldStepper(100, 0.001, world.pause, world.unpause, timeout=0.1)
+
+          self.assertEqual(stepper.step(), 0)
+          self.assertEqual(world.calls, ['unpause', 'pause'])
+
+if __name__ == '__main__':
+     rosunit.unitrun(PKG, NAME, TestStepping)
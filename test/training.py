@@ -0,0 +1,201 @@
+#! /usr/bin/env python3
+
+from reinforcement.scheduler import UpdateScheduler
+from reinforcement.checkpoint import CheckpointWriter, latest_checkpoint, load_checkpoint, rng_state, set_rng_state
+from reinforcement.benchmark import fill_memory
+from reinforcement.agent import Agent
+import torch
+import torch.nn.functional as F
+import tempfile
+import time
+import os
+import unittest
+import rosunit
+
+PKG = 'reinforcement'
+NAME = 'training'
+
+print("\033[92mTraining Loop Unit Tests\033[0m")
+
+class FakeAgent():
+     """Stand-in for Agent counting its gradient steps."""
+
+     def __init__(self, batch_size=4):
+          self.memory = []
+          self.batch_size = batch_size
+          self.iteration = 0
+          self.calls = []
+
+     def learn(self, n):
+          if len(self.memory) > self.batch_size:
+               self.calls.append(n)
+               self.iteration += n
+
+class TestTraining(unittest.TestCase):
+
+     def setUp(self):
+          self.agent = FakeAgent()
+
+     def run_steps(self, scheduler, n):
+          for t in range(n):
+               with scheduler.lock:
+                    self.agent.memory.append(t)
+               scheduler.step()
+
+     """
+     Test: Episode mode keeps t gradient steps at the end of each episode
+     ======
+          Input (int): episodes of 10 and 3 steps
+          Output (list): gradient steps of each learn call
+     """
+     def test_episode_mode(self):
+
+          scheduler = UpdateScheduler(self.agent, 'episode')
+          self.run_steps(scheduler, 10)
+          scheduler.end_episode(10)
+          self.run_steps(scheduler, 3)
+          scheduler.end_episode(3)
+
+          self.assertEqual(self.agent.calls, [10, 3])
+          self.assertEqual(scheduler.stats()['updates'], 13)
+
+     """
+     Test: Ratio mode runs UPDATE_RATIO gradient steps per environment step after the warmup
+     ======
+          Input (float, int, int): ratio 0.5, warmup 20, 2 gradient steps per call
+          Output (int, list): gradient steps, learn calls
+     """
+     def test_ratio_mode(self):
+
+          scheduler = UpdateScheduler(self.agent, 'ratio', ratio=0.5, warmup=20, gradient_steps=2)
+          self.run_steps(scheduler, 19)
+          self.assertEqual(self.agent.iteration, 0)
+
+          self.run_steps(scheduler, 41)
+          scheduler.end_episode(60)
+          self.assertEqual(self.agent.iteration, 20)
+          self.assertEqual(set(self.agent.calls), {2})
+
+          stats = scheduler.stats()
+          self.assertEqual(stats['env_steps'], 60)
+          self.assertIn('p50', stats)
+
+     """
+     Test: Background training runs the owed gradient steps on its own thread
+     ======
+          Input (float): ratio 2.0, warmup 0
+          Output (int): gradient steps after the thread caught up
+     """
+     def test_background(self):
+
+          scheduler = UpdateScheduler(self.agent, 'ratio', ratio=2.0, warmup=0, gradient_steps=1, background=True)
+          self.run_steps(scheduler, 50)
+
+          deadline = time.monotonic() + 2.0
+          while scheduler.credit >= 1 and time.monotonic() < deadline:
+               time.sleep(0.01)
+          scheduler.stop()
+
+          # gradient steps are owed from the step that brings the memory above a batch (5 transitions)
+          self.assertEqual(self.agent.iteration, 2 * 46)
+          self.assertFalse(scheduler.thread.is_alive())
+
+     """
+     Test: Checkpoints are renamed into place and only the most recent are kept
+     ======
+          Input (int): 4 checkpoints, keep 2
+          Output (list): files left in the folder
+     """
+     def test_checkpoint_rotation(self):
+
+          with tempfile.TemporaryDirectory() as directory:
+               writer = CheckpointWriter(directory, keep=2)
+               for episode in range(4):
+                    writer.save('checkpoint_{:08d}.pth'.format(episode), {'episode': episode, 'weights': torch.full((3,), episode)})
+               writer.close()
+
+               self.assertEqual(sorted(os.listdir(directory)), ['checkpoint_00000002.pth', 'checkpoint_00000003.pth'])
+               state = load_checkpoint(latest_checkpoint(directory))
+               self.assertEqual(state['episode'], 3)
+               self.assertTrue(torch.equal(state['weights'], torch.full((3,), 3)))
+
+     """
+     Test: Training resumed from a checkpoint matches uninterrupted training bit for bit
+     ======
+          Input (Agent): agent checkpointed after 6 gradient steps
+          Output (tensor): parameters after 6 more steps, with and without restart
+     """
+     def test_checkpoint_resume(self):
+
+          CONFIG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'config')
+          torch.manual_seed(0)
+          agent = Agent(state_size=24, action_size=2, random_seed=0, CONFIG_PATH=CONFIG_PATH)
+          fill_memory(agent, 1000)
+          agent.learn(6)
+
+          with tempfile.TemporaryDirectory() as directory:
+               writer = CheckpointWriter(directory)
+               agent.pause_prefetch()
+               writer.save('checkpoint_00000000.pth', {'agent': agent.state_dict(), 'rng': rng_state()})
+               writer.close()
+
+               agent.learn(6)
+
+               torch.manual_seed(1)
+               resumed = Agent(state_size=24, action_size=2, random_seed=1, CONFIG_PATH=CONFIG_PATH)
+               state = load_checkpoint(latest_checkpoint(directory))
+               resumed.load_state_dict(state['agent'])
+               set_rng_state(state['rng'])
+               resumed.learn(6)
+
+          for network, other in [(agent.actor_local, resumed.actor_local), (agent.critic_target, resumed.critic_target)]:
+               for p, q in zip(network.parameters(), other.parameters()):
+                    self.assertTrue(torch.equal(p, q))
+          self.assertEqual(agent.iteration, resumed.iteration)
+
+     """
+     Test: The eager losses match the original inline update, compile and bf16 modes train
+     ======
+          Input (Agent): agent with 1000 random transitions
+          Output (tensor): critic and actor losses, parameters after compiled bf16 updates
+     """
+     def test_training_modes(self):
+
+          CONFIG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'config')
+          torch.manual_seed(0)
+          agent = Agent(state_size=24, action_size=2, random_seed=0, CONFIG_PATH=CONFIG_PATH)
+          fill_memory(agent, 1000)
+          state, action, reward, next_state, done = agent.memory.sample()
+          networks = [agent.actor_local, agent.actor_target, agent.critic_local, agent.critic_target]
+          for network in networks:
+               network.eval()                                         # same outputs without dropout masks
+
+          torch.manual_seed(1)
+          critic_loss, _ = agent.critic_loss(state, action, reward, next_state, done)
+          actor_loss = agent.actor_loss(state)
+
+          # update of Agent.learn before the losses were factored out
+          torch.manual_seed(1)
+          reward, done = reward.view(-1).float(), done.view(-1).float()
+          noise = torch.empty_like(action).normal_(0, agent.noise).clamp(-agent.noise_clip, agent.noise_clip)
+          actions_next = (agent.actor_target(next_state) + noise).clamp(-1.0, 1)
+          Q_targets = reward + (agent.gamma * torch.min(*agent.critic_target(next_state, actions_next)) * (1 - done)).detach()
+          Q1_expected, Q2_expected = agent.critic_local(state, action)
+          expected = F.mse_loss(Q1_expected, Q_targets) + F.mse_loss(Q2_expected, Q_targets)
+          self.assertTrue(torch.allclose(critic_loss, expected))
+          self.assertTrue(torch.allclose(actor_loss, -agent.critic_local(state, agent.actor_local(state))[0].mean()))
+
+          for network in networks:
+               network.train()
+
+          agent.configure_training('compile', 'bf16')
+          target = agent.actor_target.CFC[0].weight.detach().clone()
+          agent.learn(4)
+          self.assertEqual(agent.iteration, 4)
+          self.assertFalse(torch.equal(agent.actor_target.CFC[0].weight, target))
+          for p in agent.critic_local.parameters():
+               self.assertTrue(torch.isfinite(p).all())
+          agent.pause_prefetch()
+
+if __name__ == '__main__':
+     rosunit.unitrun(PKG, NAME, TestTraining)